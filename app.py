@@ -1,30 +1,37 @@
 """Millis Agent Creation Service"""
 
 import asyncio
-from typing import Optional
+import json
+from datetime import datetime, timezone
+from typing import List, Optional
 import httpx
 from redis.asyncio import Redis
 from fastapi import FastAPI, HTTPException, BackgroundTasks
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse, Response
 from sse_starlette.sse import EventSourceResponse
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
-from src.core.pipeline import TaskManager, AsyncPipeline
+from src.core.batch import BatchScheduler
+from src.core.pipeline import TaskManager, AsyncPipeline, TaskState
 from src.core.config import Config
-from src.agent import agent_action, get_knowledge_base
-from src.agent_config.agent_tools import COMPANY_NAMES
+from src.agent import agent_action, get_knowledge_base, warm_up
 from src.scrape.llm import get_kb_description
-from src.utils.payloads import Payload
+from src.utils.payloads import Payload, get_preset_registry
 from src.utils.functions import (
     create_millis_assistant,
     generate_presigned_url,
     set_knowledge_base,
     upload_text_to_s3,
 )
+from src.utils.http_client import close_http_client
 from src.utils.retry import async_retry
-from src.logging.logger import logger, LogContext, log_step
-
-API_KEY = Config.MILLIS_API_KEY
+from src.track_cost.ledger import TaskBudget, cost_ledger, cost_scope, cost_step
+from src.logging.logger import logger, setup_logger, LogContext, log_step
+from src.monitoring.metrics import LoopLagMonitor, bind_batch_gauges, render_metrics
+from src.monitoring.profiling import profile_job, profiling_enabled
+from src.monitoring.tracing import TaskTrace, setup_tracing, shutdown_tracing
+from src.scrape.convert import shutdown_convert_pool, warm_convert_pool
+from src.storage.artifacts import ArtifactSweeper, task_artifacts
 
 app = FastAPI(title="Millis Voice Assistant")
 
@@ -32,11 +39,27 @@ app = FastAPI(title="Millis Voice Assistant")
 redis_client: Optional[Redis] = None
 task_manager: Optional[TaskManager] = None
 pipeline: Optional[AsyncPipeline] = None
+batch_scheduler: Optional[BatchScheduler] = None
+artifact_sweeper: Optional[ArtifactSweeper] = None
+warm_up_task: Optional[asyncio.Task] = None
+loop_lag_monitor = LoopLagMonitor()
 
 
 class CreateAgentRequest(BaseModel):
     main_url: str
     assistant_name: Optional[str] = None
+    preset: str = "default"
+    # per-job LLM budget overrides (defaults come from Config)
+    max_tokens: Optional[int] = None
+    max_cost_usd: Optional[float] = None
+    # sample the job and keep the profile at /tasks/{task_id}/profile
+    profile: bool = False
+
+
+class CreateAgentBatchRequest(BaseModel):
+    urls: List[str] = Field(default_factory=list)
+    agents: List[CreateAgentRequest] = Field(default_factory=list)
+    preset: str = "default"
 
 
 # -------------------
@@ -56,12 +79,27 @@ async def get_redis_connection() -> Redis:
 
 @app.on_event("startup")
 async def startup_event():
-    global redis_client, task_manager, pipeline
+    global redis_client, task_manager, pipeline, batch_scheduler, artifact_sweeper, warm_up_task
+    setup_logger()
+    setup_tracing()
+    artifact_sweeper = ArtifactSweeper()
+    artifact_sweeper.start()
+    loop_lag_monitor.start()
+    await warm_convert_pool()
     try:
         redis_client = await get_redis_connection()
         await redis_client.ping()
         task_manager = TaskManager(redis_client)
         pipeline = AsyncPipeline(task_manager)
+        batch_scheduler = BatchScheduler(
+            run_batch_job,
+            max_concurrency=Config.BATCH_MAX_CONCURRENCY,
+            on_done=task_manager.push_batch_result,
+        )
+        batch_scheduler.start()
+        bind_batch_gauges(batch_scheduler)
+        # the agent graph, LLM clients and crawler load while requests are already served
+        warm_up_task = asyncio.create_task(warm_up(), name="warm-up")
         logger.info("Successfully connected to Redis")
     except Exception as e:
         logger.error(f"Redis startup failed: {str(e)}")
@@ -71,6 +109,17 @@ async def startup_event():
 @app.on_event("shutdown")
 async def shutdown_event():
     global redis_client
+    if batch_scheduler:
+        await batch_scheduler.stop()
+    if artifact_sweeper:
+        await artifact_sweeper.stop()
+    if warm_up_task:
+        warm_up_task.cancel()
+        await asyncio.gather(warm_up_task, return_exceptions=True)
+    await loop_lag_monitor.stop()
+    shutdown_convert_pool()
+    await close_http_client()
+    shutdown_tracing()
     if redis_client:
         try:
             await redis_client.close()
@@ -90,6 +139,21 @@ def validate_task_manager():
         )
 
 
+# -------------------
+# Request Validation
+# -------------------
+def validate_agent_request(request: CreateAgentRequest):
+    if not request.main_url.startswith(("http://", "https://")):
+        raise HTTPException(
+            status_code=400,
+            detail="Invalid URL format. Must start with http:// or https://",
+        )
+    if request.preset not in get_preset_registry():
+        raise HTTPException(
+            status_code=400, detail=f"Unknown agent preset: {request.preset}"
+        )
+
+
 # -------------------
 # Agent Creation Endpoint
 # -------------------
@@ -98,12 +162,7 @@ async def create_agent_endpoint(
     request: CreateAgentRequest, background_tasks: BackgroundTasks
 ):
     validate_task_manager()
-
-    if not request.main_url.startswith(("http://", "https://")):
-        raise HTTPException(
-            status_code=400,
-            detail="Invalid URL format. Must start with http:// or https://",
-        )
+    validate_agent_request(request)
 
     task_id = await task_manager.create_task()
     background_tasks.add_task(process_agent_creation, task_id, request)
@@ -121,6 +180,111 @@ async def create_agent_endpoint(
     )
 
 
+# -------------------
+# Batch Agent Creation
+# -------------------
+@app.post("/agents/batch")
+async def create_agent_batch_endpoint(request: CreateAgentBatchRequest):
+    validate_task_manager()
+
+    agents = list(request.agents) + [
+        CreateAgentRequest(main_url=url, preset=request.preset) for url in request.urls
+    ]
+    if not agents:
+        raise HTTPException(status_code=400, detail="No urls provided")
+    if len(agents) > Config.BATCH_MAX_SIZE:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Batch too large: {len(agents)} > {Config.BATCH_MAX_SIZE}",
+        )
+    for agent in agents:
+        validate_agent_request(agent)
+
+    task_ids = [await task_manager.create_task() for _ in agents]
+    batch_id = await task_manager.create_batch(
+        task_ids, [agent.main_url for agent in agents]
+    )
+    batch_scheduler.submit(batch_id, zip(task_ids, agents))
+
+    return JSONResponse(
+        {
+            "batch_id": batch_id,
+            "total": len(task_ids),
+            "task_ids": task_ids,
+            "_links": {
+                "status": f"/batches/{batch_id}",
+                "events": f"/batches/{batch_id}/events",
+            },
+        }
+    )
+
+
+@app.get("/batches/{batch_id}")
+async def get_batch_status(batch_id: str):
+    validate_task_manager()
+    state = await task_manager.get_batch_state(batch_id)
+    if not state:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    return state
+
+
+@app.get("/batches/{batch_id}/events")
+async def batch_events(batch_id: str):
+    """Stream each agent's final state as it finishes, then the batch summary"""
+    validate_task_manager()
+    if not await task_manager.get_batch(batch_id):
+        raise HTTPException(status_code=404, detail="Batch not found")
+
+    async def event_generator():
+        sent = 0
+        try:
+            while True:
+                results = await task_manager.get_batch_results(batch_id, sent)
+                for result in results:
+                    yield {"event": "result", "data": json.dumps(result)}
+                sent += len(results)
+
+                summary = await task_manager.get_batch_state(batch_id)
+                yield {"event": "progress", "data": json.dumps(summary)}
+                if summary["done"] and sent >= summary["total"]:
+                    break
+                await asyncio.sleep(1)
+        except Exception as e:
+            logger.error(f"Batch SSE stream error: {str(e)}")
+            yield {"event": "error", "data": "Stream terminated unexpectedly"}
+
+    return EventSourceResponse(event_generator())
+
+
+async def run_batch_job(task_id: str, request: CreateAgentRequest):
+    """Scheduler entry point; skips tasks cancelled while queued"""
+    state = await task_manager.get_task_state(task_id)
+    if state and state["state"] == TaskState.CANCELLED.value:
+        return None
+    return await process_agent_creation(task_id, request)
+
+
+# -------------------
+# Cost Reports
+# -------------------
+@app.get("/costs/daily")
+async def get_daily_costs(date: Optional[str] = None, top: int = 10):
+    """Daily LLM cost totals by model and step, plus the most expensive tasks"""
+    validate_task_manager()
+    day = date or datetime.now(timezone.utc).strftime("%Y-%m-%d")
+    return await task_manager.get_daily_costs(day, top)
+
+
+# -------------------
+# Metrics
+# -------------------
+@app.get("/metrics")
+async def metrics():
+    """Prometheus exposition of step, scrape, LLM, Millis and queue metrics"""
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
+
+
 # -------------------
 # Task Status & SSE
 # -------------------
@@ -143,6 +307,52 @@ async def cancel_task(task_id: str):
     return JSONResponse({"status": "cancelled", "task_id": task_id})
 
 
+@app.get("/tasks/{task_id}/profile")
+async def get_task_profile(task_id: str, format: str = "json"):  # pylint: disable=redefined-builtin
+    """Profile of a job run with profiling on; format=collapsed for flame graph tools"""
+    validate_task_manager()
+    profile = await task_manager.get_profile(task_id)
+    if not profile:
+        raise HTTPException(status_code=404, detail="No profile for this task")
+    if format == "collapsed":
+        return PlainTextResponse(
+            profile["collapsed"],
+            headers={"Content-Disposition": f'attachment; filename="{task_id}.folded"'},
+        )
+    return JSONResponse(
+        profile,
+        headers={"Content-Disposition": f'attachment; filename="{task_id}-profile.json"'},
+    )
+
+
+@app.get("/tasks/{task_id}/artifacts")
+async def list_task_artifacts(task_id: str):
+    """Prompt, links and knowledge base files saved by a task"""
+    artifacts = await task_artifacts(task_id).list()
+    if not artifacts:
+        raise HTTPException(status_code=404, detail="No artifacts for this task")
+    return [
+        {"name": info.key.rsplit("/", 1)[-1], "size": info.size, "modified": info.modified}
+        for info in artifacts
+    ]
+
+
+@app.get("/tasks/{task_id}/artifacts/{name}")
+async def get_task_artifact(task_id: str, name: str):
+    try:
+        data = await task_artifacts(task_id).get_bytes(name)
+    except ValueError:
+        data = None
+    if data is None:
+        raise HTTPException(status_code=404, detail="Artifact not found")
+    media_type = "application/json" if name.endswith(".json") else "text/plain"
+    return Response(
+        data,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{name}"'},
+    )
+
+
 @app.get("/tasks/{task_id}/events")
 async def task_events(task_id: str):
     validate_task_manager()
@@ -172,34 +382,65 @@ async def task_events(task_id: str):
 @async_retry(retries=3, delay=1.0, exceptions=(httpx.HTTPError, TimeoutError))
 async def process_agent_creation(task_id: str, request: CreateAgentRequest):
     validate_task_manager()
+    profile = None
     try:
-        with LogContext(logger, "agent_creation", task_id, url=request.main_url):
+        with profile_job(
+            task_id, profiling_enabled(request.profile)
+        ) as profile, LogContext(
+            logger, "agent_creation", task_id, url=request.main_url
+        ), cost_scope(task_id), TaskTrace(
+            task_id, url=request.main_url
+        ) as task_trace:
+            cost_ledger.set_budget(
+                task_id,
+                TaskBudget.from_config(request.max_tokens, request.max_cost_usd),
+            )
+            # a retry shares the budget: earlier attempts' usage is on the task record
+            spent = (await task_manager.get_task_state(task_id) or {}).get("costs") or {}
+            cost_ledger.charge(
+                task_id,
+                spent.get("input_tokens", 0) + spent.get("output_tokens", 0),
+                spent.get("total_cost", 0.0),
+            )
+
             # Step 0: Initialize
+            task_trace.step("initialize")
             log_step(logger, task_id, "initialize", 0)
             await task_manager.update_progress(task_id, "initialize", 0)
 
             # Step 1: Agent Actions
+            task_trace.step("agent_actions")
             log_step(logger, task_id, "agent_actions", 10)
             await task_manager.update_progress(task_id, "agent_actions", 10)
-            system_prompt, important_links = await agent_action(request.main_url)
+            with cost_step("agent_exploration"):
+                system_prompt, important_links, company_name = await agent_action(
+                    request.main_url, thread_id=task_id
+                )
             if system_prompt == "-1":
                 raise ValueError("Failed to create system prompt")
 
             # Step 2: Knowledge Base
+            task_trace.step("knowledge_base")
             log_step(logger, task_id, "knowledge_base", 20)
             await task_manager.update_progress(task_id, "knowledge_base", 20)
-            kb = await get_knowledge_base(COMPANY_NAMES[0], important_links)
-
+            with cost_step("kb_refinement"):
+                kb = await get_knowledge_base(
+                    company_name, important_links, main_url=request.main_url
+                )
+            if not kb:
+                raise ValueError("Failed to create knowledge base")
+
+            task_trace.step("kb_description")
             log_step(logger, task_id, "kb_description", 30)
             await task_manager.update_progress(task_id, "kb_description", 30)
-            kb_description = await get_kb_description(
-                important_links, output_dir=f"agent_content/{COMPANY_NAMES[0]}"
-            )
+            with cost_step("kb_description"):
+                kb_description = await get_kb_description(important_links)
             if not kb_description:
                 raise ValueError("Failed to generate knowledge base description")
 
             # Step 3: Create Millis Assistant
-            assistant_name = request.assistant_name or COMPANY_NAMES[0]
+            assistant_name = request.assistant_name or company_name
+            task_trace.step("creating_assistant")
             log_step(logger, task_id, "creating_assistant", 40)
             await task_manager.update_progress(task_id, "creating_assistant", 40)
 
@@ -208,36 +449,44 @@ async def process_agent_creation(task_id: str, request: CreateAgentRequest):
                 agent_name=assistant_name,
                 prompt=system_prompt,
                 greeting_message=greeting_message,
+                preset=request.preset,
             )
             payload_json = payload.get_payload()
 
+            task_trace.step("creating_millis_agent")
             log_step(logger, task_id, "creating_millis_agent", 50)
             await task_manager.update_progress(task_id, "creating_millis_agent", 50)
-            assistant = await create_millis_assistant(payload_json, API_KEY)
+            assistant = await create_millis_assistant(payload_json, Config.MILLIS_API_KEY)
             assistant_id = assistant["id"]
 
             # Step 4: Upload KB to S3
+            task_trace.step("generating_presigned_url")
             log_step(logger, task_id, "generating_presigned_url", 60)
             await task_manager.update_progress(task_id, "generating_presigned_url", 60)
             file_name = f"{assistant_name}.txt"
-            presigned_data = await generate_presigned_url(API_KEY, file_name)
+            presigned_data = await generate_presigned_url(Config.MILLIS_API_KEY, file_name)
             s3_url = presigned_data["url"]
             s3_fields = presigned_data["fields"]
 
+            task_trace.step("uploading_to_s3")
             log_step(logger, task_id, "uploading_to_s3", 80)
             await task_manager.update_progress(task_id, "uploading_to_s3", 80)
             upload_resp = await upload_text_to_s3(s3_url, s3_fields, kb, file_name)
-            if upload_resp.status_code != 200:
+            # presigned POSTs answer 204 unless the policy sets success_action_status
+            if not upload_resp.is_success:
                 raise RuntimeError(f"S3 upload failed: {upload_resp.status_code}")
 
             # Step 5: Set Knowledge Base
+            task_trace.step("setting_knowledge_base")
             log_step(logger, task_id, "setting_knowledge_base", 90)
             await task_manager.update_progress(task_id, "setting_knowledge_base", 90)
             file_id = s3_fields.get("key", "").split("/")[-1]
             messages = [{"role": "system", "content": kb_description}]
-            await set_knowledge_base(API_KEY, assistant_id, file_id, messages)
+            await set_knowledge_base(Config.MILLIS_API_KEY, assistant_id, file_id, messages)
+            await task_manager.set_agent_id(task_id, assistant_id)
 
             # Complete
+            task_trace.step("complete")
             log_step(logger, task_id, "complete", 100)
             await task_manager.update_progress(task_id, "complete", 100)
             return assistant_id
@@ -250,3 +499,30 @@ async def process_agent_creation(task_id: str, request: CreateAgentRequest):
         await task_manager.set_error(task_id, str(e))
         logger.exception(f"Agent creation failed for task {task_id}")
         raise
+    finally:
+        await persist_task_costs(task_id, request.main_url)
+        if profile is not None:
+            await persist_task_profile(task_id, profile)
+
+
+async def persist_task_costs(task_id: str, url: str):
+    """Move a task's ledger entries onto its task record and the daily report"""
+    costs = cost_ledger.reset(task_id)
+    try:
+        await task_manager.record_costs(task_id, costs, url=url)
+    except Exception as e:
+        logger.error(f"Failed to persist costs for task {task_id}: {str(e)}")
+
+
+async def persist_task_profile(task_id: str, profile):
+    """Store a finished job profile next to its task"""
+    report = profile.report()
+    logger.info(
+        f"Profile of {task_id}: {report['seconds']}s, {report['on_loop_seconds']}s on the loop, "
+        f"loop lag p95 {report['loop_lag_ms']['p95']}ms, "
+        f"{len(report['slow_callbacks'])} slow callbacks"
+    )
+    try:
+        await task_manager.save_profile(task_id, report, ttl=Config.PROFILE_TTL_S)
+    except Exception as e:
+        logger.error(f"Failed to persist profile for task {task_id}: {str(e)}")
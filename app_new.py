@@ -7,7 +7,7 @@ from pydantic import BaseModel
 
 from src.core.config import Config
 from src.agent import agent_action, get_knowledge_base
-from src.agent_config.agent_tools import COMPANY_NAMES
+from src.logging.logger import setup_logger
 from src.scrape.llm import get_kb_description
 from src.utils.payloads import Payload
 from src.utils.functions import (
@@ -17,10 +17,14 @@ from src.utils.functions import (
     upload_text_to_s3,
 )
 
-API_KEY = Config.MILLIS_API_KEY
 app = FastAPI(title="millis voice assistant")
 
 
+@app.on_event("startup")
+async def startup_event():
+    setup_logger()
+
+
 class CreateAgentRequest(BaseModel):
     """Request model for creating an agent"""
 
@@ -40,18 +44,16 @@ async def create_agent(request: CreateAgentRequest):
             )
 
         # Step 1: Get system prompt and important links
-        system_prompt, important_links = await agent_action(request.main_url)
+        system_prompt, important_links, company_name = await agent_action(request.main_url)
         if system_prompt == "-1":
             raise HTTPException(
                 status_code=400, detail="Failed to create system prompt"
             )
 
         # Step 2: Get knowledge base content
-        assistant_name = request.assistant_name or COMPANY_NAMES[0]
-        kb = await get_knowledge_base(COMPANY_NAMES[0], important_links)
-        kb_description = await get_kb_description(
-            important_links, output_dir=f"agent_content/{COMPANY_NAMES[0]}"
-        )
+        assistant_name = request.assistant_name or company_name
+        kb = await get_knowledge_base(company_name, important_links)
+        kb_description = await get_kb_description(important_links)
 
         if not kb_description:
             raise HTTPException(
@@ -67,12 +69,12 @@ async def create_agent(request: CreateAgentRequest):
             model="gpt-4o",
         )
 
-        assistant = await create_millis_assistant(payload.get_payload(), API_KEY)
+        assistant = await create_millis_assistant(payload.get_payload(), Config.MILLIS_API_KEY)
         assistant_id = assistant["id"]
 
         # Step 4: Upload knowledge base to S3
         file_name = f"{assistant_name}.txt"
-        presigned_data = await generate_presigned_url(API_KEY, file_name)
+        presigned_data = await generate_presigned_url(Config.MILLIS_API_KEY, file_name)
         s3_upload_url = presigned_data["url"]
         s3_fields = presigned_data["fields"]
 
@@ -88,7 +90,9 @@ async def create_agent(request: CreateAgentRequest):
         # Step 5: Set knowledge base for the assistant
         file_id = s3_fields.get("key", "").split("/")[-1]
         messages = [{"role": "system", "content": kb_description}]
-        kb_response = await set_knowledge_base(API_KEY, assistant_id, file_id, messages)
+        kb_response = await set_knowledge_base(
+            Config.MILLIS_API_KEY, assistant_id, file_id, messages
+        )
 
         if kb_response.status_code != 200:
             raise HTTPException(
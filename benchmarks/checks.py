@@ -0,0 +1,186 @@
+"""Behaviour checks of the pipeline on the benchmark fakes
+
+    python -m benchmarks.checks
+
+Scenarios the timings cannot catch: each check runs one against the real
+pipeline code (browsers and chat models faked, see benchmarks/fakes.py) and
+returns the problems it found. `benchmarks.run` runs them before the
+pipeline and exits with status 1 when one fails.
+"""
+
+import asyncio
+import json
+import sys
+from contextlib import contextmanager
+from typing import Callable, Dict, List
+
+
+@contextmanager
+def patched(target, **attributes):
+    """Set module or class attributes for the block, restoring them after"""
+    previous = {name: getattr(target, name) for name in attributes}
+    for name, value in attributes.items():
+        setattr(target, name, value)
+    try:
+        yield
+    finally:
+        for name, value in previous.items():
+            setattr(target, name, value)
+
+
+# -------------------
+# Checks
+# -------------------
+async def check_crawl_budget(sites) -> List[str]:
+    """crawl_site fails, and stops its workers, once the task's llm budget is spent"""
+    # pylint: disable=import-outside-toplevel
+    from src.scrape import frontier
+    from src.track_cost.ledger import BudgetExceededError
+
+    root = sites.roots[0]
+    calls = {"ok": 0, "after_budget": 0}
+
+    async def scrape(url, refine_with_llm):  # pylint: disable=unused-argument
+        if calls["ok"] >= 2:
+            calls["after_budget"] += 1
+            raise BudgetExceededError("LLM budget exceeded for task check")
+        calls["ok"] += 1
+        await asyncio.sleep(0)
+        return "page text", sites.html(url)
+
+    async def fetch_robots(url):  # pylint: disable=unused-argument
+        return frontier.RobotsRules(None)
+
+    async def fetch_sitemap_urls(url, robots_txt=None):  # pylint: disable=unused-argument
+        return []
+
+    with patched(frontier, scrape=scrape, fetch_sitemap_urls=fetch_sitemap_urls), patched(
+        frontier.RobotsRules, fetch=staticmethod(fetch_robots)
+    ):
+        try:
+            result = await frontier.crawl_site(root, seeds=list(sites.files), concurrency=2)
+        except BudgetExceededError:
+            pass
+        else:
+            return [f"crawl_site returned {len(result.pages)} pages after the budget was spent"]
+    # every worker may have been mid-scrape when the first one failed
+    if calls["after_budget"] > 2:
+        return [f"crawl_site kept scraping after the budget was spent ({calls['after_budget']})"]
+    return []
+
+
+async def check_retry_budget(sites) -> List[str]:
+    """A retried job shares one llm budget across its attempts"""
+    # pylint: disable=import-outside-toplevel
+    import httpx
+    from fakeredis import aioredis
+
+    import app
+    from src.core.config import Config
+    from src.core.pipeline import TaskManager
+
+    async def create_millis_assistant(payload, api_key):  # pylint: disable=unused-argument
+        raise httpx.ConnectError("Millis is down")
+
+    async def tokens_of(task_id: str) -> int:
+        costs = (await app.task_manager.get_task_state(task_id)).get("costs") or {}
+        return costs.get("input_tokens", 0) + costs.get("output_tokens", 0)
+
+    url = sites.roots[0]
+    with patched(
+        app,
+        task_manager=TaskManager(aioredis.FakeRedis(decode_responses=True)),
+        create_millis_assistant=create_millis_assistant,
+    ), patched(Config, JOB_BUDGET_POLICY="stop"):
+        # what one attempt spends, failing after the llm steps
+        task_id = await app.task_manager.create_task()
+        try:
+            await app.process_agent_creation.__wrapped__(
+                task_id, app.CreateAgentRequest(main_url=url)
+            )
+        except httpx.ConnectError:
+            pass
+        attempt = await tokens_of(task_id)
+        if not attempt:
+            return ["a job attempt recorded no llm usage"]
+
+        # a budget one attempt fits in, with the retries of the decorator
+        max_tokens = int(attempt * 1.2)
+        task_id = await app.task_manager.create_task()
+        try:
+            await app.process_agent_creation(
+                task_id, app.CreateAgentRequest(main_url=url, max_tokens=max_tokens)
+            )
+        except Exception:  # pylint: disable=broad-exception-caught
+            pass
+        spent = await tokens_of(task_id)
+    # "stop" only checks before a call: the last call may end past the budget
+    if spent > max_tokens * 1.5:
+        return [f"retries spent {spent} tokens against a budget of {max_tokens}"]
+    return []
+
+
+async def check_payload_template(sites) -> List[str]:  # pylint: disable=unused-argument
+    """Editing a built payload never changes the cached preset template"""
+    # pylint: disable=import-outside-toplevel
+    from src.utils.payloads import Payload
+
+    first = json.dumps(Payload("agent", "prompt", "hello").get_payload())
+    for model in (None, "gpt-4o-mini"):
+        config = Payload("agent", "prompt", "hello", model=model).get_payload()["config"]
+        for section in ("llm", "voice", "flow"):
+            try:
+                config[section]["model"] = "edited"
+                config[section].clear()
+            except TypeError:
+                pass
+    again = json.dumps(Payload("agent", "prompt", "hello").get_payload())
+    if again != first:
+        return ["an edited payload changed the preset template of later payloads"]
+    return []
+
+
+CHECKS: Dict[str, Callable] = {
+    "crawl_budget": check_crawl_budget,
+    "retry_budget": check_retry_budget,
+    "payload_template": check_payload_template,
+}
+
+
+async def run_checks(sites) -> Dict[str, List[str]]:
+    """Problems found by every check, by check name"""
+    problems = {}
+    for name, check in CHECKS.items():
+        try:
+            problems[name] = await check(sites)
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            problems[name] = [f"{type(e).__name__}: {e}"]
+    return problems
+
+
+def main() -> int:
+    # pylint: disable=import-outside-toplevel
+    import os
+    import tempfile
+
+    from benchmarks import fakes
+    from benchmarks.run import prepare_environment
+    from src.logging.logger import setup_logger
+
+    prepare_environment("http://127.0.0.1:9")
+    workdir = tempfile.TemporaryDirectory(prefix="agent-checks-")
+    os.chdir(workdir.name)
+    setup_logger()
+    sites = fakes.FixtureSites()
+    fakes.install(sites, browser_latency=fakes.Latency(0.0), llm_latency=fakes.Latency(0.0))
+    failed = 0
+    for name, found in asyncio.run(run_checks(sites)).items():
+        print(f"{name}: {'ok' if not found else 'FAILED'}")
+        for problem in found:
+            print(f"  {problem}")
+        failed += bool(found)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,337 @@
+"""Deterministic stand-ins for the browsers and chat models used by the benchmarks
+
+Browsers serve the recorded pages under `benchmarks/fixtures` and chat models
+answer from a script; both sleep for a seeded, jittered latency so a run
+exercises the same awaits, task switching and CPU work as production, minus
+the network. `install()` swaps them into the pipeline modules and must run
+before the agent graph is built (`get_agent()`), which creates the
+exploration model.
+"""
+
+import asyncio
+import json
+import random
+import re
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.utils.function_calling import convert_to_openai_tool
+from markdownify import markdownify  # cSpell:disable-line
+from playwright.async_api import Error as PlaywrightError
+
+from src.agent_config.digest import count_tokens
+from src.core import prompts
+from src.scrape.links import canonical_url, site_of
+from src.track_cost.ledger import current_task_id
+
+FIXTURES_DIR = Path(__file__).parent / "fixtures"
+
+# seconds before jitter and scaling
+BROWSER_LATENCY = {"startup": 0.25, "fetch": 0.15}
+LLM_LATENCY = {"agent_exploration": 0.6, "kb_refinement": 1.2, "kb_description": 0.8}
+
+
+class Latency:
+    """Seeded latency source; scale 0 turns every wait into a bare yield"""
+
+    def __init__(self, scale: float = 1.0, jitter: float = 0.25, seed: int = 7):
+        self.scale = scale
+        self.jitter = jitter
+        self.random = random.Random(seed)
+
+    def sample(self, seconds: float) -> float:
+        return max(0.0, seconds * self.scale * self.random.uniform(1 - self.jitter, 1 + self.jitter))
+
+    async def wait(self, seconds: float):
+        await asyncio.sleep(self.sample(seconds))
+
+
+class FixtureSites:
+    """
+    Recorded pages by canonical url, from fixtures/sites.json
+
+    `page_scale` repeats the body of every page to stand in for the large
+    pages of real sites.
+    """
+
+    def __init__(self, directory: Path = FIXTURES_DIR, page_scale: int = 1):
+        self.page_scale = page_scale
+        with open(directory / "sites.json", "r", encoding="utf-8") as f:
+            self.sites: Dict[str, dict] = json.load(f)
+        self.files = {
+            canonical_url(url): directory / path
+            for site in self.sites.values()
+            for url, path in site["pages"].items()
+        }
+        self._html: Dict[str, str] = {}
+
+    @property
+    def roots(self) -> List[str]:
+        return list(self.sites)
+
+    def company(self, url: str) -> str:
+        site = site_of(url)
+        for root, details in self.sites.items():
+            if site_of(root) == site:
+                return details["company"]
+        return site.split(".")[0].title()
+
+    def pages(self) -> Dict[str, str]:
+        """url -> html of every recorded page"""
+        return {url: self.html(url) for url in self.files}
+
+    def html(self, url: str) -> Optional[str]:
+        url = canonical_url(url) or url
+        if url not in self.files:
+            return None
+        if url not in self._html:
+            html = self.files[url].read_text(encoding="utf-8")
+            if self.page_scale > 1:
+                html = re.sub(
+                    r"(<body[^>]*>)([\s\S]*)(</body>)",
+                    lambda m: m.group(1) + m.group(2) * self.page_scale + m.group(3),
+                    html,
+                    count=1,
+                )
+            self._html[url] = html
+        return self._html[url]
+
+
+# -------------------
+# Browsers
+# -------------------
+class _CrawlResult:
+    def __init__(self, html: Optional[str], markdown: Optional[str]):
+        self.html = html
+        self.markdown = markdown
+
+
+class FakeWebCrawler:
+    """crawl4ai.AsyncWebCrawler replaying fixtures; fails on a seeded share of urls"""
+
+    sites: FixtureSites = None
+    latency: Latency = None
+    failure_rate: float = 0.0
+    # the crawler's own html -> markdown work is not what the benchmark measures
+    _markdown: Dict[tuple, str] = {}
+
+    async def __aenter__(self):
+        await self.latency.wait(BROWSER_LATENCY["startup"])
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def arun(self, url: str, excluded_tags=(), **kwargs):  # pylint: disable=unused-argument
+        await self.latency.wait(BROWSER_LATENCY["fetch"])
+        html = self.sites.html(url)
+        # the same urls fail on every run, so both tiers are always exercised
+        if html is None or random.Random(url).random() < self.failure_rate:
+            return _CrawlResult(None, None)
+        return _CrawlResult(html, self.render(url, excluded_tags))
+
+    @classmethod
+    def render(cls, url: str, excluded_tags=()) -> str:
+        """Markdown of a recorded page, computed once per url and tag set"""
+        key = (canonical_url(url) or url, tuple(excluded_tags))
+        if key not in cls._markdown:
+            source = cls.sites.html(url)
+            for tag in excluded_tags:
+                source = re.sub(rf"<({tag})[\s\S]*?</\1>", "", source, flags=re.I)
+            cls._markdown[key] = markdownify(source)  # cSpell:disable-line
+        return cls._markdown[key]
+
+
+class _FakePage:
+    def __init__(self, sites: FixtureSites, latency: Latency):
+        self.sites = sites
+        self.latency = latency
+        self._html = ""
+
+    async def goto(self, url: str, timeout: float = None):  # pylint: disable=unused-argument
+        await self.latency.wait(BROWSER_LATENCY["fetch"])
+        html = self.sites.html(url)
+        if html is None:
+            raise PlaywrightError(f"net::ERR_NAME_NOT_RESOLVED at {url}")
+        self._html = html
+
+    async def content(self) -> str:
+        return self._html
+
+
+class _FakeBrowser:
+    def __init__(self, sites: FixtureSites, latency: Latency):
+        self.sites = sites
+        self.latency = latency
+
+    async def new_page(self):
+        return _FakePage(self.sites, self.latency)
+
+    async def close(self):
+        pass
+
+
+class _FakePlaywright:
+    def __init__(self, sites: FixtureSites, latency: Latency):
+        self.sites = sites
+        self.latency = latency
+        self.chromium = self
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def launch(self, **kwargs):  # pylint: disable=unused-argument
+        await self.latency.wait(BROWSER_LATENCY["startup"])
+        return _FakeBrowser(self.sites, self.latency)
+
+
+# -------------------
+# Chat models
+# -------------------
+def _text(message: BaseMessage) -> str:
+    return message.content if isinstance(message.content, str) else str(message.content)
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Scripted chat model with simulated latency and usage metadata
+
+    With tools bound it plays the exploration agent: create the company
+    directories, scrape the main url, save the candidate links and answer
+    with a prompt. Without tools it refines markdown (returns the first half)
+    or writes a knowledge base description, depending on the system prompt.
+    """
+
+    model: str = "fake"
+    sites: Any = None
+    latency: Any = None
+
+    @property
+    def _llm_type(self) -> str:
+        return "benchmark-fake"
+
+    def bind_tools(self, tools, **kwargs):
+        return self.bind(tools=[convert_to_openai_tool(tool) for tool in tools], **kwargs)
+
+    def _task(self, messages: List[BaseMessage], tools) -> str:
+        system = _text(messages[0]) if isinstance(messages[0], SystemMessage) else ""
+        if tools or system == prompts.SYSTEM_PROMPT:
+            return "agent_exploration"
+        if system == prompts.MARKDOWN_PROMPT:
+            return "kb_refinement"
+        return "kb_description"
+
+    def _respond(self, messages: List[BaseMessage], tools) -> AIMessage:
+        task = self._task(messages, tools)
+        human = [_text(m) for m in messages if isinstance(m, HumanMessage)]
+        if task == "kb_refinement":
+            page = human[-1] if human else ""
+            return AIMessage(content=page[: max(200, len(page) // 2)])
+        if task == "kb_description":
+            return AIMessage(
+                content="This knowledge base covers the company's services, pricing, "
+                "team, locations, opening hours and frequently asked questions."
+            )
+
+        task_text = human[0] if human else ""
+        url_match = re.search(r"Main URL: (\S+)", task_text)
+        url = url_match.group(1) if url_match else ""
+        done = {m.name for m in messages if isinstance(m, ToolMessage)}
+        if tools and "create_directory" not in done:
+            # one directory per job, so concurrent runs on a fixture never clear each other
+            company = self.sites.company(url)
+            task_id = current_task_id.get()
+            if task_id != "global":
+                company = f"{company} {task_id[-6:]}"
+            call = ("create_directory", {"company_name": company})
+        elif tools and "scrape_and_clean" not in done:
+            call = ("scrape_and_clean", {"url": url})
+        elif tools and "save_links" not in done:
+            candidates = re.findall(r"^- (\S+)", task_text, flags=re.M)
+            call = ("save_links", {"values": candidates[:8] or [url]})
+        else:
+            company = self.sites.company(url)
+            return AIMessage(
+                content=f"You are the voice assistant of {company}. Greet callers, answer "
+                "questions about services, prices and opening hours from the knowledge "
+                "base, and offer to book an appointment or a callback."
+            )
+        name, args = call
+        return AIMessage(
+            content="",
+            tool_calls=[{"name": name, "args": args, "id": f"call_{name}_{len(messages)}"}],
+        )
+
+    def _result(self, messages: List[BaseMessage], tools) -> ChatResult:
+        message = self._respond(messages, tools)
+        input_tokens = sum(count_tokens(_text(m)) for m in messages)
+        output_tokens = count_tokens(_text(message)) + 10 * len(message.tool_calls)
+        message.usage_metadata = {
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "total_tokens": input_tokens + output_tokens,
+        }
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        tools = kwargs.get("tools")
+        time.sleep(self.latency.sample(LLM_LATENCY[self._task(messages, tools)]))
+        return self._result(messages, tools)
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        tools = kwargs.get("tools")
+        await self.latency.wait(LLM_LATENCY[self._task(messages, tools)])
+        return self._result(messages, tools)
+
+
+def install(
+    sites: FixtureSites,
+    browser_latency: Latency,
+    llm_latency: Latency,
+    crawl4ai_failure_rate: float = 0.0,
+):
+    """Route browsers and chat models of the pipeline to the fakes"""
+    # pylint: disable=import-outside-toplevel
+    from src.core import llm_clients, model_router
+    from src.scrape import scrape
+
+    FakeWebCrawler.sites = sites
+    FakeWebCrawler.latency = browser_latency
+    FakeWebCrawler.failure_rate = crawl4ai_failure_rate
+    FakeWebCrawler._markdown.clear()  # pylint: disable=protected-access
+    # render up front (the tag sets `scrape()` asks for) so it stays out of the timings
+    for url in sites.files:
+        for excluded_tags in ((), ("header", "footer")):
+            FakeWebCrawler.render(url, excluded_tags)
+    scrape.AsyncWebCrawler = FakeWebCrawler
+    scrape.async_playwright = lambda: _FakePlaywright(sites, browser_latency)
+
+    models: Dict[str, FakeChatModel] = {}
+
+    def fake_chat_model(model: str) -> FakeChatModel:
+        if model not in models:
+            models[model] = FakeChatModel(model=model, sites=sites, latency=llm_latency)
+        return models[model]
+
+    llm_clients.get_chat_model = fake_chat_model
+    model_router._routed.cache_clear()  # pylint: disable=protected-access
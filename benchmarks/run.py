@@ -0,0 +1,532 @@
+"""End-to-end benchmark of the agent-creation pipeline on recorded fixtures
+
+Recorded sites are replayed through the real scrape/clean/agent/KB code with
+scripted chat models (see benchmarks/fakes.py) and the fake Millis server, so
+runs are repeatable and cost nothing:
+
+    python -m benchmarks.run --agents 8 --concurrency 4
+    python -m benchmarks.run --save-baseline
+
+Reports throughput, p50/p95 per pipeline step and per cleaning function, peak
+RSS, and the import and cold-start time of a fresh `app` process; exits with
+status 1 when a metric is worse than the baseline by more than the tolerance,
+when startup is over its budget, when `import app` loads a dependency that
+should only load on first use, or when a behaviour check (benchmarks/checks.py)
+fails.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import re
+import resource
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List
+
+ROOT = Path(__file__).resolve().parent.parent
+DEFAULT_BASELINE = Path(__file__).parent / "baseline.json"
+
+# below these a change is noise, whatever the relative tolerance says
+ABSOLUTE_FLOORS = {"ms": 2.0, "mb": 10.0}
+# a tail percentile of fewer samples is mostly the slowest one, too noisy to gate on
+MIN_TAIL_SAMPLES = {"p95_ms": 20, "p99_ms": 100}
+# loaded by the warm-up or the first job, never by `import app`
+LAZY_MODULES = (
+    "crawl4ai", "langgraph", "langchain_openai", "langchain_google_genai", "openai",
+    "google.genai",
+)  # fmt: skip
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered) + 0.5) - 1))
+    return ordered[index]
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    return {
+        "samples": len(samples),
+        "p50_ms": round(percentile(samples, 50) * 1000, 2),
+        "p95_ms": round(percentile(samples, 95) * 1000, 2),
+    }
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def prepare_environment(millis_url: str):
+    """Settings the pipeline reads, kept offline and quiet"""
+    defaults = {
+        "OPENAI_API_KEY": "benchmark",
+        "GEMINI_API_KEY": "benchmark",
+        "MILLIS_API_KEY": "benchmark",  # cSpell:disable-line
+        "OPENAI_MODEL_NAME": "gpt-4",
+        "LOG_LEVEL": "WARNING",
+        "LOG_CONSOLE_LEVEL": "CRITICAL",
+        "LINK_USE_SITEMAP": "false",
+        "KB_CRAWL_ENABLED": "false",
+    }
+    for key, value in defaults.items():
+        os.environ.setdefault(key, value)
+    os.environ["MILLIS_API_URL"] = millis_url
+    os.environ["MILLIS_EU_API_URL"] = millis_url
+    if str(ROOT) not in sys.path:
+        sys.path.insert(0, str(ROOT))
+
+
+# -------------------
+# Micro benchmarks
+# -------------------
+async def run_micro(sites, repeat: int) -> Dict[str, Dict[str, float]]:
+    """p50/p95 of the cleaning functions and of a zero-latency scrape, all pages pooled"""
+    # pylint: disable=import-outside-toplevel
+    from src.scrape.convert import html_to_kb_text
+    from src.scrape.scrape import clean_text_for_prompt, scrape
+
+    samples = defaultdict(list)
+    pages = sites.pages()
+    for _ in range(repeat):
+        for url, html in pages.items():
+            started = time.perf_counter()
+            await clean_text_for_prompt(html)
+            samples["clean_text_for_prompt"].append(time.perf_counter() - started)
+
+            started = time.perf_counter()
+            html_to_kb_text(html)
+            samples["clean_text_for_kb"].append(time.perf_counter() - started)
+
+            started = time.perf_counter()
+            await scrape(url, refine_with_llm=False)
+            samples["scrape_prompt"].append(time.perf_counter() - started)
+    return {name: summarize(values) for name, values in samples.items()}
+
+
+# -------------------
+# Startup
+# -------------------
+_IMPORT_TIME = re.compile(r"^import time:\s+\d+ \|\s+(\d+) \| ( *)(\S+)$")
+
+# a fresh interpreter: import app, then the warm-up app startup schedules
+_COLD_START = """
+import asyncio, json, time
+started = time.perf_counter()
+import app
+from src import agent
+imported = time.perf_counter()
+asyncio.run(agent.warm_up())
+print(json.dumps({
+    "import_s": imported - started,
+    "warm_up_s": time.perf_counter() - imported,
+    "ready": agent._agent is not None,
+}))
+"""
+
+
+def import_app() -> tuple:
+    """Cumulative `-X importtime` seconds of `import app` and every module it loads"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app"],
+        capture_output=True,
+        text=True,
+        check=True,
+        env={**os.environ, "PYTHONPATH": str(ROOT)},
+    )
+    seconds, modules = 0.0, set()
+    for line in result.stderr.splitlines():
+        match = _IMPORT_TIME.match(line)
+        if match:
+            modules.add(match.group(3))
+            if match.group(3) == "app" and not match.group(2):
+                seconds = int(match.group(1)) / 1e6
+    return seconds, modules
+
+
+def import_app_without_env() -> bool:
+    """Whether `import app` succeeds with none of the settings set (Config loads on first use)"""
+    env = {key: os.environ[key] for key in ("PATH", "HOME") if key in os.environ}
+    result = subprocess.run(
+        [sys.executable, "-c", "import app"],
+        capture_output=True,
+        check=False,
+        env={**env, "PYTHONPATH": str(ROOT)},
+    )
+    return result.returncode == 0
+
+
+def cold_start() -> dict:
+    """Seconds from process launch to an importable app and to a compiled agent graph"""
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-c", _COLD_START],
+        capture_output=True,
+        text=True,
+        check=True,
+        env={**os.environ, "PYTHONPATH": str(ROOT)},
+    )
+    timings = json.loads(result.stdout.strip().splitlines()[-1])
+    timings["total_s"] = time.perf_counter() - started
+    return timings
+
+
+def run_startup(repeat: int) -> dict:
+    """Median import and cold-start times of `repeat` fresh processes"""
+    imports, modules = [], set()
+    for _ in range(repeat):
+        seconds, modules = import_app()
+        imports.append(seconds)
+    starts = [cold_start() for _ in range(repeat)]
+
+    def median_ms(key: str) -> float:
+        return round(statistics.median(start[key] for start in starts) * 1000, 1)
+
+    return {
+        "import_app_ms": round(statistics.median(imports) * 1000, 1),
+        "cold_start_ms": median_ms("total_s"),
+        "warm_up_ms": median_ms("warm_up_s"),
+        "warm_up_failed": sum(1 for start in starts if not start["ready"]),
+        "imports_without_env": import_app_without_env(),
+        "eager_modules": [name for name in LAZY_MODULES if name in modules],
+    }
+
+
+# -------------------
+# Pipeline benchmark
+# -------------------
+def start_millis_server(port: int, latency_ms: float, seed: int):
+    """Fake Millis/S3 server on its own thread and loop, off the measured one"""
+    # pylint: disable=import-outside-toplevel
+    import uvicorn
+
+    from src.millis_services.fake_server import FakeSettings, create_app
+
+    settings = FakeSettings(
+        latency_ms=latency_ms,
+        jitter_ms=latency_ms / 4,
+        public_url=f"http://127.0.0.1:{port}",
+        seed=seed,
+    )
+    server = uvicorn.Server(
+        uvicorn.Config(create_app(settings), host="127.0.0.1", port=port, log_level="warning")
+    )
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    deadline = time.monotonic() + 10
+    while not server.started:
+        if time.monotonic() > deadline:
+            raise RuntimeError("fake Millis server did not start")
+        time.sleep(0.02)
+    return server, thread
+
+
+async def run_pipeline(sites, agents: int, concurrency: int) -> dict:
+    """Run `agents` agent-creation jobs, `concurrency` at a time"""
+    # pylint: disable=import-outside-toplevel
+    from fakeredis import aioredis
+
+    import app
+    from src.agent import get_agent
+    from src.core.pipeline import TaskManager
+    from src.monitoring.metrics import LoopLagMonitor
+    from src.scrape.convert import warm_convert_pool
+
+    marks: Dict[str, List[tuple]] = defaultdict(list)
+
+    class BenchTaskManager(TaskManager):
+        """TaskManager that keeps the time of every step change"""
+
+        async def update_progress(self, task_id: str, step: str, progress: float):
+            marks[task_id].append((step, time.perf_counter()))
+            await super().update_progress(task_id, step, progress)
+
+    app.task_manager = BenchTaskManager(aioredis.FakeRedis(decode_responses=True))
+    # graph compilation is a one-off per process, not part of a job
+    await get_agent()
+
+    semaphore = asyncio.Semaphore(concurrency)
+    job_seconds: List[float] = []
+    failures: List[str] = []
+
+    async def job(url: str):
+        async with semaphore:
+            task_id = await app.task_manager.create_task()
+            started = time.perf_counter()
+            try:
+                await app.process_agent_creation(task_id, app.CreateAgentRequest(main_url=url))
+            except Exception as e:  # pylint: disable=broad-exception-caught
+                failures.append(f"{url}: {e}")
+                return
+            job_seconds.append(time.perf_counter() - started)
+
+    roots = sites.roots
+    # as app startup does
+    await warm_convert_pool()
+    # blocking work on the loop delays every other job's progress updates
+    loop_lag = LoopLagMonitor(interval=0.01)
+    loop_lag.start()
+    started = time.perf_counter()
+    await asyncio.gather(*(job(roots[i % len(roots)]) for i in range(agents)))
+    wall = time.perf_counter() - started
+    await loop_lag.stop()
+
+    step_seconds = defaultdict(list)
+    for task_marks in marks.values():
+        for (step, at), (_, next_at) in zip(task_marks, task_marks[1:]):
+            step_seconds[step].append(next_at - at)
+
+    return {
+        "agents": agents,
+        "concurrency": concurrency,
+        "ok": len(job_seconds),
+        "failed": len(failures),
+        "failures": failures,
+        "wall_s": round(wall, 2),
+        "throughput_agents_per_min": round(len(job_seconds) / wall * 60, 2) if wall else 0.0,
+        "job": summarize(job_seconds),
+        "loop_lag": {
+            **summarize(list(loop_lag.lags)),
+            "p99_ms": round(percentile(list(loop_lag.lags), 99) * 1000, 2),
+            "max_ms": round(max(loop_lag.lags, default=0.0) * 1000, 2),
+        },
+        "steps": {step: summarize(values) for step, values in step_seconds.items()},
+    }
+
+
+# -------------------
+# Baseline comparison
+# -------------------
+def flatten(report: dict, prefix: str = "") -> Dict[str, float]:
+    """Comparable numbers of a report as dotted keys"""
+    flat = {}
+    for key, value in report.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten(value, f"{name}."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = float(value)
+    return flat
+
+
+def compare(report: dict, baseline: dict, tolerance: float) -> List[str]:
+    """Metrics worse than the baseline by more than the tolerance"""
+    current, previous = flatten(report["metrics"]), flatten(baseline["metrics"])
+    regressions = []
+    for name, base in previous.items():
+        if name not in current:
+            continue
+        value = current[name]
+        if "throughput" in name:
+            if value < base * (1 - tolerance):
+                regressions.append(f"{name}: {value} < {base} (-{tolerance:.0%})")
+            continue
+        # a maximum is a single sample: reported, never gated
+        if not name.endswith(("_ms", "_mb")) or name.endswith("max_ms"):
+            continue
+        tail = name.rsplit(".", 1)[-1]
+        if tail in MIN_TAIL_SAMPLES:
+            samples = current.get(name[: -len(tail)] + "samples", 0)
+            if samples < MIN_TAIL_SAMPLES[tail]:
+                continue
+        floor = ABSOLUTE_FLOORS[name.rsplit("_", 1)[1]]
+        if value > base * (1 + tolerance) and value - base > floor:
+            regressions.append(f"{name}: {value} > {base} (+{tolerance:.0%})")
+    return regressions
+
+
+def check_startup(startup: dict, import_budget_ms: float, cold_start_budget_ms: float) -> List[str]:
+    """Startup over its budgets, or loading at import what should load on first use"""
+    problems = []
+    if startup["import_app_ms"] > import_budget_ms:
+        problems.append(f"import app {startup['import_app_ms']}ms > {import_budget_ms}ms budget")
+    if startup["cold_start_ms"] > cold_start_budget_ms:
+        problems.append(
+            f"cold start {startup['cold_start_ms']}ms > {cold_start_budget_ms}ms budget"
+        )
+    if startup["eager_modules"]:
+        problems.append(f"import app loads {', '.join(startup['eager_modules'])}")
+    if not startup["imports_without_env"]:
+        problems.append("import app fails without the settings in the environment")
+    if startup["warm_up_failed"]:
+        problems.append(f"warm-up failed in {startup['warm_up_failed']} processes")
+    return problems
+
+
+def print_report(report: dict):
+    metrics = report["metrics"]
+    startup = metrics.get("startup")
+    if startup:
+        print(
+            f"startup: import app {startup['import_app_ms']}ms, "
+            f"cold start {startup['cold_start_ms']}ms (warm-up {startup['warm_up_ms']}ms)"
+        )
+    pipeline = metrics["pipeline"]
+    print(
+        f"pipeline: {pipeline['ok']}/{pipeline['agents']} agents in {pipeline['wall_s']}s, "
+        f"{pipeline['throughput_agents_per_min']} agents/min, "
+        f"job p50 {pipeline['job']['p50_ms']}ms p95 {pipeline['job']['p95_ms']}ms, "
+        f"loop lag p95 {pipeline['loop_lag']['p95_ms']}ms p99 {pipeline['loop_lag']['p99_ms']}ms "
+        f"max {pipeline['loop_lag']['max_ms']}ms"
+    )
+    for step, values in pipeline["steps"].items():
+        print(f"  {step:<26} p50 {values['p50_ms']:>9}ms  p95 {values['p95_ms']:>9}ms")
+    for failure in pipeline["failures"]:
+        print(f"  failed: {failure}")
+    print("micro:")
+    for name, values in metrics["micro"].items():
+        print(f"  {name:<26} p50 {values['p50_ms']:>9}ms  p95 {values['p95_ms']:>9}ms")
+    print(f"peak rss: {metrics['peak_rss_mb']}MB")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n", 1)[0])
+    parser.add_argument("--agents", type=int, default=8)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--llm-latency-scale", type=float, default=1.0)
+    parser.add_argument("--browser-latency-scale", type=float, default=1.0)
+    parser.add_argument("--millis-latency-ms", type=float, default=80.0)
+    parser.add_argument("--crawl4ai-failure-rate", type=float, default=0.2)
+    parser.add_argument("--micro-repeat", type=int, default=20)
+    parser.add_argument(
+        "--startup-repeat", type=int, default=3, help="fresh processes timed, 0 to skip"
+    )
+    parser.add_argument("--import-budget-ms", type=float, default=2500.0)
+    parser.add_argument("--cold-start-budget-ms", type=float, default=8000.0)
+    parser.add_argument(
+        "--page-scale", type=int, default=1, help="repeat each fixture page body N times"
+    )
+    parser.add_argument(
+        "--convert-processes", type=int, default=None, help="override CONVERT_PROCESSES"
+    )
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    port = free_port()
+    if args.convert_processes is not None:
+        os.environ["CONVERT_PROCESSES"] = str(args.convert_processes)
+    prepare_environment(f"http://127.0.0.1:{port}")
+
+    # the pipeline writes content/, markdown_content/ and logs/ under the cwd
+    workdir = tempfile.TemporaryDirectory(prefix="agent-bench-")
+    os.chdir(workdir.name)
+    # before this process imports anything, and without the fakes
+    startup = run_startup(args.startup_repeat) if args.startup_repeat else None
+
+    # pylint: disable=import-outside-toplevel
+    from benchmarks import fakes
+    from benchmarks.checks import run_checks
+    from src.logging.logger import setup_logger
+    from src.scrape.convert import shutdown_convert_pool
+    from src.utils.http_client import close_http_client
+
+    # route module loggers to the log file before the first scrape, as the app does
+    setup_logger()
+    sites = fakes.FixtureSites(page_scale=args.page_scale)
+    # micro benchmarks run without simulated latency, the pipeline with it
+    browser_latency = fakes.Latency(0.0, seed=args.seed)
+    llm_latency = fakes.Latency(0.0, seed=args.seed + 1)
+    fakes.install(
+        sites,
+        browser_latency=browser_latency,
+        llm_latency=llm_latency,
+        crawl4ai_failure_rate=args.crawl4ai_failure_rate,
+    )
+    server, thread = start_millis_server(port, args.millis_latency_ms, args.seed)
+
+    async def run():
+        checks = await run_checks(sites)
+        micro = await run_micro(sites, args.micro_repeat)
+        browser_latency.scale = args.browser_latency_scale
+        llm_latency.scale = args.llm_latency_scale
+        pipeline = await run_pipeline(sites, args.agents, args.concurrency)
+        await close_http_client()
+        shutdown_convert_pool()
+        return checks, micro, pipeline
+
+    try:
+        checks, micro, pipeline = asyncio.run(run())
+    finally:
+        server.should_exit = True
+        thread.join(timeout=5)
+        os.chdir(ROOT)
+        workdir.cleanup()
+
+    report = {
+        "settings": {
+            key: value
+            for key, value in vars(args).items()
+            if key not in ("baseline", "save_baseline", "json", "tolerance")
+            and not key.endswith("_budget_ms")
+        },
+        "python": sys.version.split()[0],
+        "metrics": {"pipeline": pipeline, "micro": micro, "peak_rss_mb": peak_rss_mb()},
+    }
+    if startup:
+        report["metrics"]["startup"] = startup
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+    failures = [
+        f"STARTUP {problem}"
+        for problem in (
+            check_startup(startup, args.import_budget_ms, args.cold_start_budget_ms)
+            if startup
+            else []
+        )
+    ]
+    failures += [f"CHECK {name}: {problem}" for name, found in checks.items() for problem in found]
+    for failure in failures:
+        print(failure)
+
+    if args.save_baseline:
+        report["metrics"]["pipeline"].pop("failures")
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+            f.write("\n")
+        print(f"baseline saved to {args.baseline}")
+        return 1 if failures else 0
+
+    if not args.baseline.exists():
+        print(f"no baseline at {args.baseline}, run with --save-baseline first")
+        return 1 if failures else 0
+    with open(args.baseline, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    if baseline.get("settings") != report["settings"]:
+        print("warning: baseline was recorded with different settings")
+    regressions = compare(report, baseline, args.tolerance)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    if pipeline["failed"]:
+        print(f"REGRESSION {pipeline['failed']} jobs failed")
+    return 1 if regressions or pipeline["failed"] or failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
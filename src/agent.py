@@ -1,91 +1,207 @@
 """agent functionality"""
 
 import asyncio
+import importlib
+import time
+import uuid
 
-from langchain.chat_models import init_chat_model
+from langchain_core.prompts import ChatPromptTemplate
 
-from src.agent_config.agent_graph import AgentGraph
+from src.logging.logger import logger
 from src.agent_config.agent_tools import (
-    COMPANY_NAMES,
-    IMPORTANT_LINKS,
     create_directory,
+    exploration_run,
+    read_page,
     save_links,
     scrape_and_clean,
+    store_links,
 )
-from src.scrape.scrape import scrape_urls
+from src.scrape.frontier import crawl_site
+from src.scrape.links import candidate_links, canonical_url
+from src.scrape.scrape import load_crawler, scrape, scrape_urls
+from src.storage.artifacts import task_artifacts
 from src.core.config import Config
-from src.core.prompts import FIXED_PROMPT, SYSTEM_PROMPT
-from src.track_cost.cost_tracking_llm import CostTrackingLLM
-
-llm = init_chat_model(
-    "google_genai:gemini-2.5-flash",
-    model_kwargs={
-        "api_key": Config.GEMINI_API_KEY,
-        "streaming": True,
-    },
+from src.core.model_router import get_model_router
+from src.core.prompts import (
+    AGENT_TASK_PROMPT,
+    FIXED_PROMPT,
+    PROMPT_CACHE_KEYS,
+    SYSTEM_PROMPT,
 )
 
+tools = [scrape_and_clean, read_page, save_links, create_directory]
+agent_prompt_template = ChatPromptTemplate.from_messages(
+    [("system", SYSTEM_PROMPT), ("human", AGENT_TASK_PROMPT)]
+)
 
-cost_tracking_llm = CostTrackingLLM(llm)
-tools = [scrape_and_clean, save_links, create_directory]
+# langgraph and the chat model clients load with the first agent rather than
+# at import; app.py builds it in the background at startup
+_agent = None
+_limits = None
+_agent_lock = asyncio.Lock()
+
+
+def _make_checkpointer():
+    if Config.AGENT_CHECKPOINTER == "memory":
+        from langgraph.checkpoint.memory import MemorySaver  # pylint: disable=import-outside-toplevel
+
+        return MemorySaver()
+    if Config.AGENT_CHECKPOINTER:
+        raise ValueError(f"Unknown agent checkpointer: {Config.AGENT_CHECKPOINTER}")
+    return None
+
+
+async def get_agent():
+    "compiled agent graph, built on first use and shared by every run"
+    global _agent, _limits
+    if _agent is not None:
+        return _agent
+    async with _agent_lock:
+        if _agent is None:
+            # pylint: disable=import-outside-toplevel
+            from src.agent_config.agent_graph import AgentGraph, ExplorationLimits
+
+            _limits = ExplorationLimits.from_config()
+            agent_graph = AgentGraph(
+                get_model_router().llm_for("agent_exploration"),
+                tools,
+                limits=_limits,
+                call_kwargs={"prompt_cache_key": PROMPT_CACHE_KEYS["agent_exploration"]},
+            )
+            _agent = await agent_graph.create_agent(checkpointer=_make_checkpointer())
+            logger.info("Agent graph compiled")
+    return _agent
+
+
+def _preload():
+    "imports and clients of the first job; slow, so run off the event loop"
+    importlib.import_module("src.agent_config.agent_graph")
+    load_crawler()
+    get_model_router().llm_for("agent_exploration")
+
+
+async def warm_up():
+    "load the crawler, the chat model clients and the agent graph before the first job"
+    started = time.perf_counter()
+    try:
+        await asyncio.to_thread(_preload)
+        await get_agent()
+    except Exception as e:  # pylint: disable=broad-exception-caught
+        logger.error(f"Warm-up failed, loading on first use instead: {e}")
+        return
+    logger.info(f"Warm-up done in {time.perf_counter() - started:.2f}s")
+
+
+async def prefetch_candidates(url, run):
+    "fetch the main page once and rank its links for the agent to confirm"
+    cleaned, html = await scrape(url, refine_with_llm=False)
+    if cleaned:
+        # served to scrape_and_clean without a second fetch
+        run.pages[canonical_url(url) or url] = cleaned
+    if not html:
+        return []
+    ranked = await candidate_links(
+        url, html, limit=Config.LINK_CANDIDATES_MAX, use_sitemap=Config.LINK_USE_SITEMAP
+    )
+    run.link_candidates = [link.url for link in ranked]
+    return ranked
 
 
-async def agent_action(url):
-    "agent to create system prompt and provide urls for knowledge base"
+async def agent_action(url, thread_id=None):
+    """
+    agent to create system prompt and provide urls for knowledge base
 
-    try:
-        agent_graph = AgentGraph(cost_tracking_llm, tools)
-        agent = await agent_graph.create_agent()
-        print("agent created")
-        print("*" * 20)
-        prompt = f"""
-        Go through the URL and give prompt like as above give reference:
-        Main URL: {url}
-        if you didn't get info in main url, use links from the scraped content by observing endpoints.
-        save important links using tool before giving final output.
-        """
-
-        # Initialize messages
-        messages = [
-            {"role": "system", "content": SYSTEM_PROMPT},
-            {"role": "user", "content": prompt},
-        ]
+    Returns the system prompt, the important links and the company name
+    picked by the agent. Every call is a checkpointer thread of its own,
+    `thread_id` (usually the task id) plus a random suffix, so a retried task
+    starts a fresh exploration instead of resuming the failed one; the thread
+    is deleted when the call ends.
+    """
 
+    agent = None
+    run_thread = f"{thread_id or 'run'}:{uuid.uuid4().hex[:8]}"
+    try:
+        agent = await get_agent()
         # Invoke agent with proper async configuration
-        config = {"configurable": {"thread_id": "1"}}
-        result = await agent.ainvoke({"messages": messages}, config=config)
+        config = {
+            "configurable": {"thread_id": run_thread},
+            "recursion_limit": _limits.recursion_limit,
+        }
+        with exploration_run() as run:
+            candidates = await prefetch_candidates(url, run)
+            # stable system prefix first, the url and candidates only in the last message
+            messages = agent_prompt_template.format_messages(
+                url=url,
+                candidates="\n".join(
+                    f"- {link.url} ({link.category})" for link in candidates
+                )
+                or "none found, look for links in the scraped content",
+            )
+            # the graph finalizes on its own once the wall time is spent; the
+            # timeout only guards against a single call that never returns
+            result = await asyncio.wait_for(
+                agent.ainvoke({"messages": messages}, config=config),
+                timeout=_limits.max_wall_time + 60,
+            )
+        if not run.company_name:
+            raise ValueError("Agent finished without creating the company directories")
+        from src.agent_config.agent_graph import exploration_stats  # pylint: disable=import-outside-toplevel
+
+        logger.info(f"Exploration stats for {url}: {exploration_stats(result)}")
+        if not run.important_links.get("links") and run.link_candidates:
+            logger.info(f"Agent saved no links for {url}, keeping the ranked candidates")
+            store_links(run, run.link_candidates)
+
+        artifacts = task_artifacts()
+        await artifacts.put_text(
+            "links_opened.txt", "".join(f"{link},\n" for link in run.links_opened)
+        )
+        await artifacts.put_json(
+            "important_links.json", {"links": run.important_links.get("links", [])}
+        )
 
         # Process result
         assistant_prompt = result["messages"][-1].content
 
-        lst = assistant_prompt.split("\n")
-        assistant_prompt = lst[0] + "\n" + FIXED_PROMPT + "\n".join(lst[1:])
-        print(COMPANY_NAMES)
-        with open(f"content/{COMPANY_NAMES[0]}/prompt.txt", "w", encoding="utf-8") as f:
-            f.write(assistant_prompt)
-
-        print(f"System prompt saved: content/{COMPANY_NAMES[0]}/prompt.txt")
+        if assistant_prompt.strip() == "-1":
+            return "-1", run.important_links, run.company_name
+        # fixed instructions lead so the deployed prompt shares a cacheable prefix
+        assistant_prompt = FIXED_PROMPT.strip() + "\n\n" + assistant_prompt.strip()
+        await artifacts.put_text("prompt.txt", assistant_prompt)
 
-        return assistant_prompt, IMPORTANT_LINKS
+        return assistant_prompt, run.important_links, run.company_name
 
     except Exception as e:
-        print(f"Error in agent_action: {str(e)}")
+        logger.error(f"Error in agent_action: {str(e)}")
         raise
+    finally:
+        # the checkpointer would otherwise keep every run's messages for good
+        if agent is not None and agent.checkpointer:
+            await agent.checkpointer.adelete_thread(run_thread)
     
 
 
-def get_knowledge_base(company_name, important_links):
+async def get_knowledge_base(company_name, important_links, main_url=None):
     "scrape and clean links for knowledge base"
 
-    kb = asyncio.run(
-        scrape_urls(
-            important_links["links"],
+    links = important_links["links"]
+    if Config.KB_CRAWL_ENABLED:
+        crawl = await crawl_site(
+            main_url or links[0],
+            seeds=links,
+            max_pages=Config.KB_CRAWL_MAX_PAGES,
+            max_depth=Config.KB_CRAWL_MAX_DEPTH,
+            time_budget=Config.KB_CRAWL_TIME_BUDGET_S,
+            concurrency=Config.SCRAPE_CONCURRENCY,
+            output_dir=f"markdown_content/{company_name}/kb",
+        )
+        kb = "".join(text for _, text in crawl.pages)
+    else:
+        kb = await scrape_urls(
+            links,
             refine_with_llm=True,
-            output_dir=f"/{company_name}",
+            output_dir=f"markdown_content/{company_name}/kb",
         )
-    )
-    print("length of knowledge base : ", len(kb))
-    with open(f"content/{company_name}/kb.txt", "w", encoding="utf-8") as f:
-        f.write(kb)
-    print(f"knowledge base stored : content/{company_name}/kb.txt")
+    logger.info(f"length of knowledge base: {len(kb)}")
+    await task_artifacts().put_text("kb.txt", kb)
     return kb
@@ -1,47 +1,203 @@
+import logging
+import time
+from dataclasses import dataclass
+from typing import Annotated
+
+from langchain_core.messages import HumanMessage, ToolMessage
+from langchain_core.runnables import RunnableLambda
 from langgraph.graph import StateGraph, START, END
 from langgraph.graph.message import add_messages
-from langgraph.prebuilt import ToolNode, tools_condition
+from langgraph.prebuilt import ToolNode
 from typing_extensions import TypedDict
-from typing import Annotated
+
+from src.agent_config.digest import compact_history
+from src.core.config import Config
+
+logger = logging.getLogger(__name__)
+
+FINALIZE_PROMPT = (
+    "Exploration budget reached. Do not call any more tools. "
+    "Give the final answer now using the information gathered so far."
+)
+
 
 class State(TypedDict):
     messages: Annotated[list, add_messages]
+    iterations: int
+    tool_calls: int
+    pages: int
+    started_at: float
+    finalized: bool
+
+
+@dataclass
+class ExplorationLimits:
+    """Caps on one exploration run"""
+
+    max_iterations: int = 15  # model turns
+    max_tool_calls: int = 40  # tool calls of any kind
+    max_pages: int = 25  # calls to page-fetching tools
+    max_wall_time: float = 300.0  # seconds
+    max_history_tokens: int = 24000  # prompt size before old tool output is trimmed
+
+    @classmethod
+    def from_config(cls) -> "ExplorationLimits":
+        return cls(
+            max_iterations=Config.AGENT_MAX_ITERATIONS,
+            max_tool_calls=Config.AGENT_MAX_TOOL_CALLS,
+            max_pages=Config.AGENT_MAX_PAGES,
+            max_wall_time=Config.AGENT_MAX_WALL_TIME_S,
+            max_history_tokens=Config.AGENT_HISTORY_TOKENS,
+        )
+
+    @property
+    def recursion_limit(self) -> int:
+        """LangGraph step limit that leaves room for the forced final turn"""
+        return 2 * self.max_iterations + 6
+
+
+def exploration_stats(state: State) -> dict:
+    """Counters of a finished run, with per-tool call counts"""
+    per_tool = {}
+    for message in state["messages"]:
+        if isinstance(message, ToolMessage) and message.status != "error":
+            per_tool[message.name] = per_tool.get(message.name, 0) + 1
+    return {
+        "iterations": state.get("iterations", 0),
+        "tool_calls": state.get("tool_calls", 0),
+        "pages": state.get("pages", 0),
+        "per_tool": per_tool,
+        "wall_time_s": round(time.time() - state.get("started_at", time.time()), 2),
+        "hit_limit": state.get("finalized", False),
+    }
+
 
 class AgentGraph:
-    def __init__(self, llm, tools):
+    def __init__(
+        self, llm, tools, limits=None, page_tools=("scrape_and_clean",), call_kwargs=None
+    ):
         self.llm = llm
         self.tools = tools
+        # extra request options for every model call (e.g. prompt_cache_key)
+        self.call_kwargs = call_kwargs or {}
+        self.limits = limits or ExplorationLimits.from_config()
+        self.page_tools = set(page_tools)
+
+    def _out_of_budget(self, state: State) -> bool:
+        elapsed = time.time() - state.get("started_at", time.time())
+        return (
+            state.get("iterations", 0) >= self.limits.max_iterations
+            or state.get("tool_calls", 0) >= self.limits.max_tool_calls
+            or elapsed >= self.limits.max_wall_time
+        )
+
+    def _split_tool_calls(self, state: State):
+        """Tool calls of the last turn that fit the budget, and refusals for the rest"""
+        last = state["messages"][-1]
+        calls_left = self.limits.max_tool_calls - state.get("tool_calls", 0)
+        pages_left = self.limits.max_pages - state.get("pages", 0)
 
-    async def create_agent(self):
+        allowed, refused, pages = [], [], 0
+        for call in last.tool_calls:
+            is_page = call["name"] in self.page_tools
+            if calls_left <= 0 or (is_page and pages_left <= 0):
+                refused.append(
+                    ToolMessage(
+                        content="Tool budget exhausted, this call was not executed.",
+                        name=call["name"],
+                        tool_call_id=call["id"],
+                        status="error",
+                    )
+                )
+                continue
+            allowed.append(call)
+            calls_left -= 1
+            if is_page:
+                pages_left -= 1
+                pages += 1
+
+        allowed_message = last.model_copy(update={"tool_calls": allowed})
+        return allowed_message, refused, pages
+
+    async def create_agent(self, checkpointer=None):
         graph_builder = StateGraph(State)
         llm_with_tools = self.llm.bind_tools(self.tools)
+        tool_node = ToolNode(tools=self.tools)
+
+        def chatbot_input(state: State):
+            messages, tokens = compact_history(
+                state["messages"], self.limits.max_history_tokens
+            )
+            logger.info(
+                f"Agent turn {state.get('iterations', 0) + 1}: "
+                f"{len(messages)} messages, ~{tokens} input tokens"
+            )
+            if not self._out_of_budget(state):
+                return llm_with_tools, messages, {}
+            # budget spent: one last turn without tools to force the answer
+            messages = messages + [HumanMessage(content=FINALIZE_PROMPT)]
+            return self.llm, messages, {"finalized": True}
+
+        def chatbot_update(state: State, result, extra):
+            usage = getattr(result, "usage_metadata", None)
+            if usage:
+                logger.info(
+                    f"Agent turn {state.get('iterations', 0) + 1} usage: "
+                    f"{usage.get('input_tokens')} in, {usage.get('output_tokens')} out"
+                )
+            return {
+                "messages": [result],
+                "iterations": state.get("iterations", 0) + 1,
+                "started_at": state.get("started_at") or time.time(),
+                **extra,
+            }
 
         def chatbot_sync(state: State):
-            messages = state["messages"]
-            result = llm_with_tools.invoke(messages)
-            return {"messages": [result]}
+            state = {"started_at": time.time(), **state}
+            llm, messages, extra = chatbot_input(state)
+            return chatbot_update(state, llm.invoke(messages, **self.call_kwargs), extra)
 
         async def chatbot_async(state: State):
-            messages = state["messages"]
-            result = await llm_with_tools.ainvoke(messages)
-            return {"messages": [result]}
+            state = {"started_at": time.time(), **state}
+            llm, messages, extra = chatbot_input(state)
+            return chatbot_update(state, await llm.ainvoke(messages, **self.call_kwargs), extra)
 
-        graph_builder.add_node("chatbot", {"fn": chatbot_sync, "async_fn": chatbot_async})
+        def tools_update(state, allowed, refused, pages, output):
+            return {
+                "messages": output["messages"] + refused,
+                "tool_calls": state.get("tool_calls", 0) + len(allowed.tool_calls),
+                "pages": state.get("pages", 0) + pages,
+            }
 
-        # Add tool node
-        tool_node = ToolNode(tools=self.tools)
-        graph_builder.add_node("tools", tool_node)
+        def tools_sync(state: State):
+            allowed, refused, pages = self._split_tool_calls(state)
+            output = {"messages": []}
+            if allowed.tool_calls:
+                output = tool_node.invoke({"messages": [allowed]})
+            return tools_update(state, allowed, refused, pages, output)
 
-        # Conditional edges using END
-        graph_builder.add_conditional_edges(
-            "chatbot",
-            tools_condition,
-            {True: "tools", False: END},  
-        )
+        async def tools_async(state: State):
+            # ToolNode runs all calls of one turn concurrently
+            allowed, refused, pages = self._split_tool_calls(state)
+            output = {"messages": []}
+            if allowed.tool_calls:
+                output = await tool_node.ainvoke({"messages": [allowed]})
+            return tools_update(state, allowed, refused, pages, output)
+
+        def route(state: State):
+            last = state["messages"][-1]
+            if getattr(last, "tool_calls", None) and not state.get("finalized"):
+                return "tools"
+            return END
+
+        graph_builder.add_node("chatbot", RunnableLambda(chatbot_sync, afunc=chatbot_async))
+        graph_builder.add_node("tools", RunnableLambda(tools_sync, afunc=tools_async))
+
+        graph_builder.add_conditional_edges("chatbot", route, {"tools": "tools", END: END})
 
         # Connect tools back to chatbot
         graph_builder.add_edge("tools", "chatbot")
         graph_builder.add_edge(START, "chatbot")
 
         # Compile graph
-        return graph_builder.compile()
+        return graph_builder.compile(checkpointer=checkpointer)
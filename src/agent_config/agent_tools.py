@@ -1,14 +1,24 @@
 """Agent tools for scraping and directory management."""
 
 import asyncio
-import json
+import logging
 import os
 import shutil
-from typing import List, Dict
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
 
-from langchain.tools import tool
+from langchain_core.tools import tool
 from pydantic import BaseModel
-from src.scrape.scrape import scrape_urls
+from src.agent_config.digest import count_tokens, digest_page
+from src.core.config import Config
+from src.scrape.links import canonical_url
+from src.scrape.scrape import save_file, scrape_urls
+from src.utils.http_client import close_http_client
+
+logger = logging.getLogger(__name__)
 
 
 # -------------------------------
@@ -19,11 +29,43 @@ class LinksInput(BaseModel):
 
 
 # -------------------------------
-# Global state
+# Per-run state
 # -------------------------------
-COMPANY_NAMES: List[str] = []
-IMPORTANT_LINKS: Dict[str, LinksInput] = {}
-_LINKS_FILE_COUNTER = 0
+@dataclass
+class ExplorationRun:
+    """Tool state of one agent run"""
+
+    company_name: Optional[str] = None
+    important_links: Dict[str, List[str]] = field(default_factory=dict)
+    links_opened: List[str] = field(default_factory=list)
+    # full text of scraped pages by canonical url; the agent only sees a digest of each
+    pages: Dict[str, str] = field(default_factory=dict)
+    # ranked links from the link extractor, saved if the agent never confirms any
+    link_candidates: List[str] = field(default_factory=list)
+    # scrape_and_clean calls of one turn run concurrently in worker threads
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+
+# Tools run in executor threads with a copy of the caller's context, so
+# concurrent agent runs each see their own ExplorationRun
+_current_run: ContextVar[Optional[ExplorationRun]] = ContextVar(
+    "exploration_run", default=None
+)
+
+
+@contextmanager
+def exploration_run():
+    """Give the tools called inside the block a fresh run state"""
+    run = ExplorationRun()
+    token = _current_run.set(run)
+    try:
+        yield run
+    finally:
+        _current_run.reset(token)
+
+
+def current_run() -> Optional[ExplorationRun]:
+    return _current_run.get()
 
 
 # -------------------------------
@@ -36,63 +78,91 @@ def create_directory_structure(path: str, clear_folder: bool = False) -> None:
             shutil.rmtree(path)
 
         os.makedirs(path, exist_ok=True)
-        print(f"Directory '{path}' created successfully.")
+        logger.debug(f"Directory '{path}' created successfully.")
     except OSError as err:
-        print(f"Error creating directory '{path}': {err}")
+        logger.error(f"Error creating directory '{path}': {err}")
 
 
 @tool
 def create_directory(company_name: str) -> str:
     """Create directories to store scraped and generated data."""
-    global COMPANY_NAMES
+    run = current_run()
+    if run is None:
+        return "Error: No active agent run."
 
-    COMPANY_NAMES.clear()
-    COMPANY_NAMES.append(company_name)
-    print(f"Current company names: {COMPANY_NAMES}")
+    run.company_name = company_name
+    logger.info(f"Current company name: {company_name}")
 
-    # Create directory for markdown files from scraping
+    # Create directory for markdown files from scraping; the prompt, links and
+    # knowledge base go to the task's artifacts (see src/storage/artifacts.py)
     create_directory_structure(f"markdown_content/{company_name}/")
 
-    # Create directory for agent-related content (kb, important links, etc)
-    create_directory_structure(f"agent_content/{company_name}/", clear_folder=True)
-
     return f"Created directories for {company_name}"
 
 
 # -------------------------------
 # Scraping functions
 # -------------------------------
+async def _scrape_in_tool_thread(url: str, company: str) -> str:
+    """scrape_urls on the tool thread's own short-lived loop, closing the loop's http client"""
+    try:
+        return await scrape_urls(
+            url, refine_with_llm=False, output_dir=f"markdown_content/{company}"
+        )
+    finally:
+        await close_http_client()
+
+
 @tool
 def scrape_and_clean(url: str) -> str:
     """Scrape and extract clean text content from a single webpage URL."""
-    global _LINKS_FILE_COUNTER
-
-    if not COMPANY_NAMES:
+    run = current_run()
+    if run is None or not run.company_name:
         return "Error: No company selected. Please create directories first."
 
-    company = COMPANY_NAMES[0]
-    links_file = f"markdown_content/{company}/links_opened.txt"
+    company = run.company_name
+    with run.lock:
+        run.links_opened.append(url)
+
+    key = canonical_url(url) or url
+    if key in run.pages:
+        # prefetched before the agent started
+        scraped_content = run.pages[key]
+        try:
+            save_file(scraped_content, url, f"markdown_content/{company}")
+        except OSError as err:
+            logger.error(f"Exception while saving scraped content from {url}: {err}")
+    else:
+        # Scrape the URL asynchronously
+        try:
+            # Store markdown files in markdown_content directory
+            scraped_content = asyncio.run(_scrape_in_tool_thread(url, company))
+        except Exception as err:  # pylint: disable=broad-exception-caught
+            return f"Error processing {url}: {err}"
+        run.pages[key] = scraped_content
+
+    digest = digest_page(url, scraped_content, Config.AGENT_TOOL_OUTPUT_TOKENS)
+    logger.info(
+        f"{url}: {count_tokens(scraped_content)} tokens, "
+        f"{count_tokens(digest)} sent to agent"
+    )
+    return digest
 
-    # Write the URL to links file
-    mode = "w" if _LINKS_FILE_COUNTER == 0 else "a"
-    try:
-        with open(links_file, mode, encoding="utf-8") as f:
-            f.write(f"{url},\n")
-        _LINKS_FILE_COUNTER += 1
-    except OSError as err:
-        return f"Error writing URL to file: {err}"
 
-    # Scrape the URL asynchronously
-    try:
-        # Store markdown files in markdown_content directory
-        scraped_content = asyncio.run(
-            scrape_urls(
-                url, refine_with_llm=False, output_dir=f"markdown_content/{company}"
-            )
-        )
-        return scraped_content
-    except Exception as err:  # pylint: disable=broad-exception-caught
-        return f"Error processing {url}: {err}"
+@tool
+def read_page(url: str, part: int = 1) -> str:
+    """Read the full text of an already scraped page, one part at a time (part starts at 1)."""
+    run = current_run()
+    key = canonical_url(url) or url
+    if run is None or key not in run.pages:
+        return f"Error: {url} has not been scraped yet. Use scrape_and_clean first."
+
+    text = run.pages[key]
+    size = Config.AGENT_TOOL_OUTPUT_TOKENS * 4  # characters per part
+    parts = max(1, -(-len(text) // size))
+    if not 1 <= part <= parts:
+        return f"Error: {url} has {parts} parts."
+    return f"[part {part}/{parts}]\n" + text[(part - 1) * size : part * size]
 
 
 # -------------------------------
@@ -101,18 +171,16 @@ def scrape_and_clean(url: str) -> str:
 @tool("save_links", args_schema=LinksInput)
 def save_links(values: LinksInput) -> str:
     """Save important links about the company (about, services, contact, etc.)."""
-    if not COMPANY_NAMES:
+    run = current_run()
+    if run is None or not run.company_name:
         return "Error: No company selected. Please create directories first."
 
-    global IMPORTANT_LINKS
-    company = COMPANY_NAMES[0]
-    IMPORTANT_LINKS["links"] = values
+    # the tool is called with the schema's `values` list
+    store_links(run, getattr(values, "values", values))
+    return "Saved successfully"
 
-    path = f"content/{company}/important_links.json"
-    try:
-        with open(path, "w", encoding="utf-8") as f:
-            json.dump({"links": values.dict()}, f, indent=4)
-        print(f"Important links saved: {path}")
-        return "Saved successfully"
-    except OSError as err:
-        return f"Error saving links: {err}"
+
+def store_links(run: ExplorationRun, links: List[str]) -> None:
+    """Record the important links of a run; saved with its artifacts when it ends"""
+    run.important_links["links"] = list(links)
+    logger.info(f"Important links recorded: {len(links)}")
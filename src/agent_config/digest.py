@@ -0,0 +1,193 @@
+"""Token-bounded digests of scraped pages and history compaction for the agent"""
+
+import re
+from functools import lru_cache
+from typing import Iterable, List
+
+from langchain_core.messages import BaseMessage, ToolMessage
+
+from src.scrape.links import canonical_url, site_of
+
+_LINK = re.compile(r"\[([^\]]*)\]\(([^)\s]+)[^)]*\)")
+_HEADING = re.compile(r"^\s{0,3}(#{1,4})\s+(.+?)\s*#*\s*$")
+_EMAIL = re.compile(r"[\w.+-]+@[\w-]+\.[\w.-]+")
+_PHONE = re.compile(r"\+?\d[\d\s().-]{7,}\d")
+_FACT_WORDS = re.compile(
+    r"\b(founded|headquarter|established|offices?|customers|clients|employees|"
+    r"mission|we (are|help|provide|offer)|leading|award|certified|partners?|"
+    r"pricing|products?|services?|solutions?|industr(y|ies)|located)\b",
+    re.I,
+)
+_SKIP_LINK = re.compile(
+    r"(facebook|twitter|x\.com|linkedin|instagram|youtube|tiktok|pinterest)\.|"
+    r"^(mailto|tel|javascript):|\.(png|jpe?g|gif|svg|webp|pdf|zip)$",
+    re.I,
+)
+
+
+@lru_cache(maxsize=1)
+def _encoding():
+    """o200k tokenizer, or None when tiktoken or its BPE file is unavailable"""
+    try:
+        import tiktoken  # pylint: disable=import-outside-toplevel
+
+        return tiktoken.get_encoding("o200k_base")
+    except Exception:  # pylint: disable=broad-exception-caught
+        # the BPE file is downloaded on first use and may be unreachable
+        return None
+
+
+def count_tokens(text: str) -> int:
+    """
+    Token count with the o200k tokenizer, or a 4 chars/token estimate
+
+    tiktoken is in requirements.txt; without it, or when its BPE file cannot
+    be downloaded, the estimate is used. That is close for English prose but
+    can be off by 30% or more on code, urls and non-Latin text, so digests and
+    the history budget are only approximate.
+    """
+    if not text:
+        return 0
+    encoding = _encoding()
+    if encoding is None:
+        return len(text) // 4 + 1
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+# History messages keep the same content strings from turn to turn, and a str
+# caches its hash, so a hit costs a dict lookup instead of a tokenization
+_content_tokens = lru_cache(maxsize=2048)(count_tokens)
+
+
+def count_message_tokens(messages: Iterable[BaseMessage]) -> int:
+    total = 0
+    for message in messages:
+        content = message.content if isinstance(message.content, str) else str(message.content)
+        total += _content_tokens(content) + 4  # role and framing
+        for call in getattr(message, "tool_calls", None) or []:
+            total += count_tokens(str(call.get("args", ""))) + 8
+    return total
+
+
+def _clip(text: str, max_tokens: int) -> str:
+    if count_tokens(text) <= max_tokens:
+        return text
+    encoding = _encoding()
+    if encoding is None:
+        return text[: max_tokens * 4]
+    return encoding.decode(encoding.encode(text, disallowed_special=())[:max_tokens])
+
+
+def markdown_links(url: str, text: str) -> List[str]:
+    """Links of a markdown page as "label -> url", same-site first, urls canonicalized"""
+    site = site_of(url)
+    internal, external, seen = [], [], set()
+    for label, href in _LINK.findall(text):
+        if _SKIP_LINK.search(href):
+            continue
+        link = canonical_url(href, url)
+        if link is None or link in seen:
+            continue
+        seen.add(link)
+        entry = f"{label.strip()[:60]} -> {link}" if label.strip() else link
+        if site_of(link) == site:
+            internal.append(entry)
+        else:
+            external.append(entry)
+    return internal + external
+
+
+def extract_outline(text: str) -> List[str]:
+    outline = []
+    for line in text.splitlines():
+        match = _HEADING.match(line)
+        if match:
+            title = _LINK.sub(r"\1", match.group(2)).strip()
+            if title:
+                outline.append("  " * (len(match.group(1)) - 1) + title)
+    return list(dict.fromkeys(outline))
+
+
+def extract_facts(text: str) -> List[str]:
+    """Sentences likely to carry company facts (contacts, numbers, claims)"""
+    plain = _LINK.sub(r"\1", text)
+    facts, seen = [], set()
+    for line in plain.splitlines():
+        line = line.strip(" \t*-#>|")
+        if len(line) < 20:
+            continue
+        for sentence in re.split(r"(?<=[.!?])\s+", line):
+            key = sentence.lower()
+            if key in seen or len(sentence) > 400:
+                continue
+            if _EMAIL.search(sentence) or _PHONE.search(sentence) or _FACT_WORDS.search(sentence):
+                seen.add(key)
+                facts.append(sentence)
+    return facts
+
+
+def digest_page(url: str, text: str, max_tokens: int) -> str:
+    """
+    Compress a scraped page to roughly `max_tokens` tokens
+
+    Pages that already fit are returned as they are. Larger pages are reduced
+    to an outline, their links and key facts; the full text stays available
+    through the `read_page` tool.
+    """
+    if count_tokens(text) <= max_tokens:
+        return text
+
+    sections = [
+        ("Outline", extract_outline(text), 0.2),
+        ("Links", markdown_links(url, text), 0.45),
+        ("Key facts", extract_facts(text), 0.35),
+    ]
+    header = (
+        f"Digest of {url} ({count_tokens(text)} tokens, shortened). "
+        "Call read_page for the full text."
+    )
+    budget = max_tokens - count_tokens(header)
+    parts, spare = [header], 0
+    for title, items, share in sections:
+        allowance = int(budget * share) + spare
+        lines, used = [], count_tokens(title) + 2
+        for item in items:
+            cost = count_tokens(item) + 1
+            if used + cost > allowance:
+                break
+            lines.append(f"- {item}")
+            used += cost
+        spare = max(0, allowance - used) if lines else allowance
+        if lines:
+            parts.append(f"## {title}\n" + "\n".join(lines))
+    if len(parts) == 1:
+        parts.append(_clip(text, budget))
+    return "\n\n".join(parts)
+
+
+def compact_history(messages: List[BaseMessage], max_tokens: int, keep_last: int = 6):
+    """
+    Shorten old tool outputs until the history fits `max_tokens`
+
+    The system prompt, the task message and the last `keep_last` messages are
+    left untouched; older tool results are replaced by their first lines so
+    tool call / result pairs stay valid for the provider.
+    """
+    total = count_message_tokens(messages)
+    if total <= max_tokens:
+        return messages, total
+
+    compacted = list(messages)
+    for index in range(len(compacted) - keep_last):
+        message = compacted[index]
+        if not isinstance(message, ToolMessage) or not isinstance(message.content, str):
+            continue
+        before = _content_tokens(message.content)
+        if before <= 80:
+            continue
+        stub = _clip(message.content, 60) + "\n[older tool output trimmed]"
+        compacted[index] = message.model_copy(update={"content": stub})
+        total -= before - count_tokens(stub)
+        if total <= max_tokens:
+            break
+    return compacted, total
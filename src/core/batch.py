@@ -0,0 +1,98 @@
+"""Fair scheduling of batched agent-creation jobs on a shared worker pool"""
+
+import asyncio
+import logging
+from collections import OrderedDict, deque
+from typing import Any, Awaitable, Callable, Deque, Iterable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+Job = Tuple[str, Any]  # (task_id, request)
+
+
+class BatchScheduler:
+    """
+    Run jobs from many batches on a fixed number of workers
+
+    Batches are served round-robin, one job at a time, so a 500-site batch
+    submitted first does not starve a small batch submitted after it.
+    """
+
+    def __init__(
+        self,
+        runner: Callable[[str, Any], Awaitable[Any]],
+        max_concurrency: int = 1,
+        on_done: Optional[Callable[[str, str], Awaitable[None]]] = None,
+    ):
+        self.runner = runner
+        self.max_concurrency = max(1, max_concurrency)
+        self.on_done = on_done
+        self._queues: "OrderedDict[str, Deque[Job]]" = OrderedDict()
+        self._wakeup = asyncio.Event()
+        self._workers = []
+        self.active_jobs = 0
+
+    @property
+    def queue_depth(self) -> int:
+        """Jobs waiting for a worker"""
+        return sum(len(q) for q in self._queues.values())
+
+    def start(self):
+        if self._workers:
+            return
+        self._workers = [
+            asyncio.create_task(self._worker(i), name=f"batch-worker-{i}")
+            for i in range(self.max_concurrency)
+        ]
+
+    async def stop(self):
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    def submit(self, batch_id: str, jobs: Iterable[Job]):
+        """Queue the jobs of a batch"""
+        self._queues.setdefault(batch_id, deque()).extend(jobs)
+        self._wakeup.set()
+
+    def _next_job(self) -> Optional[Tuple[str, Job]]:
+        """Pop one job from the batch at the head and rotate it to the back"""
+        while self._queues:
+            batch_id, queue = next(iter(self._queues.items()))
+            if not queue:
+                del self._queues[batch_id]
+                continue
+            job = queue.popleft()
+            if queue:
+                self._queues.move_to_end(batch_id)
+            else:
+                del self._queues[batch_id]
+            return batch_id, job
+        return None
+
+    async def _worker(self, index: int):
+        while True:
+            item = self._next_job()
+            if item is None:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            batch_id, (task_id, request) = item
+            self.active_jobs += 1
+            try:
+                await self.runner(task_id, request)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:  # pylint: disable=broad-exception-caught
+                # the runner records the failure on the task itself
+                logger.warning(f"Batch {batch_id} job {task_id} failed on worker {index}: {e}")
+            finally:
+                self.active_jobs -= 1
+
+            if self.on_done is not None:
+                try:
+                    await self.on_done(batch_id, task_id)
+                except Exception as e:  # pylint: disable=broad-exception-caught
+                    logger.error(f"Failed to record result of {task_id}: {e}")
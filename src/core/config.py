@@ -1,4 +1,6 @@
 """pydantic configuration for .env"""
+from typing import Optional
+
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 class Settings(BaseSettings):
@@ -8,9 +10,118 @@ class Settings(BaseSettings):
     MILLIS_API_KEY: str  # cSpell:disable-line
     OPENAI_MODEL_NAME: str
 
+    # Millis endpoints (point these at the fake server for offline benchmarks)
+    MILLIS_API_URL: str = "https://api-west.millis.ai"
+    MILLIS_EU_API_URL: str = "https://api-eu-west.millis.ai"
+    MILLIS_FILES_CACHE_TTL: float = 30.0  # seconds the knowledge file listing is reused
+    MILLIS_FILES_PAGE_SIZE: int = 200
+
+    # Shared http connection pool
+    HTTP_MAX_CONNECTIONS: int = 100
+    HTTP_MAX_KEEPALIVE: int = 20
+
+    # Batch agent creation
+    BATCH_MAX_CONCURRENCY: int = 4
+    BATCH_MAX_SIZE: int = 1000
+
+    # LLM pricing overrides (see src/track_cost/pricing.py) and per-job budgets
+    MODEL_PRICING_FILE: Optional[str] = None
+    JOB_MAX_TOKENS: Optional[int] = 2_000_000
+    JOB_MAX_COST_USD: Optional[float] = 5.0
+    JOB_BUDGET_POLICY: str = "degrade"  # "degrade" or "stop"
+    JOB_BUDGET_FALLBACK_MODEL: str = "openai:gpt-4o-mini"
+    # per-task model routing overrides (see src/core/model_router.py)
+    MODEL_ROUTES_FILE: Optional[str] = None
+
+    # Exploration limits for one agent run (see src/agent_config/agent_graph.py)
+    AGENT_MAX_ITERATIONS: int = 15
+    AGENT_MAX_TOOL_CALLS: int = 40
+    AGENT_MAX_PAGES: int = 25
+    AGENT_MAX_WALL_TIME_S: float = 300.0
+    AGENT_TOOL_OUTPUT_TOKENS: int = 1500  # page digest size returned to the agent
+    AGENT_HISTORY_TOKENS: int = 24000  # older tool outputs are trimmed above this
+    # ranked link candidates handed to the agent (see src/scrape/links.py)
+    LINK_CANDIDATES_MAX: int = 25
+    LINK_USE_SITEMAP: bool = True
+
+    # Knowledge base scraping; with KB_CRAWL_ENABLED the saved links only seed
+    # a robots/sitemap-aware crawl (see src/scrape/frontier.py)
+    SCRAPE_CONCURRENCY: int = 4
+    KB_CRAWL_ENABLED: bool = False
+    KB_CRAWL_MAX_PAGES: int = 60
+    KB_CRAWL_MAX_DEPTH: int = 3
+    KB_CRAWL_TIME_BUDGET_S: float = 600.0
+    # HTML conversion (see src/scrape/convert.py): pages above the size limit are
+    # converted in a pool of CONVERT_PROCESSES processes, 0 keeps all on the loop
+    CONVERT_PROCESSES: int = 2
+    CONVERT_INLINE_MAX_CHARS: int = 50_000
+    # How pages become knowledge base text: "llm" refines the crawled markdown
+    # with a model, "local" extracts the main content without one (see
+    # src/scrape/extract.py), "auto" extracts locally and only refines pages
+    # whose extraction is shorter than KB_EXTRACT_MIN_CHARS or looks like junk
+    KB_EXTRACTION: str = "llm"
+    KB_EXTRACT_MIN_CHARS: int = 200
+    # "memory" keeps a run's graph state in process while it explores, keyed by task id
+    AGENT_CHECKPOINTER: Optional[str] = None
+
+    # Logging (see src/logging/logger.py)
+    LOG_LEVEL: str = "INFO"
+    LOG_CONSOLE_LEVEL: str = "ERROR"
+    # event loop lag sampling for the /metrics endpoint
+    LOOP_LAG_INTERVAL_MS: float = 100.0
+    # Tracing (see src/monitoring/tracing.py): None, "file" or "otlp"
+    TRACING_EXPORTER: Optional[str] = None
+    TRACING_FILE: str = "logs/traces.jsonl"
+    TRACING_OTLP_ENDPOINT: Optional[str] = None  # e.g. http://localhost:4318/v1/traces
+    # Job profiling (see src/monitoring/profiling.py); requests can also ask with profile=true
+    PROFILE_JOBS: bool = False
+    PROFILE_INTERVAL_MS: float = 10.0
+    PROFILE_LAG_INTERVAL_MS: float = 50.0
+    PROFILE_SLOW_CALLBACK_MS: float = 100.0
+    PROFILE_TTL_S: int = 7 * 24 * 3600
+
+    # Artifact storage (see src/storage/artifacts.py): "local" or "s3"
+    ARTIFACTS_BACKEND: str = "local"
+    ARTIFACTS_DIR: str = "artifacts"
+    ARTIFACTS_PREFIX: str = "tasks"
+    ARTIFACTS_S3_ENDPOINT: Optional[str] = None  # e.g. https://s3.eu-west-1.amazonaws.com
+    ARTIFACTS_S3_BUCKET: Optional[str] = None
+    ARTIFACTS_S3_REGION: str = "us-east-1"
+    ARTIFACTS_S3_ACCESS_KEY: Optional[str] = None
+    ARTIFACTS_S3_SECRET_KEY: Optional[str] = None
+    # task namespaces not written for this long, or beyond the newest N, are evicted
+    ARTIFACTS_RETENTION_S: Optional[int] = 30 * 24 * 3600
+    ARTIFACTS_MAX_TASKS: Optional[int] = None
+    ARTIFACTS_SWEEP_INTERVAL_S: float = 3600.0
+
+    # JSON file with per-tenant agent presets (see src/utils/payloads.py)
+    AGENT_PRESETS_FILE: Optional[str] = None
+
     model_config = SettingsConfigDict(
         env_file=".env",
         extra="ignore"
     )
 
-Config = Settings()
+class _LazySettings:
+    """
+    `Settings` read from the environment and .env on first attribute access
+
+    Importing a module that uses Config neither reads .env nor validates the
+    required keys; a missing key fails at the first use instead.
+    """
+
+    _settings: Optional[Settings] = None
+
+    def _load(self) -> Settings:
+        if self._settings is None:
+            object.__setattr__(self, "_settings", Settings())
+        return self._settings
+
+    def __getattr__(self, name):
+        return getattr(self._load(), name)
+
+    def __setattr__(self, name, value):
+        setattr(self._load(), name, value)
+
+
+Config = _LazySettings()
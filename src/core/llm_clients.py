@@ -0,0 +1,36 @@
+"""Chat model clients shared across the pipeline
+
+Clients (and the provider SDKs behind `init_chat_model`) are created on first
+use, so importing this module stays cheap.
+"""
+
+from functools import lru_cache
+
+from src.core.config import Config
+from src.track_cost.cost_tracking_llm import CostTrackingLLM
+
+# provider prefix of `init_chat_model` model strings -> Config attribute with its key
+PROVIDER_API_KEYS = {
+    "openai": "OPENAI_API_KEY",
+    "google_genai": "GEMINI_API_KEY",
+}
+
+
+@lru_cache(maxsize=None)
+def get_chat_model(model: str):
+    """One client per '<provider>:<model>' string"""
+    provider = model.split(":", 1)[0] if ":" in model else "openai"
+    if provider not in PROVIDER_API_KEYS:
+        raise ValueError(f"No API key configured for provider {provider}")
+    from langchain.chat_models import init_chat_model  # pylint: disable=import-outside-toplevel
+
+    return init_chat_model(model, api_key=getattr(Config, PROVIDER_API_KEYS[provider]))
+
+
+def tracked_model(model: str, degrade: bool = True) -> CostTrackingLLM:
+    """Cost-tracked client; over-budget tasks degrade to the fallback model"""
+    degrade_to = None
+    fallback = Config.JOB_BUDGET_FALLBACK_MODEL
+    if degrade and fallback and fallback != model:
+        degrade_to = tracked_model(fallback, degrade=False)
+    return CostTrackingLLM(get_chat_model(model), model, degrade_to=degrade_to)
@@ -0,0 +1,141 @@
+"""Pick a chat model per task type and input size, with fallbacks"""
+
+import json
+import logging
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+from langchain_core.runnables import Runnable
+
+from src.core.config import Config
+from src.core.llm_clients import tracked_model
+from src.track_cost.ledger import BudgetExceededError
+
+logger = logging.getLogger(__name__)
+
+# Rules are tried in order; the first whose `max_input_chars` fits wins.
+# Defaults keep the models the pipeline has always used.
+DEFAULT_ROUTES: Dict[str, dict] = {
+    "agent_exploration": {
+        "rules": [{"model": "google_genai:gemini-2.5-flash"}],
+        "fallbacks": ["openai:gpt-4o-mini"],
+    },
+    "kb_refinement": {
+        "rules": [{"model": "openai:gpt-4"}],
+        "fallbacks": ["openai:gpt-4o-mini"],
+    },
+    "kb_description": {
+        "rules": [{"model": "openai:gpt-4"}],
+        "fallbacks": ["openai:gpt-4o-mini"],
+    },
+}
+
+
+def _log_fallback(model, error):
+    name = getattr(model, "model_name", None) or model
+    logger.warning(f"{name} failed, falling back to the next model: {error}")
+
+
+class RoutedLLM(Runnable):
+    """Try each model in order until one succeeds
+
+    Budget errors are never retried on another model: they mean the task
+    must stop, not that the provider failed.
+    """
+
+    def __init__(self, models: List[Runnable]):
+        self.models = models
+
+    def _candidates(self):
+        for index, model in enumerate(self.models):
+            yield index == len(self.models) - 1, model
+
+    def invoke(self, input, config=None, **kwargs):  # pylint: disable=redefined-builtin
+        for last, model in self._candidates():
+            try:
+                return model.invoke(input, config, **kwargs)
+            except BudgetExceededError:
+                raise
+            except Exception as e:  # pylint: disable=broad-exception-caught
+                if last:
+                    raise
+                _log_fallback(model, e)
+        return None
+
+    async def ainvoke(self, input, config=None, **kwargs):  # pylint: disable=redefined-builtin
+        for last, model in self._candidates():
+            try:
+                return await model.ainvoke(input, config, **kwargs)
+            except BudgetExceededError:
+                raise
+            except Exception as e:  # pylint: disable=broad-exception-caught
+                if last:
+                    raise
+                _log_fallback(model, e)
+        return None
+
+    async def astream(self, input, config=None, **kwargs):  # pylint: disable=redefined-builtin
+        """fall back only if a model fails before its first chunk"""
+        for last, model in self._candidates():
+            started = False
+            try:
+                async for chunk in model.astream(input, config, **kwargs):
+                    started = True
+                    yield chunk
+                return
+            except BudgetExceededError:
+                raise
+            except Exception as e:  # pylint: disable=broad-exception-caught
+                if last or started:
+                    raise
+                _log_fallback(model, e)
+
+    def bind_tools(self, tools):
+        return RoutedLLM([model.bind_tools(tools) for model in self.models])
+
+
+class ModelRouter:
+    """
+    Model selection per task type
+
+    `Config.MODEL_ROUTES_FILE` may override any task with
+    `{"<task>": {"rules": [{"max_input_chars": 20000, "model": "openai:gpt-4o-mini"},
+    {"model": "openai:gpt-4.1-mini"}], "fallbacks": ["openai:gpt-4"]}}`.
+    """
+
+    def __init__(self, routes: Optional[Dict[str, dict]] = None):
+        self.routes = {**DEFAULT_ROUTES, **(routes or {})}
+
+    @classmethod
+    def from_file(cls, path: Optional[str]) -> "ModelRouter":
+        if not path:
+            return cls()
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def select(self, task: str, input_chars: int = 0) -> str:
+        """Model string for a task and input size"""
+        if task not in self.routes:
+            raise KeyError(f"No model route for task {task}")
+        for rule in self.routes[task]["rules"]:
+            limit = rule.get("max_input_chars")
+            if limit is None or input_chars <= limit:
+                return rule["model"]
+        return self.routes[task]["rules"][-1]["model"]
+
+    def llm_for(self, task: str, input_chars: int = 0) -> RoutedLLM:
+        """Cost-tracked client for the task, with its configured fallbacks"""
+        primary = self.select(task, input_chars)
+        fallbacks = [m for m in self.routes[task].get("fallbacks", []) if m != primary]
+        return _routed(primary, tuple(fallbacks))
+
+
+@lru_cache(maxsize=None)
+def _routed(primary: str, fallbacks: tuple) -> RoutedLLM:
+    return RoutedLLM([tracked_model(m) for m in (primary, *fallbacks)])
+
+
+@lru_cache(maxsize=1)
+def get_model_router() -> ModelRouter:
+    """Load the routing table once per process"""
+    return ModelRouter.from_file(Config.MODEL_ROUTES_FILE)
@@ -1,12 +1,18 @@
 """Pipeline management for async task processing"""
 
 import asyncio
+import time
+import uuid
+from datetime import datetime, timezone
 from enum import Enum
-from typing import Dict, Optional
+from typing import Dict, List, Optional
 import httpx
-from redis import Redis
+from redis.asyncio import Redis
 import json
 
+from src.monitoring.metrics import step_timer
+from src.track_cost.ledger import TOTAL_KEYS
+
 
 class TaskState(Enum):
     QUEUED = "QUEUED"
@@ -33,6 +39,9 @@ PIPELINE_STEPS = [
 ]
 
 
+FINAL_STATES = (TaskState.SUCCESS.value, TaskState.FAILED.value, TaskState.CANCELLED.value)
+
+
 class TaskManager:
     def __init__(self, redis_client: Redis):
         self.redis = redis_client
@@ -40,11 +49,11 @@ class TaskManager:
     async def create_task(self, idempotency_key: Optional[str] = None) -> str:
         """Create a new task and return its ID"""
         if idempotency_key:
-            existing_task = self.redis.get(f"idempotency:{idempotency_key}")
+            existing_task = await self.redis.get(f"idempotency:{idempotency_key}")
             if existing_task:
                 return existing_task  # Already decoded due to decode_responses=True
 
-        task_id = f"task_{asyncio.current_task().get_name()}"
+        task_id = f"task_{uuid.uuid4().hex}"
         task_state = {
             "task_id": task_id,
             "state": TaskState.QUEUED.value,
@@ -54,40 +63,209 @@ class TaskManager:
             "error_message": None,
         }
 
-        self.redis.set(f"task:{task_id}", json.dumps(task_state))
+        await self.redis.set(f"task:{task_id}", json.dumps(task_state))
         if idempotency_key:
-            self.redis.set(f"idempotency:{idempotency_key}", task_id)
+            await self.redis.set(f"idempotency:{idempotency_key}", task_id)
 
         return task_id
 
     async def update_progress(self, task_id: str, step: str, progress: float):
         """Update task progress"""
-        task_state = json.loads(self.redis.get(f"task:{task_id}"))
+        step_timer.mark(task_id, step)
+        if progress >= 100:
+            step_timer.finish(task_id, "success")
+        task_state = json.loads(await self.redis.get(f"task:{task_id}"))
         task_state["current_step"] = step
         task_state["percent"] = min(100, progress)
 
         if progress >= 100:
             task_state["state"] = TaskState.SUCCESS.value
+        elif task_state["state"] == TaskState.QUEUED.value:
+            task_state["state"] = TaskState.RUNNING.value
 
-        self.redis.set(f"task:{task_id}", json.dumps(task_state))
+        await self.redis.set(f"task:{task_id}", json.dumps(task_state))
+
+    async def set_agent_id(self, task_id: str, agent_id: str):
+        """Store the created agent id on the task"""
+        task_state = json.loads(await self.redis.get(f"task:{task_id}"))
+        task_state["agent_id"] = agent_id
+        await self.redis.set(f"task:{task_id}", json.dumps(task_state))
 
     async def set_error(self, task_id: str, error_message: str):
         """Mark task as failed with error message"""
-        task_state = json.loads(self.redis.get(f"task:{task_id}"))
+        step_timer.finish(task_id, "failed")
+        task_state = json.loads(await self.redis.get(f"task:{task_id}"))
         task_state["state"] = TaskState.FAILED.value
         task_state["error_message"] = error_message
-        self.redis.set(f"task:{task_id}", json.dumps(task_state))
+        await self.redis.set(f"task:{task_id}", json.dumps(task_state))
 
     async def get_task_state(self, task_id: str) -> Dict:
         """Get current task state"""
-        state = self.redis.get(f"task:{task_id}")
+        state = await self.redis.get(f"task:{task_id}")
         return json.loads(state) if state else None
 
+    # -------------------
+    # Profiles
+    # -------------------
+    async def save_profile(self, task_id: str, profile: Dict, ttl: Optional[int] = None):
+        """Store a job profile next to the task and link it from the task state"""
+        await self.redis.set(f"task:{task_id}:profile", json.dumps(profile), ex=ttl)
+        task_state = json.loads(await self.redis.get(f"task:{task_id}"))
+        task_state["profile"] = f"/tasks/{task_id}/profile"
+        await self.redis.set(f"task:{task_id}", json.dumps(task_state))
+
+    async def get_profile(self, task_id: str) -> Optional[Dict]:
+        profile = await self.redis.get(f"task:{task_id}:profile")
+        return json.loads(profile) if profile else None
+
+    # -------------------
+    # Costs
+    # -------------------
+    async def record_costs(self, task_id: str, costs: Dict, url: Optional[str] = None):
+        """Add a run's cost summary to the task record and the daily report"""
+        if not costs.get("calls"):
+            return
+        task_state = json.loads(await self.redis.get(f"task:{task_id}"))
+        task_state["costs"] = _merge_costs(task_state.get("costs"), costs)
+        await self.redis.set(f"task:{task_id}", json.dumps(task_state))
+
+        day = datetime.now(timezone.utc).strftime("%Y-%m-%d")
+        key = f"costs:daily:{day}"
+        fields = {
+            "total_cost": costs["total_cost"],
+            "input_tokens": costs["input_tokens"],
+            "output_tokens": costs["output_tokens"],
+            "cached_tokens": costs.get("cached_tokens", 0),
+            "cache_savings": costs.get("cache_savings", 0.0),
+            "calls": costs["calls"],
+        }
+        for model, totals in costs["by_model"].items():
+            fields[f"model:{model}:cost"] = totals["total_cost"]
+            fields[f"model:{model}:tokens"] = (
+                totals["input_tokens"] + totals["output_tokens"]
+            )
+            fields[f"model:{model}:cache_savings"] = totals.get("cache_savings", 0.0)
+        for step, totals in costs["by_step"].items():
+            fields[f"step:{step}:cost"] = totals["total_cost"]
+            fields[f"step:{step}:tokens"] = (
+                totals["input_tokens"] + totals["output_tokens"]
+            )
+
+        pipe = self.redis.pipeline()
+        for field, value in fields.items():
+            pipe.hincrbyfloat(key, field, value)
+        pipe.zincrby(f"{key}:tasks", costs["total_cost"], task_id)
+        if url:
+            pipe.hset(f"{key}:urls", task_id, url)
+        await pipe.execute()
+
+    async def get_daily_costs(self, day: str, top: int = 10) -> Dict:
+        """Daily cost report: totals, per model, per step and most expensive tasks"""
+        key = f"costs:daily:{day}"
+        fields = await self.redis.hgetall(key)
+        report = {"date": day, "totals": {}, "by_model": {}, "by_step": {}}
+        for field, value in fields.items():
+            value = float(value)
+            if field.startswith(("model:", "step:")):
+                group, rest = field.split(":", 1)
+                name, metric = rest.rsplit(":", 1)
+                report[f"by_{group}"].setdefault(name, {})[metric] = round(value, 6)
+            else:
+                report["totals"][field] = round(value, 6)
+
+        expensive = await self.redis.zrevrange(
+            f"{key}:tasks", 0, top - 1, withscores=True
+        )
+        urls = []
+        if expensive:
+            urls = await self.redis.hmget(f"{key}:urls", [t for t, _ in expensive])
+        report["top_tasks"] = [
+            {"task_id": task_id, "url": url, "total_cost": round(cost, 6)}
+            for (task_id, cost), url in zip(expensive, urls)
+        ]
+        return report
+
     async def cancel_task(self, task_id: str):
         """Cancel a task"""
-        task_state = json.loads(self.redis.get(f"task:{task_id}"))
+        step_timer.finish(task_id, "cancelled")
+        task_state = json.loads(await self.redis.get(f"task:{task_id}"))
         task_state["state"] = TaskState.CANCELLED.value
-        self.redis.set(f"task:{task_id}", json.dumps(task_state))
+        await self.redis.set(f"task:{task_id}", json.dumps(task_state))
+
+    # -------------------
+    # Batches
+    # -------------------
+    async def create_batch(self, task_ids: List[str], urls: List[str]) -> str:
+        """Group tasks into a batch and return its ID"""
+        batch_id = f"batch_{uuid.uuid4().hex}"
+        batch = {
+            "batch_id": batch_id,
+            "task_ids": task_ids,
+            "urls": dict(zip(task_ids, urls)),
+            "created_at": time.time(),
+        }
+        await self.redis.set(f"batch:{batch_id}", json.dumps(batch))
+        return batch_id
+
+    async def get_batch(self, batch_id: str) -> Optional[Dict]:
+        batch = await self.redis.get(f"batch:{batch_id}")
+        return json.loads(batch) if batch else None
+
+    async def push_batch_result(self, batch_id: str, task_id: str):
+        """Append a finished task's final state to the batch result stream"""
+        state = await self.get_task_state(task_id)
+        await self.redis.rpush(f"batch:{batch_id}:results", json.dumps(state))
+
+    async def get_batch_results(self, batch_id: str, start: int = 0) -> List[Dict]:
+        """Finished task states, in completion order, from index `start`"""
+        results = await self.redis.lrange(f"batch:{batch_id}:results", start, -1)
+        return [json.loads(r) for r in results]
+
+    async def get_batch_state(self, batch_id: str) -> Optional[Dict]:
+        """Aggregate progress over all tasks of a batch"""
+        batch = await self.get_batch(batch_id)
+        if not batch:
+            return None
+
+        task_ids = batch["task_ids"]
+        raw_states = await self.redis.mget([f"task:{t}" for t in task_ids])
+        states = [json.loads(s) for s in raw_states if s]
+
+        counts = {state.value: 0 for state in TaskState}
+        for state in states:
+            counts[state["state"]] += 1
+        finished = sum(counts[s] for s in FINAL_STATES)
+        # failed and cancelled tasks count as done for the batch progress
+        percent = sum(
+            100 if s["state"] in FINAL_STATES else s["percent"] for s in states
+        ) / len(task_ids)
+
+        return {
+            "batch_id": batch_id,
+            "total": len(task_ids),
+            "finished": finished,
+            "percent": round(percent, 2),
+            "counts": counts,
+            "done": finished == len(task_ids),
+        }
+
+
+def _merge_costs(current: Optional[Dict], new: Dict) -> Dict:
+    """Sum two ledger summaries (retries of the same task add up)"""
+    if not current:
+        return new
+    merged = dict(current)
+    for key in (*TOTAL_KEYS, "total_cost"):
+        if key in current or key in new:
+            merged[key] = round(current.get(key, 0) + new.get(key, 0), 6)
+    # only the groups the new summary has: per-model and per-step entries have none
+    for group in ("by_model", "by_step"):
+        if group not in new:
+            continue
+        merged[group] = dict(current.get(group, {}))
+        for name, totals in new.get(group, {}).items():
+            merged[group][name] = _merge_costs(merged[group].get(name), totals)
+    return merged
 
 
 class AsyncPipeline:
@@ -1,4 +1,11 @@
-"""prompt templates"""
+"""prompt templates
+
+Each prompt is split into a stable prefix (system message) and a short
+variable suffix (human message), so providers that cache prompt prefixes
+(OpenAI, Gemini implicit caching) can reuse the prefix across calls.
+"""
+
+import hashlib
 
 # llm.py templates
 
@@ -23,11 +30,10 @@ MARKDOWN_PROMPT = """
             -   Do not include any explanations, commentary, or apologies in your response.
             -   Do not invent any new information.
             -   Do not compress or summarize the content.
-
-            ---
-            raw markdown: {input}
             """
 
+MARKDOWN_INPUT = "raw markdown: {input}"
+
 KNOWLEDGE_BASE_DESCRIPTION_PROMPT = """
             Your Role: You are a specialized AI assistant tasked with creating a concise, structured summary for a knowledge base. 
             This summary will serve as a high-level description of the information contained within the knowledge base, 
@@ -52,9 +58,10 @@ KNOWLEDGE_BASE_DESCRIPTION_PROMPT = """
             generate a single-paragraph description for the Goulston knowledge base that strictly adheres to the 
             structure and style of the Reference Example and follows the Deconstruction instructions.
             Don't provide any other explanations.
+            """
+
+KNOWLEDGE_BASE_DESCRIPTION_INPUT = "{links}"
 
-            {links}
-            """          
 # agent promts  
 SYSTEM_PROMPT= """
 You are an expert web research assistant. Your goal is to build a detailed company profile by scraping a website and formatting the information into a specific structure. You have access to the following tools:
@@ -66,12 +73,14 @@ Your task is to follow a precise workflow to gather and present information.
 1.  **Analyze Input**: The user `Input` will contain the URL to start scraping.
 2. 	**create directories**: At starting you must Use the tool to create directories to store scraped and generated data for the first time. Pick main company(single name) or domain name from url and pass to the tool. No special characters in between comapny name(".","@"). Space acceptable.
 3.  **Scrape & Extract**: Use the scrape tools on the initial URL. Analyze the text to find information needed for the `Final Output Template` below.
-4.  **Explore deeper**: If the first page is not enough, find links in the scrapped content with related endpoints. Use the `Web Scraper` tool on those links to find the missing information. Exploare more urls to pick important links.
-5.  **Save Links**: After you have finished all scraping, **must use the tool to save important links** (`15 -20 links max`) which provides information about comapny (like About, products & Services, Leadership & Team, Contact, solutions, industries, integrations, any other)
+4.  **Explore deeper**: If the first page is not enough, scrape the candidate links from the input that are most likely to hold the missing information (About, Services, Contact, ...). Only look for other links in the scrapped content when the candidates do not cover a topic.
+5.  **Save Links**: The input lists candidate links ranked by a link extractor over the site navigation and sitemap. Confirm them instead of searching for links yourself: drop irrelevant ones and add important pages it missed. After you have finished all scraping, **must use the tool to save important links** (`15 -20 links max`) which provides information about comapny (like About, products & Services, Leadership & Team, Contact, solutions, industries, integrations, any other)
 from the all scraped content. The input should be list of strings. `no social media links, careers, advertisements`.
 6.  **Format Final Answer**: Populate the `Final Output Template` with the information you have gathered. Your `Final Answer` must **only** be the filled-out template in plain text. Do not add any introductory text, links, or explanations in final output.
 
-	- use tools one at a time
+	- create directories first, then scrape several candidate links in a single turn (parallel tool calls) instead of one per turn
+	- exploration is limited to a fixed number of turns and pages, so prefer the most informative links
+	- long pages come back as a digest (outline, links, key facts); use `read_page` only when the digest misses something you need
 
   **dont forget to save important links using tool before providing final output** 
 later these links will be used to scrape company info and used as knowledge for an another assistant. so provide more than 20 important links.
@@ -168,3 +177,37 @@ Style
 	* Proactive: Suggest relevant services or tools (e.g., background checks, drug testing, identity verification, compliance insights, analytics dashboards).
 * Focused: Answer one question at a time and guide smoothly to related topics like global compliance, candidate experience, or technology integration.
 """
+
+# variable part of the agent conversation, sent after SYSTEM_PROMPT
+AGENT_TASK_PROMPT = """
+Go through the URL and give prompt like as above give reference:
+Main URL: {url}
+if you didn't get info in main url, use links from the scraped content by observing endpoints.
+save important links using tool before giving final output.
+
+Candidate links (ranked by the link extractor, confirm with save_links):
+{candidates}
+"""
+
+# -------------------
+# Versions and cache keys
+# -------------------
+# Bump a version when its prompt changes on purpose; the text hash in the
+# key also changes on any edit, so stale cache entries are never shared
+PROMPT_VERSIONS = {
+    "kb_refinement": 2,
+    "kb_description": 2,
+    "agent_exploration": 3,
+}
+
+_PROMPT_PREFIXES = {
+    "kb_refinement": MARKDOWN_PROMPT,
+    "kb_description": KNOWLEDGE_BASE_DESCRIPTION_PROMPT,
+    "agent_exploration": SYSTEM_PROMPT,
+}
+
+PROMPT_CACHE_KEYS = {
+    name: f"{name}-v{PROMPT_VERSIONS[name]}-"
+    + hashlib.sha256(prefix.encode("utf-8")).hexdigest()[:8]
+    for name, prefix in _PROMPT_PREFIXES.items()
+}
@@ -0,0 +1,98 @@
+"""Measure the cost of a log call on the event loop, direct vs queued
+
+Run it with:
+
+    python -m src.logging.benchmark --tasks 200 --messages 50
+"""
+
+import argparse
+import asyncio
+import logging
+import logging.handlers
+import os
+import queue
+import statistics
+import tempfile
+import time
+
+from src.logging.logger import AgentLogFormatter, AgentQueueHandler, log_step
+
+
+def _file_handler(directory: str, name: str) -> logging.Handler:
+    handler = logging.handlers.RotatingFileHandler(
+        os.path.join(directory, f"{name}.log"), maxBytes=50_000_000, backupCount=1
+    )
+    handler.setFormatter(AgentLogFormatter())
+    return handler
+
+
+async def _load(logger: logging.Logger, tasks: int, messages: int) -> list:
+    """Per-call latencies (µs) of log_step from many concurrent coroutines"""
+    latencies = []
+
+    async def job(index: int):
+        for step in range(messages):
+            start = time.perf_counter_ns()
+            log_step(logger, f"task_{index}", f"step_{step}", step, url="https://example.com")
+            latencies.append((time.perf_counter_ns() - start) / 1000)
+            await asyncio.sleep(0)
+
+    await asyncio.gather(*(job(i) for i in range(tasks)))
+    return latencies
+
+
+def _report(name: str, latencies: list, seconds: float) -> dict:
+    latencies.sort()
+    return {
+        "setup": name,
+        "calls": len(latencies),
+        "p50_us": round(statistics.median(latencies), 1),
+        "p95_us": round(latencies[int(len(latencies) * 0.95) - 1], 1),
+        "max_us": round(latencies[-1], 1),
+        "loop_seconds": round(seconds, 3),
+    }
+
+
+def run(tasks: int = 200, messages: int = 50) -> list:
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        direct = logging.getLogger("benchmark.direct")
+        direct.propagate = False
+        direct.setLevel(logging.INFO)
+        direct.addHandler(_file_handler(directory, "direct"))
+        start = time.perf_counter()
+        latencies = asyncio.run(_load(direct, tasks, messages))
+        results.append(_report("direct", latencies, time.perf_counter() - start))
+
+        queued = logging.getLogger("benchmark.queued")
+        queued.propagate = False
+        queued.setLevel(logging.INFO)
+        log_queue = queue.SimpleQueue()
+        listener = logging.handlers.QueueListener(log_queue, _file_handler(directory, "queued"))
+        listener.start()
+        queued.addHandler(AgentQueueHandler(log_queue))
+        start = time.perf_counter()
+        latencies = asyncio.run(_load(queued, tasks, messages))
+        results.append(_report("queued", latencies, time.perf_counter() - start))
+        drain = time.perf_counter()
+        listener.stop()
+        results[-1]["drain_seconds"] = round(time.perf_counter() - drain, 3)
+
+        for logger in (direct, queued):
+            for handler in list(logger.handlers):
+                handler.close()
+                logger.removeHandler(handler)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Log path overhead benchmark")
+    parser.add_argument("--tasks", type=int, default=200)
+    parser.add_argument("--messages", type=int, default=50)
+    args = parser.parse_args()
+    for result in run(args.tasks, args.messages):
+        print(result)
+
+
+if __name__ == "__main__":
+    main()
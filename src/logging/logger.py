@@ -1,14 +1,36 @@
-"""Production logging configuration for Millis agent creation"""
+"""Production logging configuration for Millis agent creation
 
+Records are put on a queue by the calling thread (the event loop) and
+formatted to JSON and written to file/console by a QueueListener thread,
+so logging never blocks on disk I/O. Module loggers under `src.` share the
+same pipeline as the "millis_agent" logger.
+"""
+
+import atexit
+import copy
 import logging
 import logging.handlers
 import os
+import queue
 from datetime import datetime
 import json
-from typing import Any
+from typing import Any, Optional
+
+try:
+    import orjson
+except ImportError:  # optional speed-up
+    orjson = None
+
+from src.core.config import Config
+
+# attributes every LogRecord has; anything else was passed through `extra`
+_RECORD_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "error"}
+
 
-# Create logs directory if it doesn't exist
-os.makedirs("logs", exist_ok=True)
+def _dumps(data: dict) -> str:
+    if orjson is not None:
+        return orjson.dumps(data, default=str).decode("utf-8")
+    return json.dumps(data, default=str)
 
 
 class AgentLogFormatter(logging.Formatter):
@@ -24,31 +46,54 @@ class AgentLogFormatter(logging.Formatter):
             "message": record.getMessage(),
         }
 
-        # Add extra fields if available
-        if hasattr(record, "task_id"):
-            log_data["task_id"] = record.task_id
-        if hasattr(record, "step"):
-            log_data["step"] = record.step
-        if hasattr(record, "progress"):
-            log_data["progress"] = record.progress
-        if hasattr(record, "duration_ms"):
-            log_data["duration_ms"] = record.duration_ms
+        # Add extra fields (task_id, step, progress, duration_ms, url, ...)
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and not key.startswith("_"):
+                log_data[key] = value
 
         # Add error details if present
+        error = getattr(record, "error", None)
+        if error is None and record.exc_info:
+            error = _error_details(record.exc_info)
+        if error is not None:
+            log_data["error"] = error
+
+        return _dumps(log_data)
+
+
+def _error_details(exc_info) -> dict:
+    return {"type": exc_info[0].__name__, "message": str(exc_info[1])}
+
+
+class AgentQueueHandler(logging.handlers.QueueHandler):
+    """Hand records to the listener thread with only the message rendered"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # args and exc_info may not be safe to format later in another thread
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
         if record.exc_info:
-            log_data["error"] = {
-                "type": record.exc_info[0].__name__,
-                "message": str(record.exc_info[1]),
-            }
+            record.error = _error_details(record.exc_info)
+            record.exc_info = None
+            record.exc_text = None
+        return record
+
 
-        return json.dumps(log_data)
+_listener: Optional[logging.handlers.QueueListener] = None
 
 
 def setup_logger() -> logging.Logger:
     """Setup production logger configuration"""
+    global _listener
+
     # Create logger
     logger = logging.getLogger("millis_agent")
-    logger.setLevel(logging.INFO)
+    if _listener is not None:
+        return logger
+
+    # Create logs directory if it doesn't exist
+    os.makedirs("logs", exist_ok=True)
 
     # File handler with rotation
     file_handler = logging.handlers.RotatingFileHandler(
@@ -61,18 +106,37 @@ def setup_logger() -> logging.Logger:
 
     # Console handler for critical errors
     console_handler = logging.StreamHandler()
-    console_handler.setLevel(logging.ERROR)
+    console_handler.setLevel(Config.LOG_CONSOLE_LEVEL)
     console_handler.setFormatter(AgentLogFormatter())
 
-    # Add handlers
-    logger.addHandler(file_handler)
-    logger.addHandler(console_handler)
+    log_queue = queue.SimpleQueue()
+    _listener = logging.handlers.QueueListener(
+        log_queue, file_handler, console_handler, respect_handler_level=True
+    )
+    _listener.start()
+    atexit.register(stop_logging)
+
+    # the pipeline logger and every `src.*` module logger feed the queue
+    queue_handler = AgentQueueHandler(log_queue)
+    for name in ("millis_agent", "src"):
+        target = logging.getLogger(name)
+        target.setLevel(Config.LOG_LEVEL)
+        target.addHandler(queue_handler)
+        target.propagate = False
 
     return logger
 
 
-# Initialize the logger
-logger = setup_logger()
+def stop_logging():
+    """Flush queued records and stop the listener thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+# configured by setup_logger() at app startup, which reads Config
+logger = logging.getLogger("millis_agent")
 
 
 class LogContext:
@@ -128,6 +192,3 @@ def log_step(
         f"Pipeline step: {step}",
         extra={"task_id": task_id, "step": step, "progress": progress, **extra},
     )
-
-
-logger = logging.getLogger(__name__)
@@ -0,0 +1,360 @@
+"""Local stand-in for the Millis API and S3 presigned uploads
+
+It also serves a path-style S3-compatible object API under `/_s3` for the
+artifact store (ARTIFACTS_S3_ENDPOINT=http://127.0.0.1:8900/_s3); request
+signatures are not checked.
+
+Run it with:
+
+    python -m src.millis_services.fake_server --port 8900 --latency-ms 80 --error-rate 0.02
+
+and point the service at it:
+
+    MILLIS_API_URL=http://127.0.0.1:8900 MILLIS_EU_API_URL=http://127.0.0.1:8900
+"""
+
+import argparse
+import asyncio
+import base64
+import hashlib
+import json
+import random
+import time
+import uuid
+from collections import Counter
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from typing import Dict, Optional, Tuple
+from xml.sax.saxutils import escape
+
+from fastapi import FastAPI, File, Form, HTTPException, Query, Request, UploadFile
+from fastapi.responses import JSONResponse, Response
+
+
+@dataclass
+class FakeSettings:
+    """Behaviour knobs for the fake server"""
+
+    latency_ms: float = 0.0  # base latency added to every request
+    jitter_ms: float = 0.0  # uniform +/- jitter around the base latency
+    error_rate: float = 0.0  # probability of answering with a 5xx
+    rate_limit: float = 0.0  # requests per second per API key, 0 disables
+    burst: int = 10  # token bucket size for the rate limiter
+    public_url: str = "http://127.0.0.1:8900"  # used to build presigned urls
+    seed: Optional[int] = None
+
+
+@dataclass
+class _Bucket:
+    tokens: float
+    updated: float = field(default_factory=time.monotonic)
+
+
+class FakeMillisState:
+    """In-memory store shared by all routes"""
+
+    def __init__(self, settings: FakeSettings):
+        self.settings = settings
+        self.random = random.Random(settings.seed)
+        self.agents: Dict[str, dict] = {}
+        self.files: Dict[str, dict] = {}
+        self.objects: Dict[str, bytes] = {}
+        # /_s3 objects: bucket -> key -> (data, last modified)
+        self.bucket_objects: Dict[str, Dict[str, Tuple[bytes, datetime]]] = {}
+        self.buckets: Dict[str, _Bucket] = {}
+        self.requests: Counter = Counter()
+        self.injected_errors: Counter = Counter()
+        self.throttled: Counter = Counter()
+
+    def reset(self):
+        self.agents.clear()
+        self.files.clear()
+        self.objects.clear()
+        self.bucket_objects.clear()
+        self.buckets.clear()
+        self.requests.clear()
+        self.injected_errors.clear()
+        self.throttled.clear()
+
+    def allow(self, client_key: str) -> bool:
+        """Token bucket rate limiting per API key"""
+        rate = self.settings.rate_limit
+        if rate <= 0:
+            return True
+        now = time.monotonic()
+        bucket = self.buckets.setdefault(client_key, _Bucket(self.settings.burst))
+        bucket.tokens = min(
+            self.settings.burst, bucket.tokens + (now - bucket.updated) * rate
+        )
+        bucket.updated = now
+        if bucket.tokens < 1:
+            return False
+        bucket.tokens -= 1
+        return True
+
+    def delay(self) -> float:
+        base = self.settings.latency_ms
+        jitter = self.settings.jitter_ms
+        return max(0.0, base + self.random.uniform(-jitter, jitter)) / 1000
+
+
+def _policy() -> str:
+    """Presigned POST policy that accepts gzip uploads"""
+    document = {
+        "expiration": "2099-01-01T00:00:00Z",
+        "conditions": [
+            ["starts-with", "$key", "uploads/"],
+            ["starts-with", "$Content-Encoding", ""],
+        ],
+    }
+    return base64.b64encode(json.dumps(document).encode("utf-8")).decode("ascii")
+
+
+def create_app(settings: Optional[FakeSettings] = None) -> FastAPI:
+    """Build the fake Millis/S3 application"""
+    state = FakeMillisState(settings or FakeSettings())
+    app = FastAPI(title="Fake Millis")
+    app.state.fake = state
+
+    @app.middleware("http")
+    async def chaos(request: Request, call_next):
+        route = request.url.path
+        if route.startswith("/_fake"):
+            return await call_next(request)
+
+        state.requests[route] += 1
+        delay = state.delay()
+        if delay:
+            await asyncio.sleep(delay)
+
+        client_key = request.headers.get("authorization", "anonymous")
+        if client_key.startswith("AWS4-HMAC-SHA256"):
+            # signatures change per request, rate limit the access key
+            client_key = client_key.split("Credential=", 1)[-1].split("/", 1)[0]
+        if not state.allow(client_key):
+            state.throttled[route] += 1
+            return JSONResponse(
+                {"detail": "Rate limit exceeded"},
+                status_code=429,
+                headers={"Retry-After": "1"},
+            )
+        if state.random.random() < state.settings.error_rate:
+            state.injected_errors[route] += 1
+            return JSONResponse({"detail": "Injected failure"}, status_code=503)
+        return await call_next(request)
+
+    # -------------------
+    # Agents
+    # -------------------
+    @app.post("/agents")
+    async def create_agent(payload: dict):
+        if not payload.get("name"):
+            raise HTTPException(status_code=422, detail="Agent name is required")
+        agent_id = uuid.uuid4().hex
+        state.agents[agent_id] = {"id": agent_id, "files": [], **payload}
+        return state.agents[agent_id]
+
+    @app.get("/agents")
+    async def list_agents():
+        return list(state.agents.values())
+
+    @app.get("/agents/{agent_id}")
+    async def get_agent(agent_id: str):
+        if agent_id not in state.agents:
+            raise HTTPException(status_code=404, detail="Agent not found")
+        return state.agents[agent_id]
+
+    # -------------------
+    # Knowledge files
+    # -------------------
+    @app.post("/knowledge/generate_presigned_url")
+    async def generate_presigned_url(payload: dict):
+        file_id = uuid.uuid4().hex
+        return {
+            "url": f"{state.settings.public_url}/s3/upload",
+            "fields": {
+                "key": f"uploads/{file_id}",
+                "policy": _policy(),
+                "x-amz-signature": "fake",
+            },
+            "filename": payload.get("filename"),
+        }
+
+    @app.post("/s3/upload")
+    async def s3_upload(
+        request: Request, key: str = Form(...), file: UploadFile = File(...)
+    ):
+        form = await request.form()
+        data = await file.read()
+        state.objects[key] = data
+        file_id = key.split("/")[-1]
+        state.files.setdefault(
+            file_id,
+            {
+                "id": file_id,
+                "name": file.filename,
+                "description": "",
+                "object_key": key,
+                "size": len(data),
+                "content_encoding": form.get("Content-Encoding"),
+            },
+        )
+        etag = hashlib.md5(data).hexdigest()
+        return Response(status_code=204, headers={"ETag": f'"{etag}"'})
+
+    @app.post("/knowledge/create_file")
+    async def create_file(payload: dict):
+        object_key = payload.get("object_key", "")
+        file_id = object_key.split("/")[-1]
+        state.files[file_id] = {
+            "id": file_id,
+            "name": payload.get("name"),
+            "description": payload.get("description", ""),
+            "object_key": object_key,
+            "file_type": payload.get("file_type"),
+            "size": payload.get("size"),
+            "agent_id": payload.get("agent_id"),
+        }
+        return file_id
+
+    @app.get("/knowledge/list_files")
+    async def list_files(limit: Optional[int] = None, offset: int = 0):
+        files = list(state.files.values())
+        if limit is None:
+            return files
+        return files[offset : offset + limit]
+
+    @app.post("/knowledge/set_agent_files")
+    async def set_agent_files(payload: dict):
+        agent = state.agents.get(payload.get("agent_id"))
+        if agent is None:
+            raise HTTPException(status_code=404, detail="Agent not found")
+        missing = [f for f in payload.get("files", []) if f not in state.files]
+        if missing:
+            raise HTTPException(status_code=400, detail=f"Unknown files: {missing}")
+        agent["files"] = payload.get("files", [])
+        agent["kb_messages"] = payload.get("messages", [])
+        return {"agent_id": agent["id"], "files": agent["files"]}
+
+    @app.post("/knowledge/delete_file")
+    async def delete_file(payload: dict):
+        file = state.files.pop(payload.get("id"), None)
+        if file is None:
+            raise HTTPException(status_code=404, detail="File not found")
+        state.objects.pop(file.get("object_key"), None)
+        return {"id": file["id"], "deleted": True}
+
+    # -------------------
+    # S3-compatible objects
+    # -------------------
+    def _s3_error(code: str, status: int) -> Response:
+        body = f'<?xml version="1.0" encoding="UTF-8"?><Error><Code>{code}</Code></Error>'
+        return Response(body, status_code=status, media_type="application/xml")
+
+    @app.put("/_s3/{bucket}/{key:path}")
+    async def put_object(bucket: str, key: str, request: Request):
+        data = await request.body()
+        state.bucket_objects.setdefault(bucket, {})[key] = (data, datetime.now(timezone.utc))
+        return Response(status_code=200, headers={"ETag": f'"{hashlib.md5(data).hexdigest()}"'})
+
+    @app.get("/_s3/{bucket}/{key:path}")
+    async def get_object(bucket: str, key: str):
+        item = state.bucket_objects.get(bucket, {}).get(key)
+        if item is None:
+            return _s3_error("NoSuchKey", 404)
+        return Response(item[0], media_type="application/octet-stream")
+
+    @app.delete("/_s3/{bucket}/{key:path}")
+    async def delete_object(bucket: str, key: str):
+        state.bucket_objects.get(bucket, {}).pop(key, None)
+        return Response(status_code=204)
+
+    @app.get("/_s3/{bucket}")
+    async def list_objects(
+        bucket: str,
+        prefix: str = "",
+        max_keys: int = Query(1000, alias="max-keys"),
+        token: Optional[str] = Query(None, alias="continuation-token"),
+    ):
+        objects = state.bucket_objects.get(bucket, {})
+        keys = sorted(k for k in objects if k.startswith(prefix) and k > (token or ""))
+        page, truncated = keys[:max_keys], len(keys) > max_keys
+        contents = ""
+        for key in page:
+            data, modified = objects[key]
+            contents += (
+                f"<Contents><Key>{escape(key)}</Key>"
+                f"<LastModified>{modified.isoformat(timespec='milliseconds')[:-6]}Z</LastModified>"
+                f"<Size>{len(data)}</Size></Contents>"
+            )
+        if truncated:
+            contents += f"<NextContinuationToken>{escape(page[-1])}</NextContinuationToken>"
+        body = (
+            '<?xml version="1.0" encoding="UTF-8"?>'
+            '<ListBucketResult xmlns="http://s3.amazonaws.com/doc/2006-03-01/">'
+            f"<Name>{escape(bucket)}</Name><Prefix>{escape(prefix)}</Prefix>"
+            f"<KeyCount>{len(page)}</KeyCount><MaxKeys>{max_keys}</MaxKeys>"
+            f"<IsTruncated>{'true' if truncated else 'false'}</IsTruncated>"
+            f"{contents}</ListBucketResult>"
+        )
+        return Response(body, media_type="application/xml")
+
+    # -------------------
+    # Control endpoints
+    # -------------------
+    @app.get("/_fake/stats")
+    async def stats():
+        return {
+            "settings": asdict(state.settings),
+            "requests": dict(state.requests),
+            "injected_errors": dict(state.injected_errors),
+            "throttled": dict(state.throttled),
+            "agents": len(state.agents),
+            "files": len(state.files),
+            "objects": sum(len(objects) for objects in state.bucket_objects.values()),
+        }
+
+    @app.post("/_fake/settings")
+    async def update_settings(payload: dict):
+        for name, value in payload.items():
+            if hasattr(state.settings, name):
+                setattr(state.settings, name, value)
+        return asdict(state.settings)
+
+    @app.post("/_fake/reset")
+    async def reset():
+        state.reset()
+        return {"status": "reset"}
+
+    return app
+
+
+def main():
+    """Run the fake server with uvicorn"""
+    import uvicorn  # pylint: disable=import-outside-toplevel
+
+    parser = argparse.ArgumentParser(description="Fake Millis/S3 server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit", type=float, default=0.0)
+    parser.add_argument("--burst", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    settings = FakeSettings(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        rate_limit=args.rate_limit,
+        burst=args.burst,
+        public_url=f"http://{args.host}:{args.port}",
+        seed=args.seed,
+    )
+    uvicorn.run(create_app(settings), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
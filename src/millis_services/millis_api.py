@@ -1,32 +1,107 @@
-from io import BytesIO
+import asyncio
+import time
+from typing import Dict, Optional
+
 import httpx
 
-async def get_files_in_millis(api_key: str):
-    """ List the files in millis """
+from src.core.config import Config
+from src.utils.http_client import get_http_client
+from src.utils.s3_upload import upload_stream_to_s3
+
+async def _list_files_paginated(api_key: str, page_size: int):
+    """ Fetch the full file listing page by page """
 
-    url = "https://api-west.millis.ai/knowledge/list_files"
+    url = f"{Config.MILLIS_API_URL}/knowledge/list_files"
     headers = {
-        "Authorization": api_key,   # ✅ Add Bearer prefix
+        "Authorization": api_key,
         "Accept": "application/json"
     }
 
-    async with httpx.AsyncClient() as client:
-        response = await client.get(url, headers=headers)
-        response.raise_for_status()  # raises HTTPStatusError for 4xx/5xx
-        return response
-
-
-async def get_old_file_details(old_file_id, files):
-    """ Get the old file details(fields)"""
-    for file in files:
-        if file.get("id") == old_file_id:
-            return file  
-    return None 
+    files, seen = [], set()
+    offset = 0
+    client = get_http_client()
+    while True:
+        params = {"limit": page_size, "offset": offset}
+        response = await client.get(url, headers=headers, params=params)
+        response.raise_for_status()
+        page = response.json()
+        if isinstance(page, dict):
+            page = page.get("files") or page.get("items") or []
+
+        new_files = [f for f in page if f.get("id") not in seen]
+        files.extend(new_files)
+        seen.update(f.get("id") for f in new_files)
+
+        # a short page means we are done; a page over the limit is the whole
+        # list from a server ignoring pagination, and so is a repeated page
+        if len(page) != page_size or len(new_files) < len(page):
+            return files
+        offset += page_size
+
+
+class FileCatalog:
+    """ Knowledge file listing cached for a short TTL and indexed by id and name """
+
+    def __init__(self, ttl: float = None, page_size: int = None):
+        self.ttl = Config.MILLIS_FILES_CACHE_TTL if ttl is None else ttl
+        self.page_size = page_size or Config.MILLIS_FILES_PAGE_SIZE
+        self._by_id: Dict[str, Dict[str, dict]] = {}
+        self._by_name: Dict[str, Dict[str, dict]] = {}
+        self._loaded_at: Dict[str, float] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    def _is_fresh(self, api_key: str) -> bool:
+        loaded_at = self._loaded_at.get(api_key)
+        return loaded_at is not None and time.monotonic() - loaded_at < self.ttl
+
+    async def _ensure_loaded(self, api_key: str):
+        if self._is_fresh(api_key):
+            return
+        lock = self._locks.setdefault(api_key, asyncio.Lock())
+        async with lock:
+            # another coroutine may have refreshed while we waited
+            if self._is_fresh(api_key):
+                return
+            files = await _list_files_paginated(api_key, self.page_size)
+            self._by_id[api_key] = {f.get("id"): f for f in files}
+            self._by_name[api_key] = {f.get("name"): f for f in files}
+            self._loaded_at[api_key] = time.monotonic()
+
+    async def files(self, api_key: str) -> list:
+        """ All files for the api key """
+        await self._ensure_loaded(api_key)
+        return list(self._by_id[api_key].values())
+
+    async def get_by_id(self, api_key: str, file_id: str) -> Optional[dict]:
+        """ File details by id """
+        await self._ensure_loaded(api_key)
+        return self._by_id[api_key].get(file_id)
+
+    async def get_by_name(self, api_key: str, name: str) -> Optional[dict]:
+        """ File details by name """
+        await self._ensure_loaded(api_key)
+        return self._by_name[api_key].get(name)
+
+    def invalidate(self, api_key: str = None):
+        """ Drop the cached listing (for one api key or all of them) """
+        if api_key is None:
+            self._loaded_at.clear()
+        else:
+            self._loaded_at.pop(api_key, None)
+
+    def evict(self, api_key: str, file_id: str):
+        """ Remove a deleted file from the index without refetching """
+        file = self._by_id.get(api_key, {}).pop(file_id, None)
+        if file is not None:
+            self._by_name.get(api_key, {}).pop(file.get("name"), None)
+
+
+file_catalog = FileCatalog()
 
 async def generate_presigned_url(api_key, filename):
     """ Generate url to upload the file"""
 
-    url = "https://api-west.millis.ai/knowledge/generate_presigned_url"
+    url = f"{Config.MILLIS_API_URL}/knowledge/generate_presigned_url"
     headers = {
         "Authorization": api_key,
         "Content-Type": "application/json"
@@ -34,33 +109,23 @@ async def generate_presigned_url(api_key, filename):
     payload = {
         "filename": filename
     }
-    async with httpx.AsyncClient() as client:
-        response = await client.post(url, headers=headers, json=payload)
+    client = get_http_client()
+    response = await client.post(url, headers=headers, json=payload)
     response.raise_for_status()
     return response
 
-async def upload_text_to_s3(s3_url, fields, text, file_name="bhg.txt"):
-    """ Upload file to s3 through generated url"""
-
-    if isinstance(text, str):
-        file_bytes = text.encode("utf-8")
-    else:
-        file_bytes = text
-
-    file_obj = BytesIO(file_bytes)
-
-    files = {"file": (file_name, file_obj)}
-    async with httpx.AsyncClient() as client:
-        response = await client.post(s3_url, data=fields, files=files)
+async def upload_text_to_s3(s3_url, fields, text, file_name="bhg.txt", gzip=False):
+    """ Upload file to s3 through generated url (text, bytes, path or async iterator)"""
 
-    # response = requests.post(s3_url, data=fields, files=files)
-    response.raise_for_status()  # Raise error if upload fails
+    response, _ = await upload_stream_to_s3(
+        s3_url, fields, text, file_name=file_name, gzip=gzip
+    )
     return response
 
 async def create_file_in_millis(params):
     """ Upload the new file(kb) to the millis from s3 """
 
-    url = "https://api-west.millis.ai/knowledge/create_file"
+    url = f"{Config.MILLIS_API_URL}/knowledge/create_file"
     headers = {
         "Authorization": params["API_KEY"],
         "Content-Type": "application/json"
@@ -73,15 +138,16 @@ async def create_file_in_millis(params):
         "file_type": "text/plain",
         "size": params["file_size"]
     }
-    async with httpx.AsyncClient() as client:
-        response = await client.post(url, headers=headers, json=payload)
+    client = get_http_client()
+    response = await client.post(url, headers=headers, json=payload)
     response.raise_for_status()
+    file_catalog.invalidate(params["API_KEY"])
     return response
 
 async def set_knowledge_base(api_key, assistant_id, new_file_id):
     """ Set the uploaded file as knowledge base to the assistant"""
 
-    url = "https://api-eu-west.millis.ai/knowledge/set_agent_files"
+    url = f"{Config.MILLIS_EU_API_URL}/knowledge/set_agent_files"
 
     payload = {
         "agent_id": assistant_id,
@@ -93,14 +159,14 @@ async def set_knowledge_base(api_key, assistant_id, new_file_id):
         "Content-Type": "application/json"
     }
     timeout = httpx.Timeout(10.0)
-    async with httpx.AsyncClient(timeout=timeout) as client:
-        response = await client.post(url, headers=headers, json=payload)
+    client = get_http_client()
+    response = await client.post(url, headers=headers, json=payload, timeout=timeout)
     return response
 
 async def delete_knowledge_base(api_key, old_file_id):
     """ Delete the old knowledge base"""
 
-    url = "https://api-west.millis.ai/knowledge/delete_file"
+    url = f"{Config.MILLIS_API_URL}/knowledge/delete_file"
 
     payload = { "id": old_file_id }
     headers = {
@@ -108,6 +174,8 @@ async def delete_knowledge_base(api_key, old_file_id):
         "Content-Type": "application/json"
     }
     timeout = httpx.Timeout(10.0)
-    async with httpx.AsyncClient(timeout=timeout) as client:
-        response = await client.post(url, headers=headers, json=payload)
+    client = get_http_client()
+    response = await client.post(url, headers=headers, json=payload, timeout=timeout)
+    if response.is_success:
+        file_catalog.evict(api_key, old_file_id)
     return response
\ No newline at end of file
@@ -0,0 +1,205 @@
+"""Prometheus metrics for the pipeline, scraper, LLM and Millis hot paths
+
+Everything is registered on the default registry and served by `GET /metrics`
+in app.py. Values are per process; run one exporter per uvicorn worker.
+"""
+
+import asyncio
+import time
+from collections import deque
+from typing import Deque, Dict, Optional, Tuple
+from urllib.parse import urlparse
+
+import httpx
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+
+from src.core.config import Config
+
+_STEP_BUCKETS = (0.1, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300, 600)
+_REQUEST_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60)
+_CPU_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+
+PIPELINE_STEP_SECONDS = Histogram(
+    "pipeline_step_seconds",
+    "Time spent in one step of an agent-creation task",
+    ["step"],
+    buckets=_STEP_BUCKETS,
+)
+PIPELINE_TASK_SECONDS = Histogram(
+    "pipeline_task_seconds",
+    "Time from the first step of a task to its final state",
+    ["outcome"],
+    buckets=_STEP_BUCKETS + (900, 1800),
+)
+TASKS_IN_PROGRESS = Gauge("pipeline_tasks_in_progress", "Tasks past their first step")
+BATCH_QUEUE_DEPTH = Gauge("batch_queue_depth", "Batch jobs waiting for a worker")
+BATCH_ACTIVE_JOBS = Gauge("batch_active_jobs", "Batch jobs running on a worker")
+
+SCRAPE_SECONDS = Histogram(
+    "scrape_seconds",
+    "Latency of fetching one url, by fetch tier",
+    ["tier", "outcome"],
+    buckets=_REQUEST_BUCKETS,
+)
+
+KB_EXTRACTIONS = Counter(
+    "kb_extractions", "Knowledge base pages by how their text was produced", ["method"]
+)
+CONVERT_SECONDS = Histogram(
+    "convert_seconds",
+    "Time to convert or clean one page, inline on the event loop or in the process pool",
+    ["function", "where"],
+    buckets=_CPU_BUCKETS,
+)
+EVENT_LOOP_LAG_SECONDS = Histogram(
+    "event_loop_lag_seconds",
+    "How late the event loop ran a periodic timer; high values mean blocking work on the loop",
+    buckets=_CPU_BUCKETS,
+)
+
+LLM_CALL_SECONDS = Histogram(
+    "llm_call_seconds",
+    "Latency of one LLM call (a whole stream or batch counts as one call)",
+    ["model"],
+    buckets=_REQUEST_BUCKETS,
+)
+LLM_TOKENS = Counter("llm_tokens", "LLM tokens by model and kind", ["model", "kind"])
+
+MILLIS_REQUEST_SECONDS = Histogram(
+    "millis_request_seconds",
+    "Latency of Millis API requests until the response headers",
+    ["endpoint", "method"],
+    buckets=_REQUEST_BUCKETS,
+)
+MILLIS_REQUESTS = Counter(
+    "millis_requests", "Millis API responses by status", ["endpoint", "method", "status"]
+)
+
+
+class StepTimer:
+    """
+    Time pipeline steps from consecutive progress updates
+
+    A step lasts from its own progress update until the next one of the same
+    task, so callers only report step names and never pair start and stop.
+    """
+
+    def __init__(self):
+        # task_id -> (current step, step started, task started)
+        self._open: Dict[str, Tuple[str, float, float]] = {}
+
+    def mark(self, task_id: str, step: str):
+        now = time.perf_counter()
+        current = self._open.get(task_id)
+        if current is None:
+            self._open[task_id] = (step, now, now)
+            TASKS_IN_PROGRESS.set(len(self._open))
+            return
+        previous, step_started, task_started = current
+        if previous == step:
+            return
+        PIPELINE_STEP_SECONDS.labels(previous).observe(now - step_started)
+        self._open[task_id] = (step, now, task_started)
+
+    def finish(self, task_id: str, outcome: str):
+        """Close the last step of a task; `complete` itself takes no time"""
+        current = self._open.pop(task_id, None)
+        if current is None:
+            return
+        now = time.perf_counter()
+        step, step_started, task_started = current
+        if outcome != "success":
+            PIPELINE_STEP_SECONDS.labels(step).observe(now - step_started)
+        PIPELINE_TASK_SECONDS.labels(outcome).observe(now - task_started)
+        TASKS_IN_PROGRESS.set(len(self._open))
+
+
+step_timer = StepTimer()
+
+
+def observe_scrape(tier: str, started: float, ok: bool):
+    SCRAPE_SECONDS.labels(tier, "ok" if ok else "error").observe(time.perf_counter() - started)
+
+
+def observe_convert(function: str, where: str, seconds: float):
+    CONVERT_SECONDS.labels(function, where).observe(seconds)
+
+
+def observe_kb_extraction(method: str):
+    KB_EXTRACTIONS.labels(method).inc()
+
+
+def observe_llm_call(model: Optional[str], seconds: Optional[float], usage: Optional[dict]):
+    model = model or "unknown"
+    if seconds is not None:
+        LLM_CALL_SECONDS.labels(model).observe(seconds)
+    if usage:
+        cached = (usage.get("input_token_details") or {}).get("cache_read", 0)
+        LLM_TOKENS.labels(model, "input").inc(usage.get("input_tokens", 0))
+        LLM_TOKENS.labels(model, "output").inc(usage.get("output_tokens", 0))
+        if cached:
+            LLM_TOKENS.labels(model, "cached").inc(cached)
+
+
+def _millis_hosts():
+    return {urlparse(url).hostname for url in (Config.MILLIS_API_URL, Config.MILLIS_EU_API_URL)}
+
+
+async def _on_request(request: httpx.Request):
+    request.extensions["metrics_started"] = time.perf_counter()
+
+
+async def _on_response(response: httpx.Response):
+    request = response.request
+    started = request.extensions.get("metrics_started")
+    if started is None or request.url.host not in _millis_hosts():
+        return
+    endpoint, method = request.url.path, request.method
+    MILLIS_REQUEST_SECONDS.labels(endpoint, method).observe(time.perf_counter() - started)
+    MILLIS_REQUESTS.labels(endpoint, method, str(response.status_code)).inc()
+
+
+# event hooks for the shared httpx client (see src/utils/http_client.py)
+HTTP_EVENT_HOOKS = {"request": [_on_request], "response": [_on_response]}
+
+
+class LoopLagMonitor:
+    """Sample the event loop lag into EVENT_LOOP_LAG_SECONDS; recent samples stay in `lags`"""
+
+    def __init__(self, interval: Optional[float] = None, keep: int = 10_000):
+        # None: Config.LOOP_LAG_INTERVAL_MS, read when the monitor starts
+        self.interval = interval
+        self.lags: Deque[float] = deque(maxlen=keep)
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None:
+            self.interval = self.interval or Config.LOOP_LAG_INTERVAL_MS / 1000
+            self._task = asyncio.create_task(self._run(), name="loop-lag-monitor")
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - expected)
+            self.lags.append(lag)
+            EVENT_LOOP_LAG_SECONDS.observe(lag)
+
+
+def bind_batch_gauges(scheduler):
+    """Read queue depth and active jobs from the scheduler at scrape time"""
+    BATCH_QUEUE_DEPTH.set_function(lambda: scheduler.queue_depth)
+    BATCH_ACTIVE_JOBS.set_function(lambda: scheduler.active_jobs)
+
+
+def render_metrics() -> Tuple[bytes, str]:
+    """(body, content type) of the exposition of every metric"""
+    return generate_latest(), CONTENT_TYPE_LATEST
@@ -0,0 +1,310 @@
+"""Opt-in wall-clock profiling of agent-creation jobs
+
+A sampler thread looks at the event-loop thread every few milliseconds and
+records, for each profiled job:
+
+- `running`: the Python stack while one of the job's tasks holds the loop
+  (regex cleaning, parsing, sync calls that block the loop)
+- `waiting`: the await chain of each of the job's suspended tasks (browser
+  startup, LLM and HTTP latency)
+- slow callbacks: the stack of every stretch where the loop did not tick for
+  longer than PROFILE_SLOW_CALLBACK_MS, whichever job caused it
+
+A loop-lag probe on the loop itself measures how late timers fire.
+
+Tasks belong to a job when they were created while its profile was current;
+a task factory on the loop records that, so work in `asyncio.gather` and
+friends is attributed to the right job when jobs run concurrently. Work
+offloaded to threads is only seen as the await on its future.
+
+`collapsed` holds the stacks in the folded format of flamegraph.pl and
+speedscope.
+"""
+
+import asyncio
+import logging
+import os
+import statistics
+import sys
+import sysconfig
+import threading
+import time
+import weakref
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+
+from src.core.config import Config
+
+logger = logging.getLogger(__name__)
+
+_current_profile: ContextVar[Optional["JobProfile"]] = ContextVar(
+    "current_profile", default=None
+)
+
+_MAX_DEPTH = 64
+_MAX_SLOW_CALLBACKS = 50
+_names: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+_CWD = os.getcwd() + os.sep
+_STDLIB = sysconfig.get_paths()["stdlib"] + os.sep
+
+
+def _code_name(code) -> str:
+    name = _names.get(code)
+    if name is None:
+        path = code.co_filename
+        if path.startswith(_CWD):
+            path = path[len(_CWD):]
+        elif path.startswith(_STDLIB):
+            path = path[len(_STDLIB):]
+        elif "site-packages" + os.sep in path:
+            path = path.split("site-packages" + os.sep, 1)[1]
+        name = _names[code] = f"{code.co_qualname} ({path}:{code.co_firstlineno})"
+    return name
+
+
+def _frame_stack(frame) -> Tuple[str, ...]:
+    """Root-first names of a thread's frames"""
+    names = []
+    while frame is not None and len(names) < _MAX_DEPTH:
+        names.append(_code_name(frame.f_code))
+        frame = frame.f_back
+    return tuple(reversed(names))
+
+
+def _await_stack(task: asyncio.Task) -> Tuple[str, ...]:
+    """Outermost-first names of the coroutines a suspended task is awaiting"""
+    names = []
+    coro = task.get_coro()
+    while coro is not None and len(names) < _MAX_DEPTH:
+        frame = getattr(coro, "cr_frame", None) or getattr(coro, "gi_frame", None)
+        if frame is None:
+            break
+        names.append(_code_name(frame.f_code))
+        coro = getattr(coro, "cr_await", None) or getattr(coro, "gi_yieldfrom", None)
+    if coro is not None and not names:
+        names.append(type(coro).__name__)
+    return tuple(names)
+
+
+def _percentile(values: List[float], share: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * share))]
+
+
+class JobProfile:
+    """Samples collected for one job"""
+
+    def __init__(self, task_id: str):
+        self.task_id = task_id
+        self.started_at = time.time()
+        self._started = time.perf_counter()
+        self.seconds: Optional[float] = None
+        self.running: Counter = Counter()
+        self.waiting: Counter = Counter()
+        # measured time between samples that found the job on the loop
+        self.on_loop: float = 0.0
+        self.lags_ms: List[float] = []
+        self.slow_callbacks: List[Dict] = []
+
+    def offset(self) -> float:
+        """Seconds since the job started"""
+        return round(time.perf_counter() - self._started, 3)
+
+    def finish(self):
+        self.seconds = self.offset()
+
+    def report(self) -> Dict:
+        interval_ms = Config.PROFILE_INTERVAL_MS
+        own = Counter()
+        for stack, count in self.running.items():
+            own[stack[-1]] += count
+        lags = self.lags_ms
+        collapsed = [
+            f"{state};{';'.join(stack)} {count}"
+            for state, samples in (("running", self.running), ("waiting", self.waiting))
+            for stack, count in samples.most_common()
+        ]
+        return {
+            "task_id": self.task_id,
+            "started_at": self.started_at,
+            "seconds": self.seconds,
+            "interval_ms": interval_ms,
+            "samples": {
+                "running": sum(self.running.values()),
+                "waiting": sum(self.waiting.values()),
+            },
+            # time the job's own code held the loop: the sampler thread waits for
+            # the GIL behind a busy loop, so samples are further apart than the interval
+            "on_loop_seconds": round(self.on_loop, 3),
+            "top_running": [
+                {"frame": frame, "samples": count} for frame, count in own.most_common(30)
+            ],
+            "loop_lag_ms": {
+                "samples": len(lags),
+                "p50": round(statistics.median(lags), 2) if lags else None,
+                "p95": round(_percentile(lags, 0.95), 2) if lags else None,
+                "p99": round(_percentile(lags, 0.99), 2) if lags else None,
+                "max": round(max(lags), 2) if lags else None,
+            },
+            "slow_callbacks": sorted(
+                self.slow_callbacks, key=lambda item: -item["ms"]
+            )[:_MAX_SLOW_CALLBACKS],
+            "collapsed": "\n".join(collapsed),
+        }
+
+
+class _LoopSampler:
+    """Sampler thread and lag probe of one event loop, shared by its jobs"""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+        self.loop_thread = threading.get_ident()
+        self.interval = Config.PROFILE_INTERVAL_MS / 1000
+        self.lag_interval = Config.PROFILE_LAG_INTERVAL_MS / 1000
+        self.slow_after = Config.PROFILE_SLOW_CALLBACK_MS / 1000
+        self.profiles: List[JobProfile] = []
+        self.tasks: "weakref.WeakKeyDictionary[asyncio.Task, JobProfile]" = (
+            weakref.WeakKeyDictionary()
+        )
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._probe: Optional[asyncio.Task] = None
+        self._last_tick = time.perf_counter()
+        self._last_sample = time.perf_counter()
+        self._slow: Optional[List[Dict]] = None
+        self._previous_factory = None
+
+    def _task_factory(self, loop, coro, **kwargs):
+        if self._previous_factory is not None:
+            task = self._previous_factory(loop, coro, **kwargs)
+        else:
+            task = asyncio.Task(coro, loop=loop, **kwargs)
+        context = kwargs.get("context")
+        profile = context.get(_current_profile) if context else _current_profile.get()
+        if profile is not None:
+            with self._lock:
+                self.tasks[task] = profile
+        return task
+
+    def add(self, profile: JobProfile, task: Optional[asyncio.Task]):
+        with self._lock:
+            self.profiles.append(profile)
+            if task is not None:
+                self.tasks[task] = profile
+        if self._thread is None:
+            # installed only while jobs are profiled
+            self._previous_factory = self.loop.get_task_factory()
+            self.loop.set_task_factory(self._task_factory)
+            self._stop.clear()
+            self._last_tick = self._last_sample = time.perf_counter()
+            self._probe = self.loop.create_task(self._lag_probe(), name="profile-lag-probe")
+            self._thread = threading.Thread(target=self._run, name="job-profiler", daemon=True)
+            self._thread.start()
+
+    def remove(self, profile: JobProfile):
+        with self._lock:
+            self.profiles.remove(profile)
+            # including tasks the job left running
+            for task in [t for t, owner in self.tasks.items() if owner is profile]:
+                del self.tasks[task]
+            idle = not self.profiles
+        if idle and self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+            self._probe.cancel()
+            self._probe = None
+            if self.loop.get_task_factory() == self._task_factory:
+                self.loop.set_task_factory(self._previous_factory)
+            self._previous_factory = None
+
+    async def _lag_probe(self):
+        while True:
+            start = time.perf_counter()
+            self._last_tick = start
+            await asyncio.sleep(self.lag_interval)
+            lag_ms = max(0.0, (time.perf_counter() - start - self.lag_interval) * 1000)
+            with self._lock:
+                for profile in self.profiles:
+                    profile.lags_ms.append(lag_ms)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self._sample()
+            except Exception as e:  # pylint: disable=broad-exception-caught
+                # the loop mutates its tasks while we read them; skip this tick
+                logger.debug(f"Profiler sample skipped: {e}")
+
+    def _sample(self):
+        now = time.perf_counter()
+        elapsed, self._last_sample = now - self._last_sample, now
+        frame = sys._current_frames().get(self.loop_thread)  # pylint: disable=protected-access
+        current = asyncio.current_task(self.loop)
+        with self._lock:
+            owners = list(self.tasks.items())
+            profiles = list(self.profiles)
+        owner = dict(owners).get(current) if current is not None else None
+
+        stack = _frame_stack(frame) if frame is not None else ()
+        if owner is not None and stack:
+            owner.running[stack] += 1
+            owner.on_loop += elapsed
+        for task, profile in owners:
+            if task is not current and not task.done():
+                profile.waiting[_await_stack(task)] += 1
+        self._check_slow(stack, owner, profiles)
+
+    def _check_slow(self, stack, owner: Optional[JobProfile], profiles: List[JobProfile]):
+        """Record stretches where the lag probe could not run"""
+        stalled = time.perf_counter() - self._last_tick - self.lag_interval
+        if stalled < self.slow_after:
+            self._slow = None
+            return
+        if self._slow is None:
+            # a stall hurts every job on the loop; `job` names the one that caused it
+            job = owner.task_id if owner is not None else None
+            self._slow = []
+            for profile in profiles:
+                if len(profile.slow_callbacks) < 10 * _MAX_SLOW_CALLBACKS:
+                    entry = {"offset_s": profile.offset(), "ms": 0.0, "job": job}
+                    entry["stack"] = list(stack[-20:])
+                    profile.slow_callbacks.append(entry)
+                    self._slow.append(entry)
+        for entry in self._slow:
+            entry["ms"] = round(stalled * 1000, 1)
+
+
+_samplers: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, _LoopSampler]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def profiling_enabled(requested: Optional[bool] = None) -> bool:
+    return bool(requested) or Config.PROFILE_JOBS
+
+
+@contextmanager
+def profile_job(task_id: str, enabled: bool = True):
+    """Profile the calling task and every task it creates; yields the profile or None"""
+    if not enabled:
+        yield None
+        return
+    loop = asyncio.get_running_loop()
+    sampler = _samplers.get(loop)
+    if sampler is None:
+        sampler = _samplers[loop] = _LoopSampler(loop)
+    profile = JobProfile(task_id)
+    task = asyncio.current_task()
+    # before the profile becomes current, so the lag probe is nobody's task
+    sampler.add(profile, task)
+    token = _current_profile.set(profile)
+    try:
+        yield profile
+    finally:
+        _current_profile.reset(token)
+        profile.finish()
+        sampler.remove(profile)
@@ -0,0 +1,234 @@
+"""OpenTelemetry tracing of agent-creation tasks, exported as OTLP
+
+Each task is one trace: an `agent_creation` root span, one child span per
+pipeline step and, below those, spans for url scrapes, LLM calls and Millis
+requests. Every span carries the `task.id` of the cost scope it started in.
+
+Spans go to a local file of OTLP-JSON lines (`TRACING_EXPORTER=file`, one
+ExportTraceServiceRequest per line, readable by the collector's
+otlpjsonfile receiver) or to a collector over OTLP/HTTP
+(`TRACING_EXPORTER=otlp`). Without an exporter the OpenTelemetry API is a
+no-op.
+"""
+
+import base64
+import json
+import logging
+import os
+import threading
+from contextlib import contextmanager
+from typing import Optional, Sequence
+
+import httpx
+from google.protobuf.json_format import MessageToDict
+from opentelemetry import context, trace
+from opentelemetry.exporter.otlp.proto.common.trace_encoder import encode_spans
+from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.trace import ReadableSpan, SpanProcessor, TracerProvider
+from opentelemetry.sdk.trace.export import BatchSpanProcessor, SpanExporter, SpanExportResult
+from opentelemetry.trace import SpanKind, Status, StatusCode
+
+from src.core.config import Config
+from src.track_cost.ledger import current_task_id
+
+logger = logging.getLogger(__name__)
+
+tracer = trace.get_tracer("millis_agent")
+
+_provider: Optional[TracerProvider] = None
+
+
+class _TaskIdProcessor(SpanProcessor):
+    """Tag every span with the task id of the cost scope it starts in"""
+
+    def on_start(self, span, parent_context=None):
+        task_id = current_task_id.get()
+        if task_id:
+            span.set_attribute("task.id", task_id)
+
+
+def _hex_ids(value):
+    """OTLP-JSON spells trace and span ids in hex, protobuf JSON in base64"""
+    if isinstance(value, dict):
+        return {
+            key: base64.b64decode(item).hex()
+            if key in ("traceId", "spanId", "parentSpanId") and item
+            else _hex_ids(item)
+            for key, item in value.items()
+        }
+    if isinstance(value, list):
+        return [_hex_ids(item) for item in value]
+    return value
+
+
+class OTLPJsonFileExporter(SpanExporter):
+    """Append spans to a file as OTLP-JSON, one export request per line"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def export(self, spans: Sequence[ReadableSpan]) -> SpanExportResult:
+        request = MessageToDict(encode_spans(spans), use_integers_for_enums=True)
+        line = json.dumps(_hex_ids(request), separators=(",", ":"))
+        try:
+            with self._lock, open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+        except OSError as e:
+            logger.error(f"Could not write spans to {self.path}: {e}")
+            return SpanExportResult.FAILURE
+        return SpanExportResult.SUCCESS
+
+    def shutdown(self):
+        pass
+
+
+def _exporter() -> Optional[SpanExporter]:
+    kind = (Config.TRACING_EXPORTER or "").lower()
+    if kind == "file":
+        return OTLPJsonFileExporter(Config.TRACING_FILE)
+    if kind == "otlp":
+        # pylint: disable=import-outside-toplevel
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+
+        # without an endpoint the exporter reads OTEL_EXPORTER_OTLP_* variables
+        return OTLPSpanExporter(endpoint=Config.TRACING_OTLP_ENDPOINT)
+    if kind:
+        logger.warning(f"Unknown TRACING_EXPORTER {kind!r}, tracing disabled")
+    return None
+
+
+def setup_tracing() -> bool:
+    """Install the tracer provider once; returns whether spans are exported"""
+    global _provider
+    if _provider is not None:
+        return True
+    exporter = _exporter()
+    if exporter is None:
+        return False
+    _provider = TracerProvider(resource=Resource.create({"service.name": "millis-agent"}))
+    _provider.add_span_processor(_TaskIdProcessor())
+    _provider.add_span_processor(BatchSpanProcessor(exporter))
+    trace.set_tracer_provider(_provider)
+    logger.info(f"Exporting traces with the {Config.TRACING_EXPORTER} exporter")
+    return True
+
+
+def shutdown_tracing():
+    """Flush buffered spans"""
+    if _provider is not None:
+        _provider.shutdown()
+
+
+def record_error(span, error: BaseException):
+    span.record_exception(error)
+    span.set_status(Status(StatusCode.ERROR, str(error)))
+
+
+class TaskTrace:
+    """
+    Root span of one task, with the current pipeline step as a child span
+
+    `step()` ends the previous step span and makes the new one current, so the
+    scrapes, LLM calls and Millis requests of a step nest below it. Steps must
+    be entered from the coroutine that opened the trace.
+    """
+
+    def __init__(self, task_id: str, **attributes):
+        self.task_id = task_id
+        self.attributes = attributes
+        self.root = None
+        self._root_token = None
+        self._step = None
+        self._step_token = None
+
+    def __enter__(self):
+        self.root = tracer.start_span(
+            "agent_creation", attributes={"task.id": self.task_id, **self.attributes}
+        )
+        self._root_token = context.attach(trace.set_span_in_context(self.root))
+        return self
+
+    def step(self, name: str):
+        self._end_step()
+        self._step = tracer.start_span(f"step {name}", attributes={"pipeline.step": name})
+        self._step_token = context.attach(trace.set_span_in_context(self._step))
+
+    def _end_step(self, error: Optional[BaseException] = None):
+        if self._step is None:
+            return
+        if error is not None:
+            record_error(self._step, error)
+        context.detach(self._step_token)
+        self._step.end()
+        self._step = self._step_token = None
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._end_step(exc_val)
+        if exc_val is not None:
+            record_error(self.root, exc_val)
+        context.detach(self._root_token)
+        self.root.end()
+
+
+@contextmanager
+def span(name: str, kind: SpanKind = SpanKind.INTERNAL, **attributes):
+    """Current span for a block; exceptions mark it as failed"""
+    with tracer.start_as_current_span(
+        name,
+        kind=kind,
+        attributes=attributes,
+        record_exception=False,
+        set_status_on_exception=False,
+    ) as current:
+        try:
+            yield current
+        except BaseException as e:
+            record_error(current, e)
+            raise
+
+
+def set_llm_usage(current, usage: Optional[dict]):
+    """Token counts of an LLM response as gen_ai span attributes"""
+    if not usage or not current.is_recording():
+        return
+    current.set_attribute("gen_ai.usage.input_tokens", usage.get("input_tokens", 0))
+    current.set_attribute("gen_ai.usage.output_tokens", usage.get("output_tokens", 0))
+    cached = (usage.get("input_token_details") or {}).get("cache_read", 0)
+    if cached:
+        current.set_attribute("gen_ai.usage.cached_tokens", cached)
+
+
+def _millis_hosts():
+    return {httpx.URL(url).host for url in (Config.MILLIS_API_URL, Config.MILLIS_EU_API_URL)}
+
+
+class TracingTransport(httpx.AsyncBaseTransport):
+    """Wrap a transport with one client span per request (queries are dropped)"""
+
+    def __init__(self, transport: httpx.AsyncBaseTransport):
+        self.transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        url = request.url
+        millis = url.host in _millis_hosts()
+        name = f"millis {request.method} {url.path}" if millis else f"HTTP {request.method}"
+        attributes = {
+            "http.request.method": request.method,
+            "server.address": url.host,
+            "url.full": str(url.copy_with(query=None)),
+        }
+        if millis:
+            attributes["millis.endpoint"] = url.path
+        with span(name, SpanKind.CLIENT, **attributes) as current:
+            response = await self.transport.handle_async_request(request)
+            current.set_attribute("http.response.status_code", response.status_code)
+            if response.status_code >= 500:
+                current.set_status(Status(StatusCode.ERROR))
+            return response
+
+    async def aclose(self):
+        await self.transport.aclose()
@@ -0,0 +1,131 @@
+"""HTML to text conversion and cleaning, off the event loop for large pages
+
+Conversions are CPU bound, and one large page converted on the loop stalls
+the progress updates and SSE streams of every other job. Pages up to
+`Config.CONVERT_INLINE_MAX_CHARS` are converted inline (a round trip to
+another process costs more than they do); larger ones go to a pool of
+`Config.CONVERT_PROCESSES` processes. The conversion functions are plain
+module-level functions so the pool can pickle them; workers only import
+this module.
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Optional
+
+import html2text
+from markdownify import markdownify  # cSpell:disable-line
+
+from src.core.config import Config
+from src.monitoring.metrics import observe_convert
+
+logger = logging.getLogger(__name__)
+
+
+# -------------------
+# Conversions
+# -------------------
+def html_to_text(html: str) -> str:
+    """Readable text of a page for the agent; links are kept, images dropped"""
+    converter = html2text.HTML2Text()
+    converter.ignore_links = False
+    converter.ignore_images = True
+    return converter.handle(html).strip()
+
+
+def clean_text_for_kb(text: str) -> str:
+    """Clean crawled markdown text into plain readable text."""
+
+    # 1. Remove image markdown like ![](url)
+    text = re.sub(r"!\[.*?\]\(.*?\)", "", text)
+    # 2. Replace markdown links [text](url) → keep text only
+    text = re.sub(r"\[([^\]]+)\]\([^)]*\)", r"\1", text)
+    # 3. Remove bare URLs (http/https/www)
+    text = re.sub(r"http[s]?://\S+|www\.\S+", "", text)
+    # 4. Remove dangling empty () or []
+    text = re.sub(r"\(\s*\)|\[\s*\]", "", text)
+    # 5. Remove lines with only special chars (*, #, spaces)
+    text = re.sub(r"^[\s*#]+$", "", text, flags=re.MULTILINE)
+    text = re.sub(r"^!\[\].*\n", "", text)
+    # 6. Collapse repeated sections (optional deduplication)
+    lines = text.splitlines()
+    seen = set()
+    deduped = []
+    for line in lines:
+        line_stripped = line.strip()
+        if (line_stripped and line_stripped not in seen) or len(line_stripped) < 2:
+            deduped.append(line)
+            seen.add(line_stripped)
+    text = "\n".join(deduped)
+    # 7. Normalize whitespace
+    text = re.sub(r"\n\s*\n+", "\n\n", text)  # collapse multiple blank lines
+    text = re.sub(r" {2,}", " ", text)  # collapse multiple spaces
+    return text.strip()
+
+
+def html_to_kb_text(html: str) -> str:
+    """Knowledge base text of a raw page"""
+    return clean_text_for_kb(markdownify(html))  # cSpell:disable-line
+
+
+# -------------------
+# Process pool
+# -------------------
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def get_convert_pool() -> Optional[ProcessPoolExecutor]:
+    """The process pool, created on first use; None when it is disabled"""
+    global _pool
+    if Config.CONVERT_PROCESSES <= 0:
+        return None
+    if _pool is None:
+        # spawn: forking would copy the log, tracing and profiler threads' locks
+        _pool = ProcessPoolExecutor(
+            max_workers=Config.CONVERT_PROCESSES,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _pool
+
+
+async def warm_convert_pool():
+    """Start the workers now rather than on the first large page"""
+    pool = get_convert_pool()
+    if pool is None:
+        return
+    loop = asyncio.get_running_loop()
+    await asyncio.gather(
+        *(loop.run_in_executor(pool, html_to_text, "") for _ in range(Config.CONVERT_PROCESSES))
+    )
+
+
+def shutdown_convert_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+async def convert(func: Callable[[str], str], text: str) -> str:
+    """Run a conversion inline or in the pool depending on the input size"""
+    started = time.perf_counter()
+    pool = get_convert_pool() if len(text) > Config.CONVERT_INLINE_MAX_CHARS else None
+    where = "inline"
+    if pool is not None:
+        try:
+            result = await asyncio.get_running_loop().run_in_executor(pool, func, text)
+            where = "pool"
+        except BrokenProcessPool:
+            # a worker died (OOM kill, ...); the next large page gets a new pool
+            logger.warning(f"Conversion pool broke during {func.__name__}, converting inline")
+            shutdown_convert_pool()
+            pool = None
+    if pool is None:
+        result = func(text)
+    observe_convert(func.__name__, where, time.perf_counter() - started)
+    return result
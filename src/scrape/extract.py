@@ -0,0 +1,297 @@
+"""Local main-content extraction, straight from HTML to markdown
+
+The page is parsed once with lxml (libxml2). Scripts, forms, navigation and
+elements whose class or id marks them as site chrome are dropped, then every
+element is weighted by the text it holds outside links; blocks that are
+mostly link text (menus, link lists, "read more" rows) weigh nothing. The
+extraction root is the smallest element still holding most of the page's
+weight, and it is written out as markdown with headings, lists and tables
+kept, and link targets and images dropped like the knowledge base cleaning
+does. No model is involved, so `KB_EXTRACTION` "local" and "auto" save the
+refinement call (see src/scrape/scrape.py).
+"""
+
+import re
+from typing import Dict, List, Optional
+
+import lxml.html
+from lxml import etree
+
+from src.core.config import Config
+from src.scrape.quality import junk_ratio
+
+# never content
+DROP_TAGS = (
+    "script", "style", "noscript", "template", "svg", "canvas", "iframe", "object",
+    "embed", "form", "button", "select", "textarea", "input", "nav", "aside", "dialog",
+)  # fmt: skip
+# site chrome, unless inside an article or main
+CHROME_TAGS = ("header", "footer")
+# class / id words of site chrome
+CHROME_WORDS = {
+    "nav", "navbar", "navigation", "menu", "breadcrumb", "breadcrumbs", "cookie",
+    "cookies", "consent", "popup", "modal", "newsletter", "subscribe", "share",
+    "sharing", "social", "sidebar", "related", "comment", "comments", "masthead",
+    "colophon", "promo", "advert", "ad", "ads", "skip",
+}  # fmt: skip
+CHROME_CLASSES = {"site-header", "site-footer", "global-header", "global-footer"}
+# structural tags are never dropped for their class (WordPress puts
+# "elementor_header_footer" on <body>)
+KEEP_TAGS = ("html", "body", "main", "article")
+
+HEADINGS = {f"h{n}": n for n in range(1, 7)}
+PARAGRAPH_TAGS = {"p", "dt", "dd", "figcaption", "address", "summary", "caption"}
+BLOCK_TAGS = {
+    "div", "section", "article", "main", "header", "footer", "details", "figure",
+    "ul", "ol", "li", "dl", "table", "thead", "tbody", "tfoot", "tr", "td", "th",
+    "pre", "blockquote", "hr", "center",
+} | set(HEADINGS) | PARAGRAPH_TAGS  # fmt: skip
+
+# blocks with more link text than this share are navigation
+LINK_DENSITY_MAX = 0.5
+# the root descends into a child holding at least this share of its weight
+ROOT_SHARE = 0.85
+# "auto" refines extractions with more junk-looking lines than this share
+AUTO_MAX_JUNK_RATIO = 0.2
+
+_SPACE = re.compile(r"[ \t\r\f\v\xa0]+")
+_WORD_SPLIT = re.compile(r"[\s_-]+")
+
+
+def _length(text: Optional[str]) -> int:
+    return len(" ".join(text.split())) if text else 0
+
+
+def _collapse(text: str) -> str:
+    """Collapse whitespace, keeping the line breaks of <br>"""
+    lines = (_SPACE.sub(" ", line).strip() for line in text.replace("\n", " ").split("\x00"))
+    return "\n".join(line for line in lines if line)
+
+
+def _wrap(text: str, mark: str) -> str:
+    """`mark` around the text, with surrounding spaces kept outside the marks"""
+    core = text.strip()
+    if not core:
+        return text
+    lead = text[: len(text) - len(text.lstrip())]
+    trail = text[len(text.rstrip()) :]
+    return f"{lead}{mark}{core}{mark}{trail}"
+
+
+def _is_chrome(el) -> bool:
+    if el.tag in CHROME_TAGS:
+        return not any(a.tag in ("article", "main") for a in el.iterancestors())
+    if el.tag in KEEP_TAGS:
+        return False
+    names = f"{el.get('class', '')} {el.get('id', '')}".lower()
+    if any(name in CHROME_CLASSES for name in names.split()):
+        return True
+    return any(word in CHROME_WORDS for word in _WORD_SPLIT.split(names))
+
+
+def parse(html: str):
+    """DOM of a page without the tags and regions that are never content"""
+    parser = lxml.html.HTMLParser(encoding="utf-8", remove_comments=True, remove_pis=True)
+    try:
+        root = lxml.html.document_fromstring(html.encode("utf-8"), parser=parser)
+    except (etree.ParserError, ValueError):
+        return None
+    etree.strip_elements(root, *DROP_TAGS, with_tail=False)
+    for el in [el for el in root.iter() if isinstance(el.tag, str) and _is_chrome(el)]:
+        if el.getparent() is not None:
+            el.drop_tree()
+    return root
+
+
+class _Renderer:
+    """Weights of a parsed page and its markdown rendering"""
+
+    def __init__(self, root):
+        self.root = root
+        self.chars: Dict = {}
+        self.links: Dict = {}
+        self.weight: Dict = {}
+        # children before parents
+        for el in reversed([el for el in root.iter() if isinstance(el.tag, str)]):
+            children = [c for c in el if isinstance(c.tag, str)]
+            direct = _length(el.text) + sum(_length(c.tail) for c in el)
+            chars = direct + sum(self.chars[c] for c in children)
+            links = chars if el.tag == "a" else sum(self.links[c] for c in children)
+            weight = 0 if el.tag == "a" else direct + sum(self.weight[c] for c in children)
+            if chars and links / chars > LINK_DENSITY_MAX:
+                weight = 0
+            self.chars[el], self.links[el], self.weight[el] = chars, links, weight
+
+    def dense(self, el) -> bool:
+        chars = self.chars.get(el, 0)
+        return bool(chars) and self.links[el] / chars > LINK_DENSITY_MAX
+
+    def main_root(self):
+        """Smallest element holding most of the page's weight"""
+        body = self.root.find("body")
+        node = body if body is not None else self.root
+        while True:
+            children = [c for c in node if self.weight.get(c, 0) > 0]
+            if not children:
+                return node
+            best = max(children, key=self.weight.get)
+            if self.weight[best] < ROOT_SHARE * self.weight[node]:
+                return node
+            node = best
+
+    # -------------------
+    # Inline content
+    # -------------------
+    def inline(self, el) -> str:
+        """Text of the element's content with bold, italics, code and line breaks"""
+        parts = [el.text or ""]
+        for child in el:
+            parts.append(self.inline_child(child))
+            parts.append(child.tail or "")
+        return "".join(parts)
+
+    def inline_child(self, child) -> str:
+        tag = child.tag
+        if not isinstance(tag, str) or tag in ("img", "picture", "video", "audio"):
+            return ""
+        if tag == "br":
+            return "\x00"
+        inner = self.inline(child)
+        if tag in ("strong", "b"):
+            return _wrap(inner, "**")
+        if tag in ("em", "i"):
+            return _wrap(inner, "*")
+        if tag == "code":
+            return _wrap(inner, "`")
+        if tag in BLOCK_TAGS:
+            return f" {inner} "
+        return inner
+
+    # -------------------
+    # Blocks
+    # -------------------
+    def render(self, el, out: List[str]):
+        tag = el.tag
+        if not isinstance(tag, str) or not self.weight.get(el, 0):
+            return
+        if tag in HEADINGS:
+            text = _collapse(self.inline(el)).replace("\n", " ")
+            if text:
+                out.append("#" * HEADINGS[tag] + " " + text)
+        elif tag in PARAGRAPH_TAGS:
+            text = _collapse(self.inline(el))
+            if text:
+                out.append(f"**{text}**" if tag == "dt" else text)
+        elif tag in ("ul", "ol"):
+            lines: List[str] = []
+            self.list_items(el, lines, 0)
+            if lines:
+                out.append("\n".join(lines))
+        elif tag == "table" and not self.is_layout_table(el):
+            table = self.table(el)
+            if table:
+                out.append(table)
+        elif tag == "pre":
+            text = el.text_content().strip("\n")
+            if text.strip():
+                out.append(f"```\n{text}\n```")
+        elif tag == "blockquote":
+            inner: List[str] = []
+            self.container(el, inner)
+            quoted = ["\n".join(f"> {line}" for line in block.splitlines()) for block in inner]
+            if quoted:
+                out.append("\n>\n".join(quoted))
+        elif tag != "hr":
+            self.container(el, out)
+
+    def container(self, el, out: List[str]):
+        """Mixed content: runs of inline content become paragraphs between the blocks"""
+        run, chars, links = [el.text or ""], _length(el.text), 0
+
+        def flush():
+            text = _collapse("".join(run))
+            # a run that is mostly links ("Read more") is navigation
+            if text and not (chars and links / chars > LINK_DENSITY_MAX):
+                out.append(text)
+
+        for child in el:
+            if isinstance(child.tag, str) and child.tag in BLOCK_TAGS:
+                flush()
+                self.render(child, out)
+                run, chars, links = [], 0, 0
+            else:
+                run.append(self.inline_child(child))
+                chars += self.chars.get(child, 0)
+                links += self.links.get(child, 0)
+            run.append(child.tail or "")
+            chars += _length(child.tail)
+        flush()
+
+    def list_items(self, el, lines: List[str], depth: int):
+        number = 0
+        for li in el:
+            if li.tag != "li" or self.dense(li):
+                continue
+            number += 1
+            marker = f"{number}." if el.tag == "ol" else "-"
+            parts, nested = [li.text or ""], []
+            for child in li:
+                if child.tag in ("ul", "ol"):
+                    nested.append(child)
+                else:
+                    parts.append(self.inline_child(child))
+                parts.append(child.tail or "")
+            text = _collapse("".join(parts)).replace("\n", " ")
+            if text:
+                lines.append(f"{'  ' * depth}{marker} {text}")
+            for sub in nested:
+                if not self.dense(sub):
+                    self.list_items(sub, lines, depth + 1)
+
+    def is_layout_table(self, el) -> bool:
+        """Tables holding paragraphs, lists or tables lay out a page rather than data"""
+        return any(
+            d.tag in ("p", "div", "table", "ul", "ol") or d.tag in HEADINGS
+            for d in el.iterdescendants()
+        )
+
+    def table(self, el) -> str:
+        rows = []
+        for tr in el.iter("tr"):
+            cells = [
+                _collapse(self.inline(cell)).replace("\n", " ").replace("|", "\\|")
+                for cell in tr
+                if cell.tag in ("td", "th")
+            ]
+            if any(cells):
+                rows.append(cells)
+        if not rows:
+            return ""
+        width = max(len(row) for row in rows)
+        rows = [row + [""] * (width - len(row)) for row in rows]
+        lines = ["| " + " | ".join(rows[0]) + " |", "|" + " --- |" * width]
+        lines += ["| " + " | ".join(row) + " |" for row in rows[1:]]
+        return "\n".join(lines)
+
+
+def extract_main_content(html: str) -> str:
+    """Main content of a page as markdown; empty when nothing looks like content"""
+    if not html or not html.strip():
+        return ""
+    root = parse(html)
+    if root is None:
+        return ""
+    renderer = _Renderer(root)
+    main = renderer.main_root()
+    blocks: List[str] = []
+    # the page title often sits just outside the content block
+    title = next(root.iter("h1"), None)
+    if title is not None and main.find(".//h1") is None and main.tag != "h1":
+        renderer.render(title, blocks)
+    renderer.render(main, blocks)
+    return "\n\n".join(blocks).strip()
+
+
+def looks_complete(markdown: str) -> bool:
+    """Whether a local extraction can go to the knowledge base without refinement"""
+    return len(markdown) >= Config.KB_EXTRACT_MIN_CHARS and junk_ratio(markdown) <= AUTO_MAX_JUNK_RATIO
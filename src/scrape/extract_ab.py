@@ -0,0 +1,169 @@
+"""Quality comparison of local main-content extraction with the current cleaning path
+
+    python -m src.scrape.extract_ab benchmarks/fixtures
+    python -m src.scrape.extract_ab benchmarks/fixtures --refine-model openai:gpt-4
+
+Every page of the corpus goes through
+  - "cleaned": markdownify + `clean_text_for_kb`, what the llm refines today
+  - "local": `extract_main_content` (src/scrape/extract.py)
+  - "refined:<model>" with --refine-model: the cleaned text refined by the model,
+    i.e. the whole current path
+The corpus is a directory of .html files, or a fixture directory with a
+sites.json. When it has an extraction.json (`{url: {"keep": [...], "drop":
+[...]}}`) the report adds the share of expected content phrases kept and of
+site chrome phrases leaked. Agreement is measured against the refined output
+when there is one, else against "cleaned".
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import time
+from typing import Callable, Dict, List, Optional
+
+from src.scrape.convert import html_to_kb_text
+from src.scrape.extract import extract_main_content
+from src.scrape.model_ab import _percentile, run_model
+from src.scrape.quality import quality_report
+
+GOLD_FILE = "extraction.json"
+
+
+def load_html_corpus(path: str, limit: int = None) -> Dict[str, str]:
+    """Pages keyed by url for a fixture directory, else .html files keyed by relative path"""
+    sites_file = os.path.join(path, "sites.json")
+    if os.path.exists(sites_file):
+        with open(sites_file, "r", encoding="utf-8") as f:
+            files = {
+                url: page for site in json.load(f).values() for url, page in site["pages"].items()
+            }
+    else:
+        files = {}
+        for directory, _, names in os.walk(path):
+            for name in sorted(names):
+                if name.endswith((".html", ".htm")):
+                    file = os.path.relpath(os.path.join(directory, name), path)
+                    files[file] = file
+    corpus = {}
+    for name, file in list(files.items())[:limit]:
+        with open(os.path.join(path, file), "r", encoding="utf-8") as f:
+            corpus[name] = f.read()
+    return corpus
+
+
+def load_gold(path: str) -> Dict[str, dict]:
+    gold_file = os.path.join(path, GOLD_FILE)
+    if not os.path.exists(gold_file):
+        return {}
+    with open(gold_file, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def phrase_share(phrases: List[str], text: str) -> Optional[float]:
+    """Share of the phrases found in the text, case-insensitively"""
+    if not phrases:
+        return None
+    text = " ".join(text.split()).lower()
+    return sum(1 for phrase in phrases if phrase.lower() in text) / len(phrases)
+
+
+def run_local(func: Callable[[str], str], corpus: Dict[str, str]) -> dict:
+    outputs, latencies = {}, {}
+    for name, html in corpus.items():
+        start = time.perf_counter()
+        outputs[name] = func(html)
+        latencies[name] = time.perf_counter() - start
+    return {"outputs": outputs, "latencies": latencies, "errors": {}, "costs": None}
+
+
+def summarize(
+    runs: Dict[str, dict], cleaned: Dict[str, str], reference: str, gold: Dict[str, dict]
+) -> dict:
+    summary = {}
+    for method, run in runs.items():
+        pages = {}
+        for name, output in run["outputs"].items():
+            report = quality_report(
+                cleaned[name],
+                output,
+                runs[reference]["outputs"].get(name) if method != reference else None,
+            )
+            if name in gold:
+                report["kept"] = phrase_share(gold[name].get("keep", []), output)
+                report["leaked"] = phrase_share(gold[name].get("drop", []), output)
+            pages[name] = report
+        latencies = list(run["latencies"].values())
+
+        def mean(metric, pages=pages):
+            values = [p[metric] for p in pages.values() if p.get(metric) is not None]
+            return round(statistics.mean(values), 3) if values else None
+
+        summary[method] = {
+            "pages": len(pages),
+            "errors": len(run["errors"]),
+            "latency_p50_ms": round(_percentile(latencies, 50) * 1000, 2),
+            "latency_p95_ms": round(_percentile(latencies, 95) * 1000, 2),
+            "total_cost": run["costs"]["total_cost"] if run["costs"] else 0.0,
+            "retention": mean("retention"),
+            "junk_ratio": mean("junk_ratio"),
+            "compression": mean("compression"),
+            "kept": mean("kept"),
+            "leaked": mean("leaked"),
+            "agreement_with_reference": mean("agreement"),
+            "per_page": pages,
+        }
+    return summary
+
+
+async def main_async(args):
+    corpus = load_html_corpus(args.corpus, args.limit)
+    if not corpus:
+        raise SystemExit(f"No .html pages found in {args.corpus}")
+    gold = load_gold(args.corpus)
+
+    runs = {
+        "cleaned": run_local(html_to_kb_text, corpus),
+        "local": run_local(extract_main_content, corpus),
+    }
+    reference = "cleaned"
+    if args.refine_model:
+        print(f"--> {args.refine_model}: refining {len(corpus)} pages")
+        reference = f"refined:{args.refine_model}"
+        runs[reference] = await run_model(
+            args.refine_model, runs["cleaned"]["outputs"], args.concurrency
+        )
+
+    summary = summarize(runs, runs["cleaned"]["outputs"], reference, gold)
+    print(
+        f"\n{'method':40} {'p50 ms':>9} {'p95 ms':>9} {'cost $':>9} {'retain':>7} "
+        f"{'junk':>6} {'kept':>6} {'leaked':>6} {'agree':>6}"
+    )
+    for method, row in summary.items():
+        print(
+            f"{method:40} {row['latency_p50_ms']:>9} {row['latency_p95_ms']:>9} "
+            f"{row['total_cost']:>9} {row['retention']!s:>7} {row['junk_ratio']!s:>6} "
+            f"{row['kept']!s:>6} {row['leaked']!s:>6} {row['agreement_with_reference']!s:>6}"
+        )
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+        print(f"\nreport saved {args.out}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare local main-content extraction with the current cleaning path"
+    )
+    parser.add_argument("corpus", help="directory of .html pages or a benchmark fixtures directory")
+    parser.add_argument("--refine-model", default=None, help="also refine with this model")
+    parser.add_argument("--limit", type=int, default=None)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--out", default="extract_ab_report.json")
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,253 @@
+"""Robots- and sitemap-aware crawl frontier for building knowledge bases"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from urllib.parse import urlparse
+from urllib.robotparser import RobotFileParser
+
+from src.scrape.links import (
+    USER_AGENT,
+    Link,
+    canonical_url,
+    extract_links,
+    fetch_sitemap_urls,
+    fetch_text,
+    score_link,
+    site_of,
+)
+from src.scrape.scrape import save_file, scrape
+from src.track_cost.ledger import BudgetExceededError
+
+logger = logging.getLogger(__name__)
+
+
+class RobotsRules:
+    """robots.txt rules of one site; everything is allowed when it is missing"""
+
+    def __init__(self, robots_txt: Optional[str] = None, user_agent: str = USER_AGENT):
+        self.text = robots_txt or ""
+        self.user_agent = user_agent
+        self._parser = RobotFileParser()
+        self._parser.parse(self.text.splitlines())
+
+    @classmethod
+    async def fetch(cls, url: str) -> "RobotsRules":
+        origin = "{0.scheme}://{0.netloc}".format(urlparse(url))
+        return cls(await fetch_text(f"{origin}/robots.txt"))
+
+    def allowed(self, url: str) -> bool:
+        return self._parser.can_fetch(self.user_agent, url)
+
+    def crawl_delay(self) -> float:
+        delay = self._parser.crawl_delay(self.user_agent)
+        return float(delay) if delay else 0.0
+
+
+@dataclass(order=True)
+class _Entry:
+    priority: float
+    seq: int
+    url: str = field(compare=False)
+    depth: int = field(compare=False)
+
+
+class CrawlFrontier:
+    """
+    Priority queue of same-site urls still to crawl
+
+    Urls are canonicalized before de-duplication, filtered through robots.txt
+    and ranked with the link heuristics of `src.scrape.links`; deeper pages
+    lose priority. Pages scoring 0 (careers, legal, login, ...) are never
+    queued.
+    """
+
+    def __init__(
+        self,
+        root_url: str,
+        robots: Optional[RobotsRules] = None,
+        max_pages: int = 50,
+        max_depth: int = 3,
+        depth_penalty: float = 2.0,
+    ):
+        self.root = canonical_url(root_url)
+        self.site = site_of(self.root)
+        self.robots = robots or RobotsRules()
+        self.max_pages = max_pages
+        self.max_depth = max_depth
+        self.depth_penalty = depth_penalty
+        self._heap: List[_Entry] = []
+        self._seen: Set[str] = set()
+        self._seq = itertools.count()
+        self.handed_out = 0
+        self.skipped: Dict[str, int] = {"robots": 0, "low_score": 0, "depth": 0}
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def add(self, link: Link, depth: int, boost: float = 0.0) -> bool:
+        """Queue a link unless it was seen, is off-site, too deep or disallowed"""
+        url = canonical_url(link.url)
+        if url is None or url in self._seen or site_of(url) != self.site:
+            return False
+        self._seen.add(url)
+        if depth > self.max_depth:
+            self.skipped["depth"] += 1
+            return False
+        if not self.robots.allowed(url):
+            self.skipped["robots"] += 1
+            return False
+        link.url = url
+        score = score_link(link, self.root)
+        if score <= 0 and not boost:
+            self.skipped["low_score"] += 1
+            return False
+        priority = -(score + boost - self.depth_penalty * depth)
+        heapq.heappush(self._heap, _Entry(priority, next(self._seq), url, depth))
+        return True
+
+    def add_many(self, links: Iterable[Link], depth: int, boost: float = 0.0) -> int:
+        return sum(self.add(link, depth, boost) for link in links)
+
+    def pop(self) -> Optional[Tuple[str, int]]:
+        """Next (url, depth), or None when empty or the page limit is reached"""
+        if not self._heap or self.handed_out >= self.max_pages:
+            return None
+        entry = heapq.heappop(self._heap)
+        self.handed_out += 1
+        return entry.url, entry.depth
+
+    @property
+    def exhausted(self) -> bool:
+        return not self._heap or self.handed_out >= self.max_pages
+
+
+class _Throttle:
+    """Keep at least `delay` seconds between request starts to one host"""
+
+    def __init__(self, delay: float):
+        self.delay = delay
+        self._lock = asyncio.Lock()
+        self._next = 0.0
+
+    async def wait(self):
+        if self.delay <= 0:
+            return
+        async with self._lock:
+            now = time.monotonic()
+            if self._next > now:
+                await asyncio.sleep(self._next - now)
+            self._next = max(now, self._next) + self.delay
+
+
+@dataclass
+class CrawlResult:
+    pages: List[Tuple[str, str]]  # (url, cleaned text) in crawl order
+    failed: List[str]
+    skipped: Dict[str, int]
+    seconds: float
+
+
+async def crawl_site(
+    root_url: str,
+    seeds: Iterable[str] = (),
+    max_pages: int = 50,
+    max_depth: int = 3,
+    time_budget: float = 600.0,
+    concurrency: int = 4,
+    refine_with_llm: bool = True,
+    output_dir: Optional[str] = None,
+) -> CrawlResult:
+    """
+    Crawl a site within page, depth and time limits
+
+    The frontier is seeded with `root_url`, the given `seeds` (e.g. links the
+    agent saved, queued first) and the sitemaps listed in robots.txt. Every
+    fetched page adds its own links one level deeper. robots.txt rules and
+    its Crawl-delay are respected.
+    """
+    start = time.monotonic()
+    deadline = start + time_budget
+    robots = await RobotsRules.fetch(root_url)
+    frontier = CrawlFrontier(root_url, robots, max_pages=max_pages, max_depth=max_depth)
+    throttle = _Throttle(robots.crawl_delay())
+
+    frontier.add(Link(url=root_url), depth=0, boost=100)
+    frontier.add_many((Link(url=url) for url in seeds), depth=1, boost=20)
+    sitemap_urls = await fetch_sitemap_urls(root_url, robots_txt=robots.text)
+    frontier.add_many((Link(url=url, in_sitemap=True) for url in sitemap_urls), depth=1)
+
+    results: Dict[str, str] = {}
+    order: List[str] = []
+    failed: List[str] = []
+    in_flight = 0
+    changed = asyncio.Condition()
+
+    async def worker():
+        nonlocal in_flight
+        while time.monotonic() < deadline and frontier.handed_out < frontier.max_pages:
+            # wait for the crawl delay before picking, so the pick sees every link found so far
+            await throttle.wait()
+            async with changed:
+                # wait for links from pages still being fetched
+                while frontier.exhausted and in_flight:
+                    await changed.wait()
+                item = frontier.pop()
+                if item is None:
+                    changed.notify_all()
+                    return
+                in_flight += 1
+            url, depth = item
+            try:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return
+                text, html = await asyncio.wait_for(scrape(url, refine_with_llm), remaining)
+                if text:
+                    results[url] = text
+                    order.append(url)
+                    if output_dir:
+                        save_file(text, url, output_dir)
+                else:
+                    failed.append(url)
+                if html and depth < max_depth:
+                    frontier.add_many(extract_links(url, html), depth=depth + 1)
+            except asyncio.TimeoutError:
+                failed.append(url)
+                return
+            # the task's llm budget is spent: fail the crawl, as scrape_urls does
+            except BudgetExceededError:
+                raise
+            except Exception as e:  # pylint: disable=broad-exception-caught
+                logger.warning(f"Crawl of {url} failed: {e}")
+                failed.append(url)
+            finally:
+                async with changed:
+                    in_flight -= 1
+                    changed.notify_all()
+
+    workers = [asyncio.create_task(worker()) for _ in range(max(1, concurrency))]
+    try:
+        await asyncio.gather(*workers)
+    except BaseException:
+        # one worker failed the crawl: the others stop instead of fetching on
+        for task in workers:
+            task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+        raise
+
+    result = CrawlResult(
+        pages=[(url, results[url]) for url in order],
+        failed=failed,
+        skipped=dict(frontier.skipped),
+        seconds=round(time.monotonic() - start, 2),
+    )
+    logger.info(
+        f"Crawled {len(result.pages)} pages of {root_url} in {result.seconds}s "
+        f"({len(failed)} failed, {len(frontier)} left, skipped {result.skipped})"
+    )
+    return result
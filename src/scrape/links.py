@@ -0,0 +1,278 @@
+"""Deterministic link extraction and ranking from fetched HTML and sitemaps"""
+
+import logging
+import re
+import time
+import xml.etree.ElementTree as ET
+from dataclasses import dataclass
+from html.parser import HTMLParser
+from typing import Dict, Iterable, List, Optional, Set
+from urllib.parse import parse_qsl, urlencode, urljoin, urlparse, urlunparse
+
+import httpx
+
+from src.monitoring.metrics import observe_scrape
+from src.utils.http_client import get_http_client
+
+logger = logging.getLogger(__name__)
+
+USER_AGENT = "Mozilla/5.0 (compatible; MillisAgentBuilder/1.0)"
+
+# (pattern matched on path and anchor text, weight)
+CATEGORIES: Dict[str, tuple] = {
+    "about": (r"about|company|who-we-are|our-story|mission|overview|history", 10),
+    "services": (r"services?|solutions?|products?|offerings?|what-we-do|platform|features", 9),
+    "pricing": (r"pricing|plans|packages|rates", 8),
+    "contact": (r"contact|locations?|offices?|get-in-touch|find-us", 8),
+    "faq": (r"faqs?|help|questions|support", 7),
+    "team": (r"team|leadership|management|founders|our-people|board", 6),
+    "industries": (r"industr(y|ies)|sectors|markets|customers|clients|case-stud", 6),
+    "integrations": (r"integrations?|partners?|technology", 5),
+}
+_CATEGORY_RE = {
+    name: re.compile(rf"(^|[/_\-\s.]){pattern}($|[/_\-\s.])", re.I)
+    for name, (pattern, _) in CATEGORIES.items()
+}
+_EXCLUDE = re.compile(
+    r"careers?|jobs|privacy|terms|cookie|legal|gdpr|log-?in|sign-?(in|up)|register|"
+    r"cart|checkout|account|wp-admin|wp-json|/feed|rss|/tag/|/author/|/page/\d+|"
+    r"\.(pdf|jpe?g|png|gif|svg|webp|zip|xml|css|js|mp4)$",
+    re.I,
+)
+_DATED = re.compile(r"/(19|20)\d{2}/\d{1,2}/|/(blog|news|press|events?)/.+", re.I)
+_TRACKING_PARAMS = re.compile(r"^(utm_\w+|gclid|fbclid|msclkid|mc_\w+|ref|source)$", re.I)
+
+
+@dataclass
+class Link:
+    url: str
+    text: str = ""
+    in_nav: bool = False  # found in header, nav or footer
+    in_sitemap: bool = False
+    category: Optional[str] = None
+    score: float = 0.0
+
+
+def canonical_url(url: str, base: Optional[str] = None) -> Optional[str]:
+    """Normalize a url so equivalent spellings de-duplicate
+
+    Resolves it against `base`, lowercases scheme and host, drops fragments,
+    default ports, tracking parameters, `index.html` and trailing slashes.
+    Returns None for non-http(s) links.
+    """
+    url = urljoin(base, url.strip()) if base else url.strip()
+    parts = urlparse(url)
+    if parts.scheme not in ("http", "https") or not parts.hostname:
+        return None
+    host = parts.hostname.lower()
+    if parts.port and parts.port not in (80, 443):
+        host = f"{host}:{parts.port}"
+    path = re.sub(r"/(index|default)\.(html?|php|aspx?)$", "/", parts.path or "/")
+    path = re.sub(r"/{2,}", "/", path)
+    if len(path) > 1:
+        path = path.rstrip("/")
+    query = urlencode(
+        sorted((k, v) for k, v in parse_qsl(parts.query) if not _TRACKING_PARAMS.match(k))
+    )
+    return urlunparse((parts.scheme.lower(), host, path, "", query, ""))
+
+
+def site_of(url: str) -> str:
+    host = urlparse(url).hostname or ""
+    return host.lower().removeprefix("www.")
+
+
+class _LinkParser(HTMLParser):
+    """Collect anchors, noting whether they sit in header/nav/footer"""
+
+    _NAV_TAGS = {"header", "nav", "footer"}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.links: List[Link] = []
+        self.canonical: Optional[str] = None
+        self._nav_depth = 0
+        self._current: Optional[Link] = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self._NAV_TAGS:
+            self._nav_depth += 1
+        attrs = dict(attrs)
+        if tag == "a" and attrs.get("href"):
+            self._current = Link(url=attrs["href"], in_nav=self._nav_depth > 0)
+            self._current.text = attrs.get("title") or attrs.get("aria-label") or ""
+            self.links.append(self._current)
+        elif tag == "link" and (attrs.get("rel") or "").lower() == "canonical":
+            self.canonical = attrs.get("href")
+
+    def handle_endtag(self, tag):
+        if tag in self._NAV_TAGS and self._nav_depth:
+            self._nav_depth -= 1
+        elif tag == "a":
+            self._current = None
+
+    def handle_data(self, data):
+        if self._current is not None and len(self._current.text) < 80:
+            self._current.text = (self._current.text + " " + data.strip()).strip()
+
+
+def extract_links(base_url: str, html: str) -> List[Link]:
+    """Same-site links of a page, canonicalized and de-duplicated"""
+    parser = _LinkParser()
+    try:
+        parser.feed(html or "")
+    except Exception as e:  # pylint: disable=broad-exception-caught
+        logger.warning(f"Could not parse links of {base_url}: {e}")
+    base = canonical_url(parser.canonical, base_url) if parser.canonical else base_url
+    site = site_of(base_url)
+
+    links: Dict[str, Link] = {}
+    for link in parser.links:
+        url = canonical_url(link.url, base)
+        if url is None or site_of(url) != site:
+            continue
+        if url in links:
+            existing = links[url]
+            existing.in_nav = existing.in_nav or link.in_nav
+            existing.text = existing.text or link.text
+            continue
+        link.url = url
+        links[url] = link
+    return list(links.values())
+
+
+def score_link(link: Link, root: str) -> float:
+    """Heuristic usefulness of a page for a company knowledge base"""
+    path = urlparse(link.url).path
+    if link.url == root:
+        link.category = "home"
+        return 100.0
+    if _EXCLUDE.search(path) or _EXCLUDE.search(link.text or ""):
+        return 0.0
+
+    score = 0.0
+    for name, pattern in _CATEGORY_RE.items():
+        weight = CATEGORIES[name][1]
+        hit = weight if pattern.search(path) else 0.6 * weight if pattern.search(link.text) else 0
+        if hit > score:
+            score, link.category = hit, name
+    if link.in_nav:
+        score += 2
+    if link.in_sitemap:
+        score += 0.5
+    depth = len([p for p in path.split("/") if p])
+    score -= 0.75 * max(0, depth - 1)
+    if _DATED.search(path):
+        score -= 4
+    return max(score, 0.0)
+
+
+def rank_links(
+    root_url: str, links: Iterable[Link], limit: int = 25, per_category: Optional[int] = None
+) -> List[Link]:
+    """Best links first, with at most `per_category` pages of one kind"""
+    root = canonical_url(root_url)
+    per_category = per_category or max(3, limit // 3)
+    scored = []
+    for link in links:
+        link.score = score_link(link, root)
+        if link.score > 0:
+            scored.append(link)
+    scored.sort(key=lambda item: (-item.score, len(item.url)))
+
+    ranked, counts = [], {}
+    for link in scored:
+        key = link.category or "other"
+        if counts.get(key, 0) >= per_category:
+            continue
+        counts[key] = counts.get(key, 0) + 1
+        ranked.append(link)
+        if len(ranked) >= limit:
+            break
+    return ranked
+
+
+# -------------------
+# robots.txt and sitemaps
+# -------------------
+async def fetch_text(url: str, timeout: float = 10.0) -> Optional[str]:
+    started = time.perf_counter()
+    try:
+        response = await get_http_client().get(
+            url, timeout=timeout, follow_redirects=True, headers={"User-Agent": USER_AGENT}
+        )
+    except httpx.HTTPError as e:
+        observe_scrape("http", started, ok=False)
+        logger.debug(f"GET {url} failed: {e}")
+        return None
+    observe_scrape("http", started, ok=response.status_code == 200)
+    if response.status_code != 200:
+        return None
+    return response.text
+
+
+def _parse_sitemap(xml_text: str):
+    """(page urls, nested sitemap urls) of a sitemap or sitemap index"""
+    try:
+        root = ET.fromstring(xml_text.encode("utf-8"))
+    except ET.ParseError:
+        return [], []
+    locs = [el.text.strip() for el in root.iter() if el.tag.endswith("loc") and el.text]
+    if root.tag.endswith("sitemapindex"):
+        return [], locs
+    return locs, []
+
+
+def sitemaps_from_robots(robots_txt: str) -> List[str]:
+    return [
+        line.split(":", 1)[1].strip()
+        for line in (robots_txt or "").splitlines()
+        if line.lower().startswith("sitemap:")
+    ]
+
+
+async def fetch_sitemap_urls(
+    base_url: str,
+    max_urls: int = 500,
+    max_sitemaps: int = 10,
+    robots_txt: Optional[str] = None,
+) -> List[str]:
+    """Page urls from the site's sitemaps (robots.txt entries or /sitemap.xml)"""
+    origin = "{0.scheme}://{0.netloc}".format(urlparse(base_url))
+    if robots_txt is None:
+        robots_txt = await fetch_text(f"{origin}/robots.txt") or ""
+    queue = sitemaps_from_robots(robots_txt) or [f"{origin}/sitemap.xml"]
+
+    urls: List[str] = []
+    seen: Set[str] = set()
+    while queue and len(seen) < max_sitemaps and len(urls) < max_urls:
+        sitemap = queue.pop(0)
+        if sitemap in seen:
+            continue
+        seen.add(sitemap)
+        text = await fetch_text(sitemap)
+        if not text:
+            continue
+        pages, nested = _parse_sitemap(text)
+        urls.extend(pages[: max_urls - len(urls)])
+        queue.extend(nested)
+    return urls
+
+
+async def candidate_links(
+    url: str, html: str, limit: int = 25, use_sitemap: bool = True
+) -> List[Link]:
+    """Ranked candidate pages for the knowledge base from a page and the sitemap"""
+    links = {link.url: link for link in extract_links(url, html)}
+    if use_sitemap:
+        site = site_of(url)
+        for sitemap_url in await fetch_sitemap_urls(url):
+            canonical = canonical_url(sitemap_url)
+            if canonical is None or site_of(canonical) != site:
+                continue
+            links.setdefault(canonical, Link(url=canonical)).in_sitemap = True
+    root = canonical_url(url)
+    links.setdefault(root, Link(url=root))
+    ranked = rank_links(url, links.values(), limit=limit)
+    logger.info(f"{len(ranked)} candidate links for {url} out of {len(links)} found")
+    return ranked
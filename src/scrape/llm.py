@@ -1,43 +1,62 @@
 """create markdown and knowledge base description using llm"""
 
-import os
-from langchain.chat_models import init_chat_model
-from langchain.prompts import PromptTemplate
-
-from src.track_cost.cost_tracking_llm import CostTrackingLLM
-from src.core.config import Config
-from src.core.prompts import KNOWLEDGE_BASE_DESCRIPTION_PROMPT, MARKDOWN_PROMPT
+import logging
+from langchain_core.prompts import ChatPromptTemplate
+
+from src.core.model_router import get_model_router
+from src.core.prompts import (
+    KNOWLEDGE_BASE_DESCRIPTION_INPUT,
+    KNOWLEDGE_BASE_DESCRIPTION_PROMPT,
+    MARKDOWN_INPUT,
+    MARKDOWN_PROMPT,
+    PROMPT_CACHE_KEYS,
+)
+from src.storage.artifacts import task_artifacts
 
+logger = logging.getLogger(__name__)
 
-llm = init_chat_model(
-    "openai:gpt-4",
-    api_key=Config.OPENAI_API_KEY,
+# compiled once; the system message is the cacheable prefix
+markdown_prompt_template = ChatPromptTemplate.from_messages(
+    [("system", MARKDOWN_PROMPT), ("human", MARKDOWN_INPUT)]
+)
+kb_description_prompt_template = ChatPromptTemplate.from_messages(
+    [
+        ("system", KNOWLEDGE_BASE_DESCRIPTION_PROMPT),
+        ("human", KNOWLEDGE_BASE_DESCRIPTION_INPUT),
+    ]
 )
 
 
-cost_tracking_llm = CostTrackingLLM(llm, Config.OPENAI_MODEL_NAME)
+def markdown_chain(input_chars=0):
+    """refinement chain on the model routed for the page size"""
+    llm = get_model_router().llm_for("kb_refinement", input_chars)
+    return markdown_prompt_template | llm.bind(
+        prompt_cache_key=PROMPT_CACHE_KEYS["kb_refinement"]
+    )
 
-markdown_prompt_template = PromptTemplate.from_template(MARKDOWN_PROMPT)
-kb_description_prompt_template = PromptTemplate.from_template(
-    KNOWLEDGE_BASE_DESCRIPTION_PROMPT
-)
 
-markdown_chain = markdown_prompt_template | cost_tracking_llm
-kd_description_chain = kb_description_prompt_template | cost_tracking_llm
+def kb_description_chain():
+    llm = get_model_router().llm_for("kb_description")
+    return kb_description_prompt_template | llm.bind(
+        prompt_cache_key=PROMPT_CACHE_KEYS["kb_description"]
+    )
 
 
 def refine_with_llm(markdown):
     """refine the scraped content using llm"""
-    refined_markdown = markdown_chain.invoke(markdown)
+    refined_markdown = markdown_chain(len(markdown)).invoke(markdown)
+    return refined_markdown.content
+
+
+async def arefine_with_llm(markdown):
+    """refine the scraped content using llm without blocking the event loop"""
+    refined_markdown = await markdown_chain(len(markdown)).ainvoke(markdown)
     return refined_markdown.content
 
 
-def get_kb_description(links, output_dir):
+async def get_kb_description(links):
     """create knowledge base description based on the important URLS"""
-    kb_description = kd_description_chain.invoke(links)
-    path = os.path.join(output_dir, "kb_description.txt")
-    with open(path, "w", encoding="utf-8") as f:
-        f.write(kb_description.content)
-    print(f"kb description saved {path}")
+    kb_description = await kb_description_chain().ainvoke(links)
+    await task_artifacts().put_text("kb_description.txt", kb_description.content)
 
     return kb_description.content
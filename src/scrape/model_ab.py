@@ -0,0 +1,149 @@
+"""A/B comparison of refinement models on a saved corpus of scraped pages
+
+    python -m src.scrape.model_ab markdown_content/acme \
+        --models openai:gpt-4 openai:gpt-4o-mini google_genai:gemini-2.5-flash
+
+The first model is the reference that the others' outputs are compared to.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import time
+from typing import Dict, List
+
+from src.core.llm_clients import tracked_model
+from src.scrape.convert import clean_text_for_kb
+from src.scrape.llm import markdown_prompt_template
+from src.scrape.page_store import MANIFEST, PageStore
+from src.scrape.quality import quality_report
+from src.track_cost.ledger import cost_ledger, cost_scope, cost_step
+
+
+def load_corpus(path: str, limit: int = None) -> Dict[str, str]:
+    """Saved pages keyed by url for a page store, else .md / .txt keyed by file name"""
+    if os.path.exists(os.path.join(path, MANIFEST)):
+        files = {url: record.file for url, record in PageStore(path).records().items()}
+    else:
+        files = {
+            name: name
+            for name in sorted(os.listdir(path))
+            if name.endswith((".md", ".txt"))
+        }
+    corpus = {}
+    for name, file in list(files.items())[:limit]:
+        with open(os.path.join(path, file), "r", encoding="utf-8") as f:
+            text = clean_text_for_kb(f.read())
+        if text:
+            corpus[name] = text
+    return corpus
+
+
+async def run_model(model: str, corpus: Dict[str, str], concurrency: int) -> dict:
+    """Refine every page with one model; outputs, latencies and cost"""
+    chain = markdown_prompt_template | tracked_model(model, degrade=False)
+    semaphore = asyncio.Semaphore(concurrency)
+    outputs, latencies, errors = {}, {}, {}
+
+    async def refine(name, text):
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                response = await chain.ainvoke(text)
+                outputs[name] = response.content
+            except Exception as e:  # pylint: disable=broad-exception-caught
+                errors[name] = str(e)
+            latencies[name] = time.perf_counter() - start
+
+    with cost_scope(f"model_ab:{model}"), cost_step("kb_refinement"):
+        await asyncio.gather(*(refine(n, t) for n, t in corpus.items()))
+        costs = cost_ledger.reset()
+
+    return {"outputs": outputs, "latencies": latencies, "errors": errors, "costs": costs}
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+
+def summarize(models: List[str], corpus: Dict[str, str], runs: Dict[str, dict]) -> dict:
+    reference = runs[models[0]]["outputs"]
+    summary = {}
+    for model in models:
+        run = runs[model]
+        pages = {
+            name: quality_report(
+                corpus[name],
+                output,
+                reference.get(name) if model != models[0] else None,
+            )
+            for name, output in run["outputs"].items()
+        }
+        latencies = list(run["latencies"].values())
+
+        def mean(metric, pages=pages):
+            values = [p[metric] for p in pages.values() if metric in p]
+            return round(statistics.mean(values), 3) if values else None
+
+        summary[model] = {
+            "pages": len(pages),
+            "errors": len(run["errors"]),
+            "latency_p50_s": round(_percentile(latencies, 50), 2),
+            "latency_p95_s": round(_percentile(latencies, 95), 2),
+            "total_cost": run["costs"]["total_cost"],
+            "input_tokens": run["costs"]["input_tokens"],
+            "output_tokens": run["costs"]["output_tokens"],
+            "retention": mean("retention"),
+            "junk_ratio": mean("junk_ratio"),
+            "compression": mean("compression"),
+            "agreement_with_reference": mean("agreement"),
+            "per_page": pages,
+        }
+    return summary
+
+
+async def main_async(args):
+    corpus = load_corpus(args.corpus, args.limit)
+    if not corpus:
+        raise SystemExit(f"No .md/.txt pages found in {args.corpus}")
+
+    runs = {}
+    for model in args.models:
+        print(f"--> {model}: refining {len(corpus)} pages")
+        runs[model] = await run_model(model, corpus, args.concurrency)
+
+    summary = summarize(args.models, corpus, runs)
+    print(
+        f"\n{'model':40} {'p50 s':>7} {'p95 s':>7} {'cost $':>9} "
+        f"{'retain':>7} {'junk':>6} {'agree':>6}"
+    )
+    for model, row in summary.items():
+        print(
+            f"{model:40} {row['latency_p50_s']:>7} {row['latency_p95_s']:>7} "
+            f"{row['total_cost']:>9} {row['retention']!s:>7} {row['junk_ratio']!s:>6} "
+            f"{row['agreement_with_reference']!s:>6}"
+        )
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+        print(f"\nreport saved {args.out}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="A/B refinement models on scraped pages")
+    parser.add_argument("corpus", help="directory of saved .md/.txt pages")
+    parser.add_argument("--models", nargs="+", required=True)
+    parser.add_argument("--limit", type=int, default=None)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--out", default="model_ab_report.json")
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
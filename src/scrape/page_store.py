@@ -0,0 +1,108 @@
+"""Content-addressed store of scraped pages
+
+Every page is written once as `<sha256>.md` in the store directory and an
+`index.jsonl` manifest records which url it came from. Content files are
+written to a temporary name and renamed into place, and each manifest entry
+is a single `O_APPEND` write, so saves from concurrent tasks, threads or
+processes never clash and cost the same however many pages the directory
+holds. Identical pages are stored once.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+MANIFEST = "index.jsonl"
+
+
+@dataclass
+class PageRecord:
+    """Manifest entry of one saved page"""
+
+    url: str
+    sha256: str
+    file: str
+    bytes: int
+    saved_at: str
+
+
+class PageStore:
+    """Hash-named page files plus a url manifest in one directory"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.manifest = os.path.join(directory, MANIFEST)
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, record: PageRecord) -> str:
+        return os.path.join(self.directory, record.file)
+
+    def put(self, url: str, text: str) -> PageRecord:
+        """Store a page (once per content) and record it for the url"""
+        data = text.encode("utf-8")
+        digest = hashlib.sha256(data).hexdigest()
+        record = PageRecord(
+            url=url,
+            sha256=digest,
+            file=f"{digest}.md",
+            bytes=len(data),
+            saved_at=datetime.now(timezone.utc).isoformat(),
+        )
+        path = self.path(record)
+        if not os.path.exists(path):
+            self._write_atomic(path, data)
+        self._append(record)
+        logger.debug(f"Saved {url} as {record.file} ({record.bytes} bytes)")
+        return record
+
+    def _write_atomic(self, path: str, data: bytes):
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except BaseException:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+            raise
+
+    def _append(self, record: PageRecord):
+        line = (json.dumps(asdict(record), ensure_ascii=False) + "\n").encode("utf-8")
+        fd = os.open(self.manifest, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, line)
+        finally:
+            os.close(fd)
+
+    def records(self) -> Dict[str, PageRecord]:
+        """Latest record of every url, in the order the urls were first saved"""
+        records: Dict[str, PageRecord] = {}
+        if not os.path.exists(self.manifest):
+            return records
+        with open(self.manifest, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = PageRecord(**json.loads(line))
+                except (TypeError, ValueError):
+                    # a torn last line from a crashed writer
+                    logger.warning(f"Skipping malformed entry in {self.manifest}")
+                    continue
+                records[record.url] = record
+        return records
+
+    def get(self, url: str) -> Optional[str]:
+        """Text last saved for the url"""
+        record = self.records().get(url)
+        if record is None:
+            return None
+        with open(self.path(record), "r", encoding="utf-8") as f:
+            return f.read()
@@ -0,0 +1,59 @@
+"""Cheap quality proxies for cleaned / refined page content"""
+
+import re
+from typing import Set
+
+_KEY_TERM = re.compile(
+    r"[\w.+-]+@[\w-]+\.[\w.]+"  # emails
+    r"|\+?\d[\d\s().-]{6,}\d"  # phone numbers
+    r"|\b\d[\d,.%$]*\b"  # figures
+    r"|\b[A-Z][a-zA-Z]{3,}\b"  # proper nouns and headings
+)
+_WORD = re.compile(r"[a-z0-9]+")
+_JUNK_LINE = re.compile(
+    r"\]\(|https?://|cookie|privacy policy|all rights reserved|sign in|log in|"
+    r"subscribe|skip to content|terms of (use|service)",
+    re.I,
+)
+
+
+def key_terms(text: str) -> Set[str]:
+    """Facts worth keeping: emails, phones, figures and capitalised terms"""
+    return {m.group(0).strip() for m in _KEY_TERM.finditer(text or "")}
+
+
+def retention(source: str, output: str) -> float:
+    """Share of the source's key terms that survive in the output"""
+    terms = key_terms(source)
+    if not terms:
+        return 1.0
+    return sum(1 for term in terms if term in output) / len(terms)
+
+
+def junk_ratio(text: str) -> float:
+    """Share of non-empty lines that look like navigation or boilerplate"""
+    lines = [line for line in (text or "").splitlines() if line.strip()]
+    if not lines:
+        return 0.0
+    return sum(1 for line in lines if _JUNK_LINE.search(line)) / len(lines)
+
+
+def jaccard(a: str, b: str) -> float:
+    """Word-set overlap between two outputs"""
+    words_a, words_b = set(_WORD.findall(a.lower())), set(_WORD.findall(b.lower()))
+    if not words_a and not words_b:
+        return 1.0
+    return len(words_a & words_b) / len(words_a | words_b)
+
+
+def quality_report(source: str, output: str, reference: str = None) -> dict:
+    report = {
+        "chars": len(output or ""),
+        "compression": round(len(output or "") / max(1, len(source or "")), 3),
+        "retention": round(retention(source, output or ""), 3),
+        "junk_ratio": round(junk_ratio(output), 3),
+        "headings": len(re.findall(r"^#{1,6}\s", output or "", flags=re.M)),
+    }
+    if reference is not None:
+        report["agreement"] = round(jaccard(output or "", reference), 3)
+    return report
@@ -1,72 +1,67 @@
 """scrape the website content using playwright and craw4ai"""
 
+import asyncio
+import logging
 import re
-import os
-from markdownify import markdownify  # cSpell:disable-line
-from crawl4ai import AsyncWebCrawler
+import time
 from playwright.async_api import async_playwright, Error
-from langchain_community.document_transformers import Html2TextTransformer
-from langchain.schema import Document
+
+from src.core.config import Config
+from src.monitoring.metrics import observe_kb_extraction, observe_scrape
+from src.scrape.convert import (
+    clean_text_for_kb,
+    convert,
+    html_to_kb_text,
+    html_to_text,
+)
+from src.scrape.extract import extract_main_content, looks_complete
+from src.monitoring.tracing import span
+from src.scrape.page_store import PageStore
+from src.scrape.llm import arefine_with_llm
+from src.track_cost.ledger import BudgetExceededError
+
+logger = logging.getLogger(__name__)
+
+# crawl4ai.AsyncWebCrawler, imported on the first crawl (crawl4ai is slow to import)
+AsyncWebCrawler = None
+
+
+def load_crawler():
+    """crawl4ai's AsyncWebCrawler, imported on first use"""
+    global AsyncWebCrawler
+    if AsyncWebCrawler is None:
+        from crawl4ai import AsyncWebCrawler as crawler  # pylint: disable=import-outside-toplevel
+
+        AsyncWebCrawler = crawler
+    return AsyncWebCrawler
 
 
 async def clean_text_for_prompt(content):
     """remove the html tags from the content"""
-    html2text = Html2TextTransformer(ignore_links=False)
-    doc = Document(page_content=content)
-    clean_doc = await html2text.atransform_documents([doc])
-    cleaned_text = clean_doc[0].page_content.strip()
-
-    return cleaned_text
-
-
-def clean_text_for_kb(text: str) -> str:
-    """Clean crawled markdown text into plain readable text."""
-
-    # 1. Remove image markdown like ![](url)
-    text = re.sub(r"!\[.*?\]\(.*?\)", "", text)
-    # 2. Replace markdown links [text](url) → keep text only
-    text = re.sub(r"\[([^\]]+)\]\([^)]*\)", r"\1", text)
-    # 3. Remove bare URLs (http/https/www)
-    text = re.sub(r"http[s]?://\S+|www\.\S+", "", text)
-    # 4. Remove dangling empty () or []
-    text = re.sub(r"\(\s*\)|\[\s*\]", "", text)
-    # 5. Remove lines with only special chars (*, #, spaces)
-    text = re.sub(r"^[\s*#]+$", "", text, flags=re.MULTILINE)
-    text = re.sub(r"^!\[\].*\n", "", text)
-    # 6. Collapse repeated sections (optional deduplication)
-    lines = text.splitlines()
-    seen = set()
-    deduped = []
-    for line in lines:
-        line_stripped = line.strip()
-        if (line_stripped and line_stripped not in seen) or len(line_stripped) < 2:
-            deduped.append(line)
-            seen.add(line_stripped)
-    text = "\n".join(deduped)
-    # 7. Normalize whitespace
-    text = re.sub(r"\n\s*\n+", "\n\n", text)  # collapse multiple blank lines
-    text = re.sub(r" {2,}", " ", text)  # collapse multiple spaces
-    return text.strip()
-
-
-def get_filename(url, output_dir):  # pylint: disable=unused-argument
-    """get the markdown file name"""
-    paths = os.listdir(output_dir)
-    if len(paths) == 0:
-        return output_dir + "/0.md"
-    else:
-        path = max(list(map(lambda x: int(x.replace(".md", "")), paths)))
-        try:
-            return output_dir + "/" + str(int(path) + 1) + ".md"
-        except ValueError:
-            return output_dir + "/" + str(101) + ".md"
+    return await convert(html_to_text, content)
 
 
 def save_file(md, url, output_dir="./markdown_content"):
-    """save the markdown file"""
-    file_name = get_filename(url, output_dir)
-    with open(file_name, "w", encoding="utf-8") as f:
-        f.write(md)
+    """save the markdown in the content-addressed page store of `output_dir`"""
+    return PageStore(output_dir).put(url, md)
+
+
+async def kb_text(cur_url, html, markdown=None):
+    """Knowledge base text of a page, by the Config.KB_EXTRACTION mode"""
+    mode = Config.KB_EXTRACTION
+    if mode in ("local", "auto"):
+        extracted = await convert(extract_main_content, html or "")
+        if mode == "local" or looks_complete(extracted):
+            observe_kb_extraction("local")
+            return extracted
+        logger.debug(f"Local extraction of {cur_url} looks incomplete, refining with the llm")
+
+    if markdown is not None:
+        cleaned = await convert(clean_text_for_kb, markdown)
+    else:
+        cleaned = await convert(html_to_kb_text, html)
+    observe_kb_extraction("llm")
+    return await arefine_with_llm(cleaned)
 
 
 def remove_header_footer(html_text: str) -> str:
@@ -77,11 +72,11 @@ def remove_header_footer(html_text: str) -> str:
 async def crawl(cur_url, refine_with_llm: bool):
     """Fetch markdown content for a single URL using crawl4ai."""
     try:
-        print(f"--> Crawl: Extracting content from {cur_url}")
+        logger.debug(f"crawl4ai: extracting content from {cur_url}")
         excluded_tags = []
         if not refine_with_llm:
             excluded_tags = ["header", "footer"]
-        async with AsyncWebCrawler() as crawler:
+        async with load_crawler()() as crawler:
             result = await crawler.arun(
                 cur_url, excluded_tags=excluded_tags
             )  # cSpell:disable-line
@@ -89,14 +84,13 @@ async def crawl(cur_url, refine_with_llm: bool):
                 raise ValueError("No markdown found")
             cleaned = ""
             if refine_with_llm:
-                print("--> cleaning and refining for kb")
-                cleaned = clean_text_for_kb(result.markdown)
-                cleaned = refine_with_llm(cleaned)
+                logger.debug(f"Cleaning and refining {cur_url} for the kb")
+                cleaned = await kb_text(cur_url, result.html, result.markdown)
             else:
-                print("-->cleaning for prompt")
-                cleaned = clean_text_for_prompt(result.html)
+                logger.debug(f"Cleaning {cur_url} for the prompt")
+                cleaned = await clean_text_for_prompt(result.html)
 
-            print(f"--> {len(cleaned)} chars extracted")
+            logger.info(f"crawl4ai: {len(cleaned)} chars extracted from {cur_url}")
             return cleaned, result.html
     except Error as e:
         raise RuntimeError(f"failed to extract the content from {cur_url}") from e
@@ -105,7 +99,7 @@ async def crawl(cur_url, refine_with_llm: bool):
 async def playwright(cur_url, refine_with_llm: bool):
     """Fetch markdown content for a single URL using playwright."""
     try:
-        print(f"-->Playwright: Extracting content from {cur_url}")
+        logger.debug(f"Playwright: extracting content from {cur_url}")
         async with async_playwright() as p:
             browser = await p.chromium.launch(headless=True)
             page = await browser.new_page()
@@ -113,65 +107,95 @@ async def playwright(cur_url, refine_with_llm: bool):
             html = await page.content()
             cleaned = ""
             if refine_with_llm:
-                print("--> cleaning and refining for kb")
-                cleaned = markdownify(html)  # cSpell:disable-line
-                cleaned = clean_text_for_kb(cleaned)
-                cleaned = refine_with_llm(cleaned)
+                logger.debug(f"Cleaning and refining {cur_url} for the kb")
+                cleaned = await kb_text(cur_url, html)
             else:
-                print("--> cleaning for prompt")
-                cleaned = clean_text_for_prompt(html)
+                logger.debug(f"Cleaning {cur_url} for the prompt")
+                cleaned = await clean_text_for_prompt(html)
 
-            print(f"--> {len(cleaned)} chars extracted")
+            logger.info(f"Playwright: {len(cleaned)} chars extracted from {cur_url}")
             await browser.close()
             return cleaned, html
     except Error as e:
         raise RuntimeError(f"Failed to extract content from {cur_url}") from e
 
 
+async def _scrape_with(tier: str, fetch, cur_url: str, refine_with_llm: bool):
+    """Run one fetch tier, timed and traced"""
+    started = time.perf_counter()
+    with span(f"scrape.{tier}", **{"url.full": cur_url, "scrape.tier": tier}) as current:
+        try:
+            md, html = await fetch(cur_url, refine_with_llm)
+        except BudgetExceededError:
+            raise
+        except Exception:
+            observe_scrape(tier, started, ok=False)
+            raise
+        observe_scrape(tier, started, ok=True)
+        current.set_attribute("scrape.chars", len(md or ""))
+        return md, html
+
+
 async def scrape(cur_url: str, refine_with_llm: bool):
     """Scrape the content using crawl4ai or fallback to playwright."""
     md, html = "", ""
 
-    try:
-        print(f"-->Trying crawl4ai for {cur_url}")
-        md, html = await crawl(cur_url, refine_with_llm)
+    with span("scrape", **{"url.full": cur_url, "scrape.refine": refine_with_llm}):
+        try:
+            logger.debug(f"Trying crawl4ai for {cur_url}")
+            md, html = await _scrape_with("crawl4ai", crawl, cur_url, refine_with_llm)
 
-    except Exception as e:  # pylint: disable=broad-exception-caught
-        print(f"-->crawl4ai failed for {cur_url}: {e},")
+        # the task's llm budget is spent: another browser would not get further
+        except BudgetExceededError:
+            raise
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            logger.warning(f"crawl4ai failed for {cur_url}: {e}")
 
-        try:
-            print(f"-->Trying playwright for {cur_url}")
-            md, html = await playwright(cur_url, refine_with_llm)
+            try:
+                logger.debug(f"Trying playwright for {cur_url}")
+                md, html = await _scrape_with(
+                    "playwright", playwright, cur_url, refine_with_llm
+                )
 
-        except Exception as e2:  # pylint: disable=broad-exception-caught
-            print(f"-->playwright failed for {cur_url}: {e2}")
-            return md, html
+            except BudgetExceededError:
+                raise
+            except Exception as e2:  # pylint: disable=broad-exception-caught
+                logger.error(f"playwright failed for {cur_url}: {e2}")
+                return md, html
 
     return md, html
 
 
 async def scrape_urls(
-    urls, refine_with_llm: bool = True, output_dir: str = "./markdown_content"
+    urls,
+    refine_with_llm: bool = True,
+    output_dir: str = "./markdown_content",
+    concurrency: int = None,
 ):
-    """Scrape one or multiple URLs using crawl4ai/playwright and save the output."""
-    scraped_content = ""
-
+    """Scrape one or multiple URLs concurrently and save the output in input order."""
     # Handle both single URL and list of URLs
     if not isinstance(urls, list):
         urls = [urls]
 
     no_of_links = len(urls)
+    semaphore = asyncio.Semaphore(concurrency or Config.SCRAPE_CONCURRENCY)
 
-    for i, url in enumerate(urls, start=1):
-        print("--" * 20)
-        print(f"Scraping {i}/{no_of_links}: {url}")
+    async def scrape_one(i, url):
+        async with semaphore:
+            logger.info(f"Scraping {i}/{no_of_links}: {url}")
+            cleaned_text, _ = await scrape(url, refine_with_llm)
+            return cleaned_text or ""
 
-        cleaned_text = await scrape(url, refine_with_llm)
-        scraped_content += cleaned_text or ""
+    texts = await asyncio.gather(
+        *(scrape_one(i, url) for i, url in enumerate(urls, start=1))
+    )
 
+    for url, cleaned_text in zip(urls, texts):
+        if not cleaned_text:
+            continue
         try:
             save_file(cleaned_text, url, output_dir)
         except Exception as e:  # pylint: disable=broad-exception-caught
-            print(f"Exception while saving scraped content from {url}: {e}")
+            logger.error(f"Exception while saving scraped content from {url}: {e}")
 
-    return scraped_content
+    return "".join(texts)
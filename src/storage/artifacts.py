@@ -0,0 +1,260 @@
+"""Artifact storage shared by workers: prompts, saved links and knowledge bases
+
+Artifacts of a task live under `<ARTIFACTS_PREFIX>/<task_id>/<name>` in the
+backend picked by `Config.ARTIFACTS_BACKEND`: a local directory, or an
+S3-compatible bucket (see src/storage/s3.py) so workers on different nodes
+see the same files. Scraped pages stay in the per-worker `markdown_content/`
+scratch directory.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import tempfile
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Union
+
+from src.core.config import Config
+from src.track_cost.ledger import current_task_id
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ArtifactInfo:
+    """Key, size in bytes and modification time (unix seconds) of one artifact"""
+
+    key: str
+    size: int
+    modified: float
+
+
+def _as_bytes(data: Union[str, bytes]) -> bytes:
+    return data.encode("utf-8") if isinstance(data, str) else data
+
+
+class ArtifactStore:
+    """Async key/value storage of artifact files; keys are `/`-separated"""
+
+    async def put(self, key: str, data: Union[str, bytes], content_type: str = "text/plain"):
+        raise NotImplementedError
+
+    async def get(self, key: str) -> Optional[bytes]:
+        """Content of the artifact, None when it does not exist"""
+        raise NotImplementedError
+
+    async def delete(self, key: str):
+        raise NotImplementedError
+
+    async def list(self, prefix: str = "") -> List[ArtifactInfo]:
+        raise NotImplementedError
+
+    async def delete_prefix(self, prefix: str) -> int:
+        """Delete every artifact under the prefix; returns how many"""
+        infos = await self.list(prefix)
+        await asyncio.gather(*(self.delete(info.key) for info in infos))
+        return len(infos)
+
+
+class LocalArtifactStore(ArtifactStore):
+    """Artifacts as files under a directory, written atomically"""
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def _path(self, key: str) -> str:
+        parts = [part for part in key.split("/") if part]
+        if not parts or any(part in (".", "..") for part in parts):
+            raise ValueError(f"Invalid artifact key: {key!r}")
+        return os.path.join(self.root, *parts)
+
+    def _write(self, path: str, data: bytes):
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except BaseException:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+            raise
+
+    def _read(self, path: str) -> Optional[bytes]:
+        try:
+            with open(path, "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def _delete(self, path: str):
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            return
+        # drop directories left empty, up to the root
+        directory = os.path.dirname(path)
+        root = os.path.abspath(self.root)
+        while os.path.abspath(directory) != root:
+            try:
+                os.rmdir(directory)
+            except OSError:
+                break
+            directory = os.path.dirname(directory)
+
+    def _list(self, prefix: str) -> List[ArtifactInfo]:
+        infos = []
+        for directory, _, files in os.walk(self.root):
+            for name in files:
+                if name.endswith(".tmp"):
+                    continue
+                path = os.path.join(directory, name)
+                key = os.path.relpath(path, self.root).replace(os.sep, "/")
+                if not key.startswith(prefix):
+                    continue
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                infos.append(ArtifactInfo(key, stat.st_size, stat.st_mtime))
+        return sorted(infos, key=lambda info: info.key)
+
+    async def put(self, key: str, data: Union[str, bytes], content_type: str = "text/plain"):
+        await asyncio.to_thread(self._write, self._path(key), _as_bytes(data))
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return await asyncio.to_thread(self._read, self._path(key))
+
+    async def delete(self, key: str):
+        await asyncio.to_thread(self._delete, self._path(key))
+
+    async def list(self, prefix: str = "") -> List[ArtifactInfo]:
+        return await asyncio.to_thread(self._list, prefix)
+
+
+@lru_cache(maxsize=1)
+def get_artifact_store() -> ArtifactStore:
+    """Backend configured by `Config.ARTIFACTS_BACKEND`, one per process"""
+    if Config.ARTIFACTS_BACKEND == "local":
+        return LocalArtifactStore(Config.ARTIFACTS_DIR)
+    if Config.ARTIFACTS_BACKEND == "s3":
+        from src.storage.s3 import S3ArtifactStore  # pylint: disable=import-outside-toplevel
+
+        return S3ArtifactStore.from_config()
+    raise ValueError(f"Unknown artifacts backend: {Config.ARTIFACTS_BACKEND}")
+
+
+# -------------------
+# Per-task namespace
+# -------------------
+class TaskArtifacts:
+    """Artifacts of one task, addressed by file name"""
+
+    def __init__(self, task_id: str, store: Optional[ArtifactStore] = None):
+        self.task_id = task_id
+        self.store = store or get_artifact_store()
+        self.prefix = f"{Config.ARTIFACTS_PREFIX}/{task_id}/"
+
+    def key(self, name: str) -> str:
+        return self.prefix + name
+
+    async def put_text(self, name: str, text: str):
+        await self.store.put(self.key(name), text)
+        logger.info(f"Artifact saved: {self.key(name)}")
+
+    async def put_json(self, name: str, value: Any):
+        await self.store.put(
+            self.key(name), json.dumps(value, indent=4), content_type="application/json"
+        )
+        logger.info(f"Artifact saved: {self.key(name)}")
+
+    async def get_bytes(self, name: str) -> Optional[bytes]:
+        return await self.store.get(self.key(name))
+
+    async def get_text(self, name: str) -> Optional[str]:
+        data = await self.get_bytes(name)
+        return None if data is None else data.decode("utf-8")
+
+    async def list(self) -> List[ArtifactInfo]:
+        return await self.store.list(self.prefix)
+
+
+def task_artifacts(task_id: Optional[str] = None) -> TaskArtifacts:
+    """Artifacts of a task, by default the one running in this context"""
+    return TaskArtifacts(task_id or current_task_id.get())
+
+
+# -------------------
+# Retention
+# -------------------
+async def enforce_retention(
+    store: ArtifactStore,
+    max_age: Optional[float] = None,
+    max_tasks: Optional[int] = None,
+    now: Optional[float] = None,
+) -> List[str]:
+    """
+    Evict whole task namespaces: those not written for `max_age` seconds,
+    then the least recently written beyond `max_tasks`. Returns the evicted
+    task ids.
+    """
+    prefix = f"{Config.ARTIFACTS_PREFIX}/"
+    now = now if now is not None else time.time()
+    newest: Dict[str, float] = defaultdict(float)
+    for info in await store.list(prefix):
+        task_id = info.key[len(prefix) :].split("/", 1)[0]
+        newest[task_id] = max(newest[task_id], info.modified)
+
+    by_age = sorted(newest, key=newest.get, reverse=True)
+    evicted = [t for t in by_age if max_age is not None and now - newest[t] > max_age]
+    kept = [t for t in by_age if t not in evicted]
+    if max_tasks is not None and len(kept) > max_tasks:
+        evicted += kept[max_tasks:]
+
+    for task_id in evicted:
+        await store.delete_prefix(f"{prefix}{task_id}/")
+    if evicted:
+        logger.info(f"Evicted artifacts of {len(evicted)} tasks")
+    return evicted
+
+
+class ArtifactSweeper:
+    """Apply the retention settings of Config periodically"""
+
+    def __init__(self, store: Optional[ArtifactStore] = None):
+        self.store = store or get_artifact_store()
+        self.interval = Config.ARTIFACTS_SWEEP_INTERVAL_S
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is not None:
+            return
+        if Config.ARTIFACTS_RETENTION_S is None and Config.ARTIFACTS_MAX_TASKS is None:
+            return
+        self._task = asyncio.create_task(self._run(), name="artifact-sweeper")
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await enforce_retention(
+                    self.store,
+                    max_age=Config.ARTIFACTS_RETENTION_S,
+                    max_tasks=Config.ARTIFACTS_MAX_TASKS,
+                )
+            except Exception as e:  # pylint: disable=broad-exception-caught
+                logger.error(f"Artifact retention sweep failed: {e}")
+            await asyncio.sleep(self.interval)
@@ -0,0 +1,200 @@
+"""S3-compatible artifact backend (AWS S3, MinIO, the fake server's /_s3 routes)
+
+Requests are signed with AWS Signature Version 4 and sent path-style
+(`<endpoint>/<bucket>/<key>`) over the shared httpx pool, so no SDK is needed.
+"""
+
+import hashlib
+import hmac
+import logging
+import xml.etree.ElementTree as ET
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Union
+from urllib.parse import quote, urlparse
+
+from src.core.config import Config
+from src.storage.artifacts import ArtifactInfo, ArtifactStore, _as_bytes
+from src.utils.http_client import get_http_client
+
+logger = logging.getLogger(__name__)
+
+S3_NS = "{http://s3.amazonaws.com/doc/2006-03-01/}"
+UNSIGNED_CHARS = "-_.~"
+
+
+def _hmac(key: bytes, message: str) -> bytes:
+    return hmac.new(key, message.encode("utf-8"), hashlib.sha256).digest()
+
+
+def sign_v4(
+    method: str,
+    url: str,
+    headers: Dict[str, str],
+    payload_hash: str,
+    access_key: str,
+    secret_key: str,
+    region: str,
+    service: str = "s3",
+    now: Optional[datetime] = None,
+) -> Dict[str, str]:
+    """Headers with the SigV4 `Authorization` for a request; `url` must be percent-encoded"""
+    now = now or datetime.now(timezone.utc)
+    amz_date = now.strftime("%Y%m%dT%H%M%SZ")
+    date = now.strftime("%Y%m%d")
+    parsed = urlparse(url)
+
+    headers = {k.lower(): v.strip() for k, v in headers.items()}
+    headers["host"] = parsed.netloc
+    headers["x-amz-date"] = amz_date
+    headers["x-amz-content-sha256"] = payload_hash
+    signed_headers = ";".join(sorted(headers))
+    canonical_headers = "".join(f"{name}:{headers[name]}\n" for name in sorted(headers))
+
+    query = []
+    for pair in filter(None, parsed.query.split("&")):
+        name, _, value = pair.partition("=")
+        query.append((name, value))
+    canonical_query = "&".join(f"{name}={value}" for name, value in sorted(query))
+
+    canonical_request = "\n".join(
+        [
+            method,
+            parsed.path or "/",
+            canonical_query,
+            canonical_headers,
+            signed_headers,
+            payload_hash,
+        ]
+    )
+    scope = f"{date}/{region}/{service}/aws4_request"
+    string_to_sign = "\n".join(
+        [
+            "AWS4-HMAC-SHA256",
+            amz_date,
+            scope,
+            hashlib.sha256(canonical_request.encode("utf-8")).hexdigest(),
+        ]
+    )
+    key = _hmac(("AWS4" + secret_key).encode("utf-8"), date)
+    for part in (region, service, "aws4_request"):
+        key = _hmac(key, part)
+    signature = hmac.new(key, string_to_sign.encode("utf-8"), hashlib.sha256).hexdigest()
+
+    headers["authorization"] = (
+        f"AWS4-HMAC-SHA256 Credential={access_key}/{scope}, "
+        f"SignedHeaders={signed_headers}, Signature={signature}"
+    )
+    return headers
+
+
+class S3ArtifactStore(ArtifactStore):
+    """Artifacts as objects of one bucket"""
+
+    def __init__(
+        self,
+        endpoint: str,
+        bucket: str,
+        access_key: str,
+        secret_key: str,
+        region: str = "us-east-1",
+    ):
+        self.endpoint = endpoint.rstrip("/")
+        self.bucket = bucket
+        self.access_key = access_key
+        self.secret_key = secret_key
+        self.region = region
+
+    @classmethod
+    def from_config(cls) -> "S3ArtifactStore":
+        missing = [
+            name
+            for name in (
+                "ARTIFACTS_S3_ENDPOINT",
+                "ARTIFACTS_S3_BUCKET",
+                "ARTIFACTS_S3_ACCESS_KEY",
+                "ARTIFACTS_S3_SECRET_KEY",
+            )
+            if not getattr(Config, name)
+        ]
+        if missing:
+            raise ValueError(f"S3 artifacts backend needs {', '.join(missing)}")
+        return cls(
+            Config.ARTIFACTS_S3_ENDPOINT,
+            Config.ARTIFACTS_S3_BUCKET,
+            Config.ARTIFACTS_S3_ACCESS_KEY,
+            Config.ARTIFACTS_S3_SECRET_KEY,
+            Config.ARTIFACTS_S3_REGION,
+        )
+
+    def _url(self, key: str = "", query: Optional[Dict[str, str]] = None) -> str:
+        url = f"{self.endpoint}/{quote(self.bucket, safe=UNSIGNED_CHARS)}"
+        if key:
+            url += "/" + quote(key, safe=UNSIGNED_CHARS + "/")
+        if query:
+            url += "?" + "&".join(
+                f"{quote(k, safe=UNSIGNED_CHARS)}={quote(v, safe=UNSIGNED_CHARS)}"
+                for k, v in sorted(query.items())
+            )
+        return url
+
+    async def _request(
+        self,
+        method: str,
+        key: str = "",
+        query: Optional[Dict[str, str]] = None,
+        body: bytes = b"",
+        headers: Optional[Dict[str, str]] = None,
+    ):
+        url = self._url(key, query)
+        signed = sign_v4(
+            method,
+            url,
+            headers or {},
+            hashlib.sha256(body).hexdigest(),
+            self.access_key,
+            self.secret_key,
+            self.region,
+        )
+        client = get_http_client()
+        return await client.request(method, url, content=body or None, headers=signed)
+
+    async def put(self, key: str, data: Union[str, bytes], content_type: str = "text/plain"):
+        response = await self._request(
+            "PUT", key, body=_as_bytes(data), headers={"content-type": content_type}
+        )
+        response.raise_for_status()
+
+    async def get(self, key: str) -> Optional[bytes]:
+        response = await self._request("GET", key)
+        if response.status_code == 404:
+            return None
+        response.raise_for_status()
+        return response.content
+
+    async def delete(self, key: str):
+        response = await self._request("DELETE", key)
+        if response.status_code != 404:
+            response.raise_for_status()
+
+    async def list(self, prefix: str = "") -> List[ArtifactInfo]:
+        infos = []
+        query = {"list-type": "2", "prefix": prefix}
+        while True:
+            response = await self._request("GET", query=query)
+            response.raise_for_status()
+            root = ET.fromstring(response.content)
+            for item in root.iter(f"{S3_NS}Contents"):
+                modified = datetime.fromisoformat(
+                    item.findtext(f"{S3_NS}LastModified").replace("Z", "+00:00")
+                )
+                infos.append(
+                    ArtifactInfo(
+                        item.findtext(f"{S3_NS}Key"),
+                        int(item.findtext(f"{S3_NS}Size") or 0),
+                        modified.timestamp(),
+                    )
+                )
+            token = root.findtext(f"{S3_NS}NextContinuationToken")
+            if root.findtext(f"{S3_NS}IsTruncated") != "true" or not token:
+                return infos
+            query = {**query, "continuation-token": token}
@@ -1,65 +1,236 @@
 """calculate the cost per token"""
 
-from langchain_core.runnables import Runnable
-
-
-def calc_cost(input_tokens, output_tokens, model_name):
-    """Calculate the cost per input and output token based on the model."""
+import logging
+import time
 
-    if model_name in ("models/gpt-4.1-mini", "gpt-4.1-mini"):
-        rate_in = 0.40 / 1_000_000  # $0.40 per 1M input tokens
-        rate_out = 1.60 / 1_000_000  # $1.60 per 1M output tokens
+from langchain_core.runnables import Runnable
 
-    elif model_name in ("models/gpt-4o-mini", "gpt-4o-mini"):
-        rate_in = 0.15 / 1_000_000
-        rate_out = 0.60 / 1_000_000
+from src.monitoring.metrics import observe_llm_call
+from src.monitoring.tracing import record_error, set_llm_usage, span, tracer
+from src.track_cost.ledger import BudgetExceededError, cost_ledger, current_task_id
+from src.track_cost.pricing import get_pricing_registry
 
-    elif model_name in ("models/gemini-2.5-flash", "gemini-2.5-flash"):
-        rate_in = 0.30 / 1_000_000
-        rate_out = 2.50 / 1_000_000
+logger = logging.getLogger(__name__)
 
-    else:
-        print("Assign cost for input and output tokens")
-        return None, None
 
-    return round(input_tokens * rate_in, 6), round(output_tokens * rate_out, 6)
+def calc_cost(input_tokens, output_tokens, model_name, cached_tokens=0):
+    """Calculate the cost per input and output token based on the model."""
+    return get_pricing_registry().cost(
+        model_name, input_tokens, output_tokens, cached_tokens
+    )
 
 
 class CostTrackingLLM(Runnable):
-    """calculate the cost per token"""
+    """calculate the cost per token for sync, async, streaming and batch calls"""
 
-    def __init__(self, llm, model_name=None):
+    def __init__(self, llm, model_name=None, ledger=None, degrade_to=None):
         self.llm = llm
         self.model_name = model_name
-        self.final_cost = 0
-
-    def invoke(self, messages, tags=None, **kwargs):  # pylint: disable=unused-argument  disable=arguments-renamed
-        """function called when the llm is invoked"""
-        response = self.llm.invoke(messages, **kwargs)
-
+        self.ledger = ledger or cost_ledger
+        # cheaper model used once the task is over its budget
+        self.degrade_to = degrade_to
+        self.is_fallback = False
+        if degrade_to is not None:
+            degrade_to.is_fallback = True
+
+    @property
+    def final_cost(self):
+        """cost recorded so far for the current task"""
+        return self.ledger.total_cost()
+
+    def _resolve_model_name(self):
         if self.model_name is None:
             if hasattr(self.llm, "model"):
                 self.model_name = self.llm.model
             elif hasattr(self.llm, "model_name"):
                 self.model_name = self.llm.model_name
-
-        input_tokens = response.usage_metadata["input_tokens"]
-        output_tokens = response.usage_metadata["output_tokens"]
+        return self.model_name
+
+    def _route(self):
+        """the client to call under the current task's budget"""
+        status = self.ledger.budget_status()
+        if status == "ok" or (status == "over" and self.is_fallback):
+            return self
+
+        task_id = current_task_id.get()
+        if status == "hard" or self.degrade_to is None or (
+            self.ledger.budget_policy() == "stop"
+        ):
+            raise BudgetExceededError(f"LLM budget exceeded for task {task_id}")
+        logger.warning(
+            f"Task {task_id} is over its LLM budget, degrading "
+            f"{self._resolve_model_name()} to {self.degrade_to._resolve_model_name()}"
+        )
+        return self.degrade_to
+
+    def _observe_latency(self, started):
+        observe_llm_call(self._resolve_model_name(), time.perf_counter() - started, None)
+
+    def _record(self, response, started=None):
+        """add the token usage of a response to the ledger and the metrics"""
+        if started is not None:
+            self._observe_latency(started)
+        usage = getattr(response, "usage_metadata", None)
+        if not usage:
+            logger.debug(f"No usage metadata returned by {self._resolve_model_name()}")
+            return
+
+        model_name = self._resolve_model_name()
+        input_tokens = usage.get("input_tokens", 0)
+        output_tokens = usage.get("output_tokens", 0)
+        cached_tokens = (usage.get("input_token_details") or {}).get("cache_read", 0)
         input_cost, output_cost = calc_cost(
-            input_tokens, output_tokens, model_name=self.model_name
+            input_tokens,
+            output_tokens,
+            model_name=model_name,
+            cached_tokens=cached_tokens,
         )
-        print()
-        print("--> model name : ", self.model_name)
-        print(f"input tokens : {input_tokens}, output tokens : {output_tokens}")
-        print(f"input tokens cost : {input_cost}")
-        print(f"output tokens cost : {output_cost}")
-        print(f"combined cost : {input_cost + output_cost}")
-        self.final_cost = self.final_cost + input_cost + output_cost
-        print("cost till now : ", self.final_cost)
+        cache_savings = 0.0
+        if cached_tokens:
+            uncached_cost, _ = calc_cost(input_tokens, 0, model_name=model_name)
+            cache_savings = max(0.0, uncached_cost - input_cost)
+
+        observe_llm_call(model_name, None, usage)
+        self.ledger.record(
+            model_name,
+            input_tokens,
+            output_tokens,
+            input_cost,
+            output_cost,
+            cached_tokens=cached_tokens,
+            cache_savings=cache_savings,
+        )
+        logger.debug(
+            f"{model_name}: input tokens {input_tokens} ({cached_tokens} cached), "
+            f"output tokens {output_tokens}, cost {input_cost + output_cost}"
+        )
+
+    def _span_attributes(self):
+        return {"gen_ai.request.model": self._resolve_model_name() or "unknown"}
+
+    def _span(self, kind="call"):
+        """current span around one call, batch or stream of the wrapped model"""
+        return span(f"llm.{kind}", **self._span_attributes())
+
+    def _call_kwargs(self, kwargs):
+        """drop request options the wrapped provider does not accept"""
+        if "prompt_cache_key" in kwargs and not self._is_openai():
+            kwargs = {k: v for k, v in kwargs.items() if k != "prompt_cache_key"}
+        return kwargs
 
+    def _is_openai(self):
+        # bind_tools wraps the chat model in a RunnableBinding
+        client = getattr(self.llm, "bound", self.llm)
+        return type(client).__module__.startswith("langchain_openai")
+
+    def invoke(self, input, config=None, **kwargs):  # pylint: disable=redefined-builtin
+        """function called when the llm is invoked"""
+        target = self._route()
+        if target is not self:
+            return target.invoke(input, config, **kwargs)
+        with self._span() as current:
+            started = time.perf_counter()
+            response = self.llm.invoke(input, config, **self._call_kwargs(kwargs))
+            set_llm_usage(current, getattr(response, "usage_metadata", None))
+        self._record(response, started)
         return response
 
+    async def ainvoke(self, input, config=None, **kwargs):  # pylint: disable=redefined-builtin
+        target = self._route()
+        if target is not self:
+            return await target.ainvoke(input, config, **kwargs)
+        with self._span() as current:
+            started = time.perf_counter()
+            response = await self.llm.ainvoke(input, config, **self._call_kwargs(kwargs))
+            set_llm_usage(current, getattr(response, "usage_metadata", None))
+        self._record(response, started)
+        return response
+
+    def stream(self, input, config=None, **kwargs):  # pylint: disable=redefined-builtin
+        target = self._route()
+        if target is not self:
+            yield from target.stream(input, config, **kwargs)
+            return
+        aggregate = None
+        # not made current: the consumer may resume the generator from another context
+        current = tracer.start_span("llm.stream", attributes=self._span_attributes())
+        started = time.perf_counter()
+        try:
+            for chunk in self.llm.stream(input, config, **self._call_kwargs(kwargs)):
+                aggregate = chunk if aggregate is None else aggregate + chunk
+                yield chunk
+        except Exception as e:
+            record_error(current, e)
+            raise
+        finally:
+            set_llm_usage(current, getattr(aggregate, "usage_metadata", None))
+            current.end()
+            # also when the consumer stops early: the tokens so far are spent
+            if aggregate is not None:
+                self._record(aggregate, started)
+
+    async def astream(self, input, config=None, **kwargs):  # pylint: disable=redefined-builtin
+        """stream chunks and record the usage aggregated over the stream"""
+        target = self._route()
+        if target is not self:
+            async for chunk in target.astream(input, config, **kwargs):
+                yield chunk
+            return
+        aggregate = None
+        current = tracer.start_span("llm.stream", attributes=self._span_attributes())
+        started = time.perf_counter()
+        try:
+            async for chunk in self.llm.astream(input, config, **self._call_kwargs(kwargs)):
+                aggregate = chunk if aggregate is None else aggregate + chunk
+                yield chunk
+        except Exception as e:
+            record_error(current, e)
+            raise
+        finally:
+            set_llm_usage(current, getattr(aggregate, "usage_metadata", None))
+            current.end()
+            # also when the consumer stops early: the tokens so far are spent
+            if aggregate is not None:
+                self._record(aggregate, started)
+
+    def batch(self, inputs, config=None, *, return_exceptions=False, **kwargs):
+        target = self._route()
+        if target is not self:
+            return target.batch(
+                inputs, config, return_exceptions=return_exceptions, **kwargs
+            )
+        with self._span("batch") as current:
+            current.set_attribute("llm.batch_size", len(inputs))
+            started = time.perf_counter()
+            responses = self.llm.batch(
+                inputs, config, return_exceptions=return_exceptions, **self._call_kwargs(kwargs)
+            )
+        self._observe_latency(started)
+        for response in responses:
+            if not isinstance(response, Exception):
+                self._record(response)
+        return responses
+
+    async def abatch(self, inputs, config=None, *, return_exceptions=False, **kwargs):
+        target = self._route()
+        if target is not self:
+            return await target.abatch(
+                inputs, config, return_exceptions=return_exceptions, **kwargs
+            )
+        with self._span("batch") as current:
+            current.set_attribute("llm.batch_size", len(inputs))
+            started = time.perf_counter()
+            responses = await self.llm.abatch(
+                inputs, config, return_exceptions=return_exceptions, **self._call_kwargs(kwargs)
+            )
+        self._observe_latency(started)
+        for response in responses:
+            if not isinstance(response, Exception):
+                self._record(response)
+        return responses
+
     def bind_tools(self, tools):
         """Ensure cost tracking persists after binding tools"""
         bound_llm = self.llm.bind_tools(tools)
-        return CostTrackingLLM(bound_llm, self.model_name)
+        degrade_to = self.degrade_to.bind_tools(tools) if self.degrade_to else None
+        return CostTrackingLLM(bound_llm, self.model_name, self.ledger, degrade_to)
@@ -0,0 +1,208 @@
+"""Thread-safe, per-task ledger of LLM token usage and cost"""
+
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+from src.core.config import Config
+
+# Task and pipeline step the current coroutine/thread is working for;
+# both are copied into tool threads and nested event loops
+current_task_id: ContextVar[str] = ContextVar("cost_task_id", default="global")
+current_step: ContextVar[str] = ContextVar("cost_step", default="unassigned")
+
+TOTAL_KEYS = (
+    "calls",
+    "input_tokens",
+    "output_tokens",
+    "cached_tokens",  # input tokens served from the provider prompt cache
+    "input_cost",
+    "output_cost",
+    "cache_savings",  # USD saved by cached input tokens
+)
+
+
+def _empty_totals() -> dict:
+    return {key: 0 if key.endswith(("calls", "tokens")) else 0.0 for key in TOTAL_KEYS}
+
+
+def _add(target: dict, totals: dict):
+    for key in TOTAL_KEYS:
+        target[key] += totals.get(key, 0)
+
+
+def _finish(totals: dict) -> dict:
+    totals["input_cost"] = round(totals["input_cost"], 6)
+    totals["output_cost"] = round(totals["output_cost"], 6)
+    totals["cache_savings"] = round(totals["cache_savings"], 6)
+    totals["total_cost"] = round(totals["input_cost"] + totals["output_cost"], 6)
+    return totals
+
+
+class BudgetExceededError(RuntimeError):
+    """Raised when a task runs past its LLM token or dollar budget"""
+
+
+@dataclass
+class TaskBudget:
+    """Per-task LLM limits
+
+    Over budget, the "degrade" policy moves calls to the cheaper fallback
+    model until usage reaches `hard_factor` times the budget; "stop" raises
+    straight away.
+    """
+
+    max_tokens: Optional[int] = None
+    max_cost: Optional[float] = None
+    policy: str = "degrade"
+    hard_factor: float = 1.5
+
+    @classmethod
+    def from_config(cls, max_tokens=None, max_cost=None) -> "TaskBudget":
+        return cls(
+            max_tokens=max_tokens or Config.JOB_MAX_TOKENS,
+            max_cost=max_cost or Config.JOB_MAX_COST_USD,
+            policy=Config.JOB_BUDGET_POLICY,
+        )
+
+    def status(self, tokens: int, cost: float) -> str:
+        """'ok', 'over' (past the budget) or 'hard' (past the hard limit)"""
+        ratio = max(
+            tokens / self.max_tokens if self.max_tokens else 0,
+            cost / self.max_cost if self.max_cost else 0,
+        )
+        if ratio >= self.hard_factor:
+            return "hard"
+        if ratio >= 1:
+            return "over"
+        return "ok"
+
+
+class CostLedger:
+    """Accumulate usage per task, split by pipeline step and model
+
+    Recording only takes a lock around a few additions, so it is cheap to
+    call from the event loop and safe to call from tool threads.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tasks: Dict[str, Dict[Tuple[str, str], dict]] = {}
+        self._usage: Dict[str, list] = {}  # task_id -> [tokens, cost]
+        self._budgets: Dict[str, TaskBudget] = {}
+
+    def record(
+        self,
+        model: str,
+        input_tokens: int,
+        output_tokens: int,
+        input_cost: float,
+        output_cost: float,
+        task_id: Optional[str] = None,
+        step: Optional[str] = None,
+        cached_tokens: int = 0,
+        cache_savings: float = 0.0,
+    ):
+        task_id = task_id or current_task_id.get()
+        step = step or current_step.get()
+        with self._lock:
+            totals = self._tasks.setdefault(task_id, {}).setdefault(
+                (step, model), _empty_totals()
+            )
+            totals["calls"] += 1
+            totals["input_tokens"] += input_tokens
+            totals["output_tokens"] += output_tokens
+            totals["input_cost"] += input_cost
+            totals["output_cost"] += output_cost
+            totals["cached_tokens"] += cached_tokens
+            totals["cache_savings"] += cache_savings
+            usage = self._usage.setdefault(task_id, [0, 0.0])
+            usage[0] += input_tokens + output_tokens
+            usage[1] += input_cost + output_cost
+
+    def set_budget(self, task_id: str, budget: Optional[TaskBudget]):
+        with self._lock:
+            if budget is None:
+                self._budgets.pop(task_id, None)
+            else:
+                self._budgets[task_id] = budget
+
+    def charge(self, task_id: str, tokens: int, cost: float):
+        """Count usage of a task's earlier attempts against its budget, not in its summary"""
+        with self._lock:
+            usage = self._usage.setdefault(task_id, [0, 0.0])
+            usage[0] += tokens
+            usage[1] += cost
+
+    def budget_status(self, task_id: Optional[str] = None) -> str:
+        """Budget state of a task; 'ok' when it has no budget"""
+        task_id = task_id or current_task_id.get()
+        with self._lock:
+            budget = self._budgets.get(task_id)
+            tokens, cost = self._usage.get(task_id, (0, 0.0))
+        if budget is None:
+            return "ok"
+        return budget.status(tokens, cost)
+
+    def budget_policy(self, task_id: Optional[str] = None) -> Optional[str]:
+        budget = self._budgets.get(task_id or current_task_id.get())
+        return budget.policy if budget else None
+
+    def summary(self, task_id: Optional[str] = None) -> dict:
+        """Totals for a task, overall, by model and by step (with a model split)"""
+        task_id = task_id or current_task_id.get()
+        with self._lock:
+            entries = {
+                key: dict(totals) for key, totals in self._tasks.get(task_id, {}).items()
+            }
+
+        overall, by_model, by_step = _empty_totals(), {}, {}
+        for (step, model), totals in entries.items():
+            _add(overall, totals)
+            _add(by_model.setdefault(model, _empty_totals()), totals)
+            step_totals = by_step.setdefault(step, {**_empty_totals(), "by_model": {}})
+            _add(step_totals, totals)
+            step_totals["by_model"][model] = _finish(totals)
+
+        overall = _finish(overall)
+        overall["by_model"] = {m: _finish(t) for m, t in by_model.items()}
+        overall["by_step"] = {s: _finish(t) for s, t in by_step.items()}
+        return overall
+
+    def total_cost(self, task_id: Optional[str] = None) -> float:
+        return self.summary(task_id)["total_cost"]
+
+    def reset(self, task_id: Optional[str] = None) -> dict:
+        """Drop a finished task from the ledger and return its summary"""
+        task_id = task_id or current_task_id.get()
+        summary = self.summary(task_id)
+        with self._lock:
+            self._tasks.pop(task_id, None)
+            self._usage.pop(task_id, None)
+            self._budgets.pop(task_id, None)
+        return summary
+
+
+cost_ledger = CostLedger()
+
+
+@contextmanager
+def cost_scope(task_id: str):
+    """Attribute LLM usage inside the block to `task_id`"""
+    token = current_task_id.set(task_id)
+    try:
+        yield
+    finally:
+        current_task_id.reset(token)
+
+
+@contextmanager
+def cost_step(step: str):
+    """Attribute LLM usage inside the block to pipeline step `step`"""
+    token = current_step.set(step)
+    try:
+        yield
+    finally:
+        current_step.reset(token)
@@ -0,0 +1,98 @@
+"""Model pricing registry (USD per 1M tokens) loaded from config"""
+
+import json
+import logging
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, Optional
+
+from src.core.config import Config
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class ModelPrice:
+    """USD per 1M tokens"""
+
+    input: float
+    output: float
+    cached_input: Optional[float] = None  # defaults to the input price
+
+
+DEFAULT_PRICES: Dict[str, ModelPrice] = {
+    "gpt-4": ModelPrice(30.00, 60.00),
+    "gpt-4-turbo": ModelPrice(10.00, 30.00),
+    "gpt-4o": ModelPrice(2.50, 10.00, 1.25),
+    "gpt-4o-mini": ModelPrice(0.15, 0.60, 0.075),
+    "gpt-4.1": ModelPrice(2.00, 8.00, 0.50),
+    "gpt-4.1-mini": ModelPrice(0.40, 1.60, 0.10),
+    "gpt-4.1-nano": ModelPrice(0.10, 0.40, 0.025),
+    "gemini-2.5-flash": ModelPrice(0.30, 2.50, 0.075),
+    "gemini-2.5-flash-lite": ModelPrice(0.10, 0.40, 0.025),
+    "gemini-2.5-pro": ModelPrice(1.25, 10.00, 0.31),
+}
+
+
+def normalize_model_name(model_name: str) -> str:
+    """'openai:gpt-4', 'models/gemini-2.5-flash' -> 'gpt-4', 'gemini-2.5-flash'"""
+    name = (model_name or "").strip().lower()
+    name = name.split(":", 1)[-1]
+    return name.rsplit("/", 1)[-1]
+
+
+class PricingRegistry:
+    """
+    Prices by normalized model name
+
+    `Config.MODEL_PRICING_FILE` may point to a JSON file of
+    `{"<model>": {"input": .., "output": .., "cached_input": ..}}` that
+    overrides or extends the defaults. Dated variants such as
+    `gpt-4o-2024-08-06` resolve to the longest matching prefix.
+    """
+
+    def __init__(self, prices: Optional[Dict[str, ModelPrice]] = None):
+        self._prices = {
+            normalize_model_name(name): price
+            for name, price in (prices or DEFAULT_PRICES).items()
+        }
+        self._warned = set()
+
+    @classmethod
+    def from_file(cls, path: Optional[str]) -> "PricingRegistry":
+        prices = dict(DEFAULT_PRICES)
+        if path:
+            with open(path, "r", encoding="utf-8") as f:
+                for name, price in json.load(f).items():
+                    prices[name] = ModelPrice(**price)
+        return cls(prices)
+
+    def get(self, model_name: str) -> Optional[ModelPrice]:
+        name = normalize_model_name(model_name)
+        if name in self._prices:
+            return self._prices[name]
+        prefixes = [p for p in self._prices if name.startswith(p + "-")]
+        if prefixes:
+            return self._prices[max(prefixes, key=len)]
+
+        if name not in self._warned:
+            self._warned.add(name)
+            logger.warning(f"No pricing configured for model {model_name}")
+        return None
+
+    def cost(self, model_name, input_tokens, output_tokens, cached_tokens=0):
+        """(input cost, output cost) in USD; unknown models cost 0"""
+        price = self.get(model_name)
+        if price is None:
+            return 0.0, 0.0
+        cached_rate = price.input if price.cached_input is None else price.cached_input
+        uncached = max(0, input_tokens - cached_tokens)
+        input_cost = (uncached * price.input + cached_tokens * cached_rate) / 1_000_000
+        output_cost = output_tokens * price.output / 1_000_000
+        return round(input_cost, 6), round(output_cost, 6)
+
+
+@lru_cache(maxsize=1)
+def get_pricing_registry() -> PricingRegistry:
+    """Load the pricing table once per process"""
+    return PricingRegistry.from_file(Config.MODEL_PRICING_FILE)
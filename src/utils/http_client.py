@@ -0,0 +1,42 @@
+"""Shared httpx connection pool for Millis and S3 calls"""
+
+import asyncio
+import weakref
+
+import httpx
+
+from src.core.config import Config
+from src.monitoring.metrics import HTTP_EVENT_HOOKS
+from src.monitoring.tracing import TracingTransport
+
+# One client per event loop: httpx pools cannot be shared across loops
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Return the pooled client for the running event loop"""
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None or client.is_closed:
+        transport = httpx.AsyncHTTPTransport(
+            limits=httpx.Limits(
+                max_connections=Config.HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=Config.HTTP_MAX_KEEPALIVE,
+            )
+        )
+        client = httpx.AsyncClient(
+            timeout=httpx.Timeout(30.0),
+            transport=TracingTransport(transport),
+            event_hooks=HTTP_EVENT_HOOKS,
+        )
+        _clients[loop] = client
+    return client
+
+
+async def close_http_client():
+    """Close the pooled client of the running event loop"""
+    client = _clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
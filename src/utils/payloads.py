@@ -1,68 +1,214 @@
+"""Millis agent payloads built from validated, per-tenant presets"""
+
+import json
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+from pydantic import BaseModel, ConfigDict, Field
+
+from src.core.config import Config
+
+
+# -------------------
+# Payload models
+# -------------------
+class _Section(BaseModel):
+    model_config = ConfigDict(frozen=True, extra="forbid")
+
+
+class HistorySettings(_Section):
+    history_message_limit: int = Field(20, ge=0)
+    history_tool_result_limit: int = Field(5, ge=0)
+
+
+class LLMSettings(_Section):
+    model: str = Field("gpt-4o", min_length=1)
+    temperature: float = Field(0.7, ge=0, le=2)
+    history_settings: HistorySettings = HistorySettings()
+
+
+class VoiceSettings(_Section):
+    provider: str = "elevenlabs"
+    voice_id: str = Field("21m00Tcm4TlvDq8ikWAM", min_length=1)
+    model: str = "eleven_turbo_v2_5"
+
+
+class SpeechToTextSettings(_Section):
+    provider: str = "deepgram"
+    multilingual: bool = False
+    model: str = "nova-2"
+
+
+class InterruptionSettings(_Section):
+    allowed: bool = True
+    keep_interruption_message: bool = True
+    first_messsage: bool = True  # cSpell:disable-line (field name used by Millis)
+
+
+class ResponseDelay(_Section):
+    generic_delay: int = Field(100, ge=0)
+    number_input_delay: int = Field(100, ge=0)
+
+
+class InactivityHandling(_Section):
+    idle_time: int = Field(20, gt=0)
+    message: str = "Are you still there?"
+
+
+class AgentTerminateCall(_Section):
+    enabled: bool = True
+    messages: List[str] = ["Ending session. Thank you."]
+
+
+class FlowSettings(_Section):
+    user_start_first: bool = False
+    interruption: InterruptionSettings = InterruptionSettings()
+    response_delay: ResponseDelay = ResponseDelay()
+    inactivity_handling: InactivityHandling = InactivityHandling()
+    agent_terminate_call: AgentTerminateCall = AgentTerminateCall()
+
+
+class SessionTimeout(_Section):
+    message: str = "Ending session. Thank you."
+    max_duration: int = Field(3600, gt=0)
+    max_idle: int = Field(40, gt=0)
+
+
+class CallSettings(_Section):
+    enable_recording: bool = True
+
+
+class AgentPreset(_Section):
+    """Agent settings shared by every agent created from the preset"""
+
+    language: str = "en"
+    llm: LLMSettings = LLMSettings()
+    voice: VoiceSettings = VoiceSettings()
+    speech_to_text: SpeechToTextSettings = SpeechToTextSettings()
+    flow: FlowSettings = FlowSettings()
+    session_timeout: SessionTimeout = SessionTimeout()
+    call_settings: CallSettings = CallSettings()
+
+
+class AgentConfig(AgentPreset):
+    prompt: str = Field(min_length=1)
+    first_message: str = Field(min_length=1)
+
+
+class AgentPayload(_Section):
+    """Full body sent to `POST /agents`"""
+
+    name: str = Field(min_length=1)
+    config: AgentConfig
+
+
+# -------------------
+# Preset registry
+# -------------------
+class _ReadOnlyDict(dict):
+    """dict that refuses changes; serializes and validates as a plain dict"""
+
+    def _read_only(self, *args, **kwargs):
+        raise TypeError("preset template sections are shared and read-only, copy them to edit")
+
+    __setitem__ = __delitem__ = __ior__ = _read_only
+    clear = pop = popitem = setdefault = update = _read_only
+
+
+def _read_only(value):
+    """The nested dicts and lists of a template, made read-only"""
+    if isinstance(value, dict):
+        return _ReadOnlyDict({key: _read_only(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return tuple(_read_only(item) for item in value)
+    return value
+
+
+def _merge(base: dict, override: dict) -> dict:
+    merged = dict(base)
+    for key, value in override.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = _merge(merged[key], value)
+        else:
+            merged[key] = value
+    return merged
+
+
+class PresetRegistry:
+    """
+    Validated agent presets, each pre-rendered to a payload template
+
+    Presets are read from the JSON file in `Config.AGENT_PRESETS_FILE` as
+    `{"<preset name>": {<partial AgentPreset>}}`; every entry is merged over
+    the built-in "default" preset.
+    """
+
+    def __init__(self, presets: Optional[Dict[str, dict]] = None):
+        default = AgentPreset()
+        self._presets: Dict[str, AgentPreset] = {"default": default}
+        base = default.model_dump()
+        for name, overrides in (presets or {}).items():
+            self._presets[name] = AgentPreset.model_validate(_merge(base, overrides))
+        # templates are shared between payloads: their sections are read-only
+        self._templates = {
+            name: _read_only(preset.model_dump()) for name, preset in self._presets.items()
+        }
+
+    @classmethod
+    def from_file(cls, path: Optional[str]) -> "PresetRegistry":
+        if not path:
+            return cls()
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._presets
+
+    def names(self) -> List[str]:
+        return list(self._presets)
+
+    def get(self, name: str) -> AgentPreset:
+        if name not in self._presets:
+            raise KeyError(f"Unknown agent preset: {name}")
+        return self._presets[name]
+
+    def template(self, name: str) -> dict:
+        self.get(name)
+        return self._templates[name]
+
+
+@lru_cache(maxsize=1)
+def get_preset_registry() -> PresetRegistry:
+    """Load the preset registry once per process"""
+    return PresetRegistry.from_file(Config.AGENT_PRESETS_FILE)
+
+
 class Payload:
-    def __init__(self, agent_name, prompt, greeting_message, model="gpt-4o"):
+    def __init__(
+        self, agent_name, prompt, greeting_message, model=None, preset="default"
+    ):
         self.agent_name = agent_name
         self.prompt = prompt
         self.first_message = greeting_message
+        self.llm_model = model
+        self.preset = preset
 
-        self.voice_provider = "elevenlabs"
-        self.voice_id = "21m00Tcm4TlvDq8ikWAM"
-        self.model = "eleven_turbo_v2_5"
-
-        self.language = "en"
+    def get_payload(self, validate=True):
+        """Overlay the per-agent fields on the cached preset template"""
+        template = get_preset_registry().template(self.preset)
 
-        self.llm_model = model
-        self.llm_temperature = 0.7
-
-    def get_payload(self):
-        payload = {
-            "name": self.agent_name,
-            "config": {
-                "prompt": self.prompt,
-                "first_message": self.first_message,
-                "language": self.language,
-                "llm": {
-                    "model": self.llm_model,
-                    "temperature": self.llm_temperature,
-                    "history_settings": {
-                        "history_message_limit": 20,
-                        "history_tool_result_limit": 5,
-                    },
-                },
-                "voice": {
-                    "provider": self.voice_provider,
-                    "voice_id": self.voice_id,
-                    "model": self.model,
-                },
-                "speech_to_text": {
-                    "provider": "deepgram",
-                    "multilingual": False,
-                    "model": "nova-2",
-                },
-                "flow": {
-                    "user_start_first": False,
-                    "interruption": {
-                        "allowed": True,
-                        "keep_interruption_message": True,
-                        "first_messsage": True,
-                    },
-                    "response_delay": {"generic_delay": 100, "number_input_delay": 100},
-                    "inactivity_handling": {
-                        "idle_time": 20,
-                        "message": "Are you still there?",
-                    },
-                    "agent_terminate_call": {
-                        "enabled": True,
-                        "messages": ["Ending session. Thank you."],
-                    },
-                },
-                "session_timeout": {
-                    "message": "Ending session. Thank you.",
-                    "max_duration": 3600,
-                    "max_idle": 40,
-                },
-                "call_settings": {
-                    "enable_recording": True,
-                },
-            },
+        # a new top level over the shared, read-only sections; only `llm` is
+        # copied, when the model is overridden
+        config = {
+            **template,
+            "prompt": self.prompt,
+            "first_message": self.first_message,
         }
+        if self.llm_model and self.llm_model != template["llm"]["model"]:
+            config["llm"] = {**template["llm"], "model": self.llm_model}
+
+        payload = {"name": self.agent_name, "config": config}
+        if validate:
+            # raises pydantic.ValidationError before any network round trip
+            AgentPayload.model_validate(payload)
         return payload
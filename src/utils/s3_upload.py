@@ -0,0 +1,228 @@
+"""Streaming multipart upload to S3 presigned POST urls"""
+
+import base64
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+import uuid
+import zlib
+from dataclasses import dataclass
+from typing import AsyncIterable, Tuple, Union
+
+import httpx
+
+from src.utils.http_client import get_http_client
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 64 * 1024
+# Payloads larger than this are spooled to disk instead of kept in memory
+SPOOL_MAX_MEMORY = 1024 * 1024
+
+UploadSource = Union[str, bytes, os.PathLike, AsyncIterable[Union[str, bytes]]]
+
+
+@dataclass
+class UploadStats:
+    """Summary of a finished upload"""
+
+    file_name: str
+    raw_bytes: int
+    sent_bytes: int
+    gzipped: bool
+    md5: str
+    sha256: str
+    seconds: float
+
+    @property
+    def throughput_mb_s(self) -> float:
+        if self.seconds <= 0:
+            return 0.0
+        return self.sent_bytes / self.seconds / 1_000_000
+
+
+def policy_allows_gzip(fields: dict) -> bool:
+    """Check whether the presigned POST policy accepts `Content-Encoding: gzip`."""
+    if fields.get("Content-Encoding") == "gzip":
+        return True
+
+    policy = fields.get("policy") or fields.get("Policy")
+    if not policy:
+        return False
+    try:
+        document = json.loads(base64.b64decode(policy))
+    except (ValueError, TypeError):
+        return False
+
+    for condition in document.get("conditions", []):
+        if isinstance(condition, dict):
+            if condition.get("Content-Encoding") == "gzip":
+                return True
+        elif isinstance(condition, list) and len(condition) == 3:
+            operator, field, value = condition
+            if str(field).lower() != "$content-encoding":
+                continue
+            if operator == "eq" and value == "gzip":
+                return True
+            if operator == "starts-with" and "gzip".startswith(value):
+                return True
+    return False
+
+
+def etag_is_md5(headers) -> bool:
+    """Whether the ETag of a single part upload is the MD5 of its body"""
+    if headers.get("x-amz-server-side-encryption", "").startswith("aws:kms"):
+        return False
+    return "x-amz-server-side-encryption-customer-algorithm" not in headers
+
+
+async def _iter_source(source: UploadSource):
+    """Yield the source as byte chunks without materializing it."""
+    if isinstance(source, bytes):
+        view = memoryview(source)
+        for start in range(0, len(view), CHUNK_SIZE):
+            yield bytes(view[start : start + CHUNK_SIZE])
+    elif isinstance(source, str):
+        for start in range(0, len(source), CHUNK_SIZE):
+            yield source[start : start + CHUNK_SIZE].encode("utf-8")
+    elif isinstance(source, os.PathLike):
+        with open(source, "rb") as f:
+            while chunk := f.read(CHUNK_SIZE):
+                yield chunk
+    else:
+        async for chunk in source:
+            yield chunk.encode("utf-8") if isinstance(chunk, str) else chunk
+
+
+async def _spool(source: UploadSource, gzip: bool):
+    """Write the (optionally gzipped) source to a spooled temp file."""
+    spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_MEMORY)  # pylint: disable=consider-using-with
+    compressor = zlib.compressobj(wbits=31) if gzip else None
+    raw_bytes = 0
+
+    async for chunk in _iter_source(source):
+        raw_bytes += len(chunk)
+        spool.write(compressor.compress(chunk) if compressor else chunk)
+    if compressor:
+        spool.write(compressor.flush())
+
+    size = spool.tell()
+    spool.seek(0)
+    return spool, raw_bytes, size
+
+
+def _multipart_parts(fields: dict, file_name: str, boundary: str) -> Tuple[bytes, bytes]:
+    """Build the multipart prefix (form fields + file header) and suffix."""
+    prefix = b""
+    for name, value in fields.items():
+        prefix += (
+            f"--{boundary}\r\n"
+            f'Content-Disposition: form-data; name="{name}"\r\n\r\n'
+            f"{value}\r\n"
+        ).encode("utf-8")
+    # S3 requires the file to be the last field of the form
+    prefix += (
+        f"--{boundary}\r\n"
+        f'Content-Disposition: form-data; name="file"; filename="{file_name}"\r\n'
+        "Content-Type: text/plain\r\n\r\n"
+    ).encode("utf-8")
+    suffix = f"\r\n--{boundary}--\r\n".encode("utf-8")
+    return prefix, suffix
+
+
+async def upload_stream_to_s3(
+    s3_url: str,
+    fields: dict,
+    source: UploadSource,
+    file_name: str = "data.txt",
+    gzip: bool = False,
+    timeout: float = 30,
+) -> Tuple[httpx.Response, UploadStats]:
+    """
+    Stream a file to an S3 presigned POST url
+
+    Args:
+        s3_url: Presigned POST url
+        fields: Presigned form fields (key, policy, signature, ...)
+        source: Text, bytes, a file path or an async iterator of chunks
+        file_name: File name sent with the upload
+        gzip: Compress the body when the presigned policy allows it
+        timeout: Request timeout in seconds
+    """
+    gzip = gzip and policy_allows_gzip(fields)
+    fields = dict(fields)
+    if gzip:
+        fields.setdefault("Content-Encoding", "gzip")
+
+    spool, body_source = None, None
+    if isinstance(source, os.PathLike) and not gzip:
+        body_source, raw_bytes = source, os.path.getsize(source)
+        size = raw_bytes
+    elif isinstance(source, bytes) and not gzip:
+        body_source, raw_bytes = source, len(source)
+        size = raw_bytes
+    else:
+        spool, raw_bytes, size = await _spool(source, gzip)
+
+    boundary = uuid.uuid4().hex
+    prefix, suffix = _multipart_parts(fields, file_name, boundary)
+    md5, sha256 = hashlib.md5(), hashlib.sha256()
+
+    async def body():
+        yield prefix
+        if spool is not None:
+            while chunk := spool.read(CHUNK_SIZE):
+                md5.update(chunk)
+                sha256.update(chunk)
+                yield chunk
+        else:
+            async for chunk in _iter_source(body_source):
+                md5.update(chunk)
+                sha256.update(chunk)
+                yield chunk
+        yield suffix
+
+    headers = {
+        "Content-Type": f"multipart/form-data; boundary={boundary}",
+        "Content-Length": str(len(prefix) + size + len(suffix)),
+    }
+
+    start = time.perf_counter()
+    try:
+        client = get_http_client()
+        response = await client.post(
+            s3_url, content=body(), headers=headers, timeout=timeout
+        )
+    finally:
+        if spool is not None:
+            spool.close()
+    seconds = time.perf_counter() - start
+    response.raise_for_status()
+
+    stats = UploadStats(
+        file_name=file_name,
+        raw_bytes=raw_bytes,
+        sent_bytes=size,
+        gzipped=gzip,
+        md5=md5.hexdigest(),
+        sha256=sha256.hexdigest(),
+        seconds=seconds,
+    )
+
+    # For single part uploads S3 returns the MD5 of the stored object as ETag,
+    # except for objects encrypted with SSE-KMS or SSE-C
+    etag = response.headers.get("ETag", "").strip('"')
+    if etag and "-" not in etag and etag_is_md5(response.headers) and etag != stats.md5:
+        raise RuntimeError(
+            f"S3 checksum mismatch for {file_name}: expected {stats.md5}, got {etag}"
+        )
+
+    logger.info(
+        f"Uploaded {file_name}: {stats.raw_bytes} bytes "
+        f"({stats.sent_bytes} sent{', gzip' if gzip else ''}) in {seconds:.2f}s, "
+        f"{stats.throughput_mb_s:.2f} MB/s, sha256={stats.sha256}"
+    )
+    return response, stats
@@ -1,7 +1,6 @@
 from src.millis_services.millis_api import set_knowledge_base, delete_knowledge_base
 from src.millis_services.millis_api import (
-    get_files_in_millis,
-    get_old_file_details,
+    file_catalog,
     generate_presigned_url,
     upload_text_to_s3,
     create_file_in_millis,
@@ -11,8 +10,7 @@ from src.millis_services.millis_api import (
 async def get_old_file_fields(api_key, old_file_id):
     """Old file field (file name, file descrption, file type)"""
     try:
-        response = await get_files_in_millis(api_key)
-        file_details = await get_old_file_details(old_file_id, response.json())
+        file_details = await file_catalog.get_by_id(api_key, old_file_id)
 
         old_file_name = file_details.get("name", "")  # type: ignore
         old_kb_description = file_details.get("description", "")  # type: ignore